@@ -0,0 +1,1281 @@
+import os
+import discord
+from discord import app_commands
+from discord.ext import commands
+import google.generativeai as genai
+import asyncio
+import logging
+import io
+import hashlib
+import math
+import time
+import re
+from pathlib import Path
+from image_filters import FILTERS, filter_label
+from downloader import ImageDownloader, DownloadError
+from cache import TTLCache
+from image_ops import (
+    ImageTooLarge, IMAGE_MAX_PIXELS, animation_format, animation_info, encode_animation, image_hash,
+    image_size, open_image, prepare_vision_image, run_frames_job, run_pipeline_job,
+)
+from executor import ImageExecutor, ExecutorBusy, JobTimeout
+from conversation import MAX_HISTORY, build_contents
+from history_store import HistoryStore, SQLiteHistoryBackend, HISTORY_DB_PATH
+from model_client import ModelClient, RateLimited, ModelUnavailable
+from streaming import STREAM_MODE, deliver_stream
+from edit_pipeline import EditChainError, parse_edit_chain, steps_from_text, describe_steps, steps_filename
+from outbound import OutboundScheduler
+from batching import MessageBatcher
+from user_requests import UserRequest, UserRequestQueue
+from response_cache import ResponseCache, response_key
+from vision_index import PerceptualIndex, VISION_DEDUP_ENABLED
+from health import HealthServer, HEALTH_MAX_QUEUE
+from metrics import REGISTRY, COMMAND_SECONDS, observe, record_stages, stage
+from tracing import LoopProfiler, end_trace, start_trace, trace, traced
+from shared_store import SharedStore, SQLiteSharedBackend, SHARED_STORE_PATH
+from sharding import IS_WORKER, ShardSupervisor, bot_options, is_primary, is_supervisor
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# عمليات الشاردات تُشغَّل عبر main.py لا عبر هذه الوحدة، فلا يحمّل عمال الصور البوت عند spawn
+LAUNCHER = str(Path(__file__).resolve().with_name('main.py'))
+
+USER_FILES_DIR = Path("user_files")
+USER_FILES_DIR.mkdir(exist_ok=True)
+
+DISCORD_TOKEN = os.getenv('DISCORD_TOKEN')
+GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
+
+if not DISCORD_TOKEN or not GEMINI_API_KEY:
+    raise ValueError("❌ يرجى التأكد من وجود DISCORD_TOKEN و GEMINI_API_KEY في المتغيرات السرية")
+
+genai.configure(api_key=GEMINI_API_KEY)
+model = genai.GenerativeModel('gemini-2.0-flash-exp')
+model_client = ModelClient(model)
+
+intents = discord.Intents.default()
+intents.message_content = True
+intents.guilds = True
+intents.members = True
+
+class TracedCommandTree(app_commands.CommandTree):
+    async def interaction_check(self, interaction):
+        # يبدأ التتبع هنا وينتهي عند اكتمال الأمر أو فشله (on_app_command_completion / on_error)
+        if interaction.type is discord.InteractionType.application_command:
+            start_trace(f"/{interaction.data.get('name', 'unknown')}")
+        return True
+
+bot_class, shard_options = bot_options()
+bot = bot_class(command_prefix='!', intents=intents, tree_cls=TracedCommandTree, **shard_options)
+
+# إعدادات القنوات محفوظة على القرص، ومع الشاردات تصل تغييراتها لكل العمليات
+shared_store = SharedStore(SQLiteSharedBackend(SHARED_STORE_PATH) if SHARED_STORE_PATH else None, watch=IS_WORKER)
+conversation_history = HistoryStore(
+    SQLiteHistoryBackend(HISTORY_DB_PATH) if HISTORY_DB_PATH else None,
+    notify=lambda user_ids: shared_store.publish('history', user_ids)
+)
+shared_store.on_change('history', conversation_history.invalidate)
+auto_reply_channels = shared_store.channels('auto_reply')
+downloader = ImageDownloader()
+
+IMAGE_CACHE_TTL = int(os.getenv('IMAGE_CACHE_TTL', 600))
+source_cache = TTLCache(int(os.getenv('IMAGE_SOURCE_CACHE_MB', 128)) * 1024 * 1024, IMAGE_CACHE_TTL)
+result_cache = TTLCache(int(os.getenv('IMAGE_RESULT_CACHE_MB', 64)) * 1024 * 1024, IMAGE_CACHE_TTL)
+image_executor = ImageExecutor()
+outbound = OutboundScheduler()
+health_server = HealthServer(bot)
+health_server.add_queue('outbound', lambda: outbound.pending, HEALTH_MAX_QUEUE)
+health_server.add_queue('images', lambda: image_executor.pending, image_executor.queue_size)
+user_requests = UserRequestQueue()
+response_cache = ResponseCache()
+response_cache.add_static('name_question', "انا ذكاء اصطناعي متطور بواسطة سيرفر\nhaven H-V")
+response_cache_disabled_channels = shared_store.channels('response_cache_off')
+vision_index = PerceptualIndex()
+loop_profiler = LoopProfiler()
+
+INTERACTION_LIFETIME = 15 * 60
+MAX_EDIT_ATTACHMENTS = 10
+IMAGE_ANALYSIS_PROMPT = "حلل هذه الصورة وأخبرني عنها بالتفصيل"
+VISION_MAX_IMAGES = int(os.getenv('VISION_MAX_IMAGES', 4))
+VISION_MAX_TOTAL_BYTES = int(os.getenv('VISION_MAX_TOTAL_MB', 20)) * 1024 * 1024
+vision_stats = {'images': 0, 'skipped': 0, 'bytes_in': 0, 'bytes_out': 0}
+
+# مقاييس تُقرأ عند طلب /metrics فقط
+CACHES = {
+    'image_source': source_cache,
+    'image_result': result_cache,
+    'response': response_cache,
+}
+REGISTRY.collected('bot_queue_depth', 'Items waiting in each work queue', ('queue',), lambda: {
+    'outbound': outbound.pending,
+    'images': image_executor.pending,
+    'user_requests': user_requests.stats()['waiting'],
+    'auto_reply_batch': auto_reply_batcher.stats()['waiting'],
+})
+REGISTRY.collected('bot_in_flight', 'Operations currently running', ('kind',), lambda: {
+    'gemini': model_client.in_flight,
+    'response_cache_single_flight': response_cache.stats()['in_flight'],
+})
+REGISTRY.collected('bot_cache_hits_total', 'Cache hits', ('cache',), lambda: {
+    **{name: cache.stats()['hits'] for name, cache in CACHES.items()},
+    'vision_index': vision_index.hits,
+}, kind='counter')
+REGISTRY.collected('bot_cache_misses_total', 'Cache misses', ('cache',), lambda: {
+    **{name: cache.stats()['misses'] for name, cache in CACHES.items()},
+    'vision_index': vision_index.lookups - vision_index.hits,
+}, kind='counter')
+REGISTRY.collected('bot_cache_hit_ratio', 'Cache hit ratio since start', ('cache',), lambda: {
+    **{name: cache.stats()['hit_rate'] for name, cache in CACHES.items()},
+    'vision_index': vision_index.stats()['hit_rate'],
+})
+REGISTRY.collected('bot_cache_bytes', 'Bytes held by each cache', ('cache',), lambda: {
+    name: cache.stats()['bytes'] for name, cache in CACHES.items()
+})
+REGISTRY.collected('bot_image_jobs_total', 'Image jobs by result', ('result',), lambda: {
+    'completed': image_executor.completed,
+    'rejected': image_executor.rejected,
+    'timed_out': image_executor.timed_out,
+}, kind='counter')
+REGISTRY.collected('bot_image_job_peak_rss_bytes', 'Peak RSS of the last image job', (),
+                   lambda: image_executor.last_peak_rss)
+REGISTRY.collected('bot_gateway_latency_seconds', 'Discord gateway heartbeat latency', (),
+                   lambda: bot.latency if math.isfinite(bot.latency) else {})
+REGISTRY.collected('bot_event_loop_lag_seconds', 'Last measured event loop lag', (),
+                   lambda: health_server.lag_monitor.lag)
+REGISTRY.collected('bot_guilds', 'Guilds the bot is in', (), lambda: len(bot.guilds))
+REGISTRY.collected('bot_shard_latency_seconds', 'Gateway heartbeat latency per shard', ('shard',), lambda: {
+    str(shard_id): latency for shard_id, latency in getattr(bot, 'latencies', ()) if math.isfinite(latency)
+})
+
+def observe_command(command, created_at, outcome):
+    # من لحظة إنشاء التفاعل/الرسالة في Discord حتى انتهاء معالجتها
+    elapsed = (discord.utils.utcnow() - created_at).total_seconds()
+    observe(COMMAND_SECONDS, max(0.0, elapsed), command, outcome)
+
+BUSY_MESSAGE = "⏳ البوت مشغول بمعالجة صور أخرى حالياً، حاول مرة أخرى بعد قليل!"
+IMAGE_TOO_LARGE_MESSAGE = f"📐 الصورة كبيرة جداً! الحد الأقصى {IMAGE_MAX_PIXELS // 1_000_000} ميغابكسل."
+TIMEOUT_MESSAGE = "⌛ استغرقت معالجة الصورة وقتاً أطول من المسموح، جرب صورة أصغر!"
+MODEL_UNAVAILABLE_MESSAGE = "⚠️ خدمة الذكاء الاصطناعي مشغولة حالياً، حاول مرة أخرى بعد قليل!"
+EMPTY_RESPONSE_MESSAGE = "🤔 لم أتمكن من توليد رد، حاول صياغة سؤالك بشكل مختلف."
+
+def detect_image_edit_request(text):
+    return steps_from_text(text)
+
+def edit_message(steps):
+    if len(steps) == 1:
+        operation, args = steps[0]
+        if operation == 'rotate':
+            return f"✅ تم تدوير الصورة {args[0]} درجة!"
+        if operation == 'filter':
+            return f"✅ تم تطبيق فلتر {filter_label(args[0])}!"
+    return f"✅ تم تطبيق: {describe_steps(steps)}"
+
+@traced()
+async def process_image_edit(attachment, steps, timeout=None, index=None):
+    try:
+        rendered = await render_pipeline(attachment, steps, timeout=timeout)
+        if not rendered:
+            return None, "❌ فشل تحميل الصورة!"
+        img_bytes, extension = rendered
+        suffix = f"_{index}" if index else ""
+        return discord.File(fp=img_bytes, filename=f"{steps_filename(steps)}{suffix}.{extension}"), edit_message(steps)
+    
+    except ImageTooLarge:
+        return None, IMAGE_TOO_LARGE_MESSAGE
+    except ExecutorBusy:
+        return None, BUSY_MESSAGE
+    except JobTimeout:
+        return None, TIMEOUT_MESSAGE
+    except Exception as e:
+        logger.error(f"خطأ في معالجة تعديل الصورة: {e}")
+        return None, f"❌ حدث خطأ في تعديل الصورة: {str(e)}"
+
+async def process_image_edits(attachments, steps, timeout=None):
+    # كل الصور بالتوازي؛ النتائج الناجحة تُرسل معاً والأخطاء تُذكر في الرسالة
+    numbered = len(attachments) > 1
+    results = await asyncio.gather(*(
+        process_image_edit(attachment, steps, timeout, index if numbered else None)
+        for index, attachment in enumerate(attachments[:MAX_EDIT_ATTACHMENTS], start=1)
+    ))
+    files = [file for file, _ in results if file]
+    messages = list(dict.fromkeys(message for _, message in results if message))
+    return files, "\n".join(messages)
+
+def source_cache_key(source):
+    attachment_id = getattr(source, 'id', None)
+    return f"attachment:{attachment_id}" if attachment_id else None
+
+def interaction_timeout(interaction):
+    elapsed = (discord.utils.utcnow() - interaction.created_at).total_seconds()
+    return max(1.0, INTERACTION_LIFETIME - elapsed)
+
+async def load_image(source):
+    key = source_cache_key(source)
+    if key:
+        cached = source_cache.get(key)
+        if cached is not None:
+            return key, cached
+    
+    try:
+        with stage('download'):
+            image_data = await downloader.read(source)
+    except DownloadError as e:
+        logger.warning(f"تم رفض تحميل الصورة: {e}")
+        return None
+    except Exception as e:
+        logger.error(f"خطأ في تحميل الصورة: {e}")
+        return None
+    
+    if not key:
+        key = f"sha256:{hashlib.sha256(image_data).hexdigest()}"
+    source_cache.set(key, image_data, len(image_data))
+    return key, image_data
+
+async def download_image(source):
+    loaded = await load_image(source)
+    if not loaded:
+        return None
+    try:
+        # فحص الترويسة فقط؛ فك الترميز الكامل تتولاه مكتبة Gemini لاحقاً
+        return open_image(loaded[1])
+    except ImageTooLarge as e:
+        logger.warning(f"تم تجاهل صورة كبيرة جداً: {e}")
+        return None
+    except Exception as e:
+        logger.error(f"خطأ في فك ترميز الصورة: {e}")
+        return None
+
+@traced()
+async def render_pipeline(source, steps, timeout=None):
+    key = source_cache_key(source)
+    if key:
+        cached = result_cache.get((key, steps))
+        if cached is not None:
+            return io.BytesIO(cached[0]), cached[1]
+    
+    loaded = await load_image(source)
+    if not loaded:
+        return None
+    key, image_data = loaded
+    result_key = (key, steps)
+    
+    if not source_cache_key(source):
+        cached = result_cache.get(result_key)
+        if cached is not None:
+            return io.BytesIO(cached[0]), cached[1]
+    
+    animation = await asyncio.to_thread(animation_info, image_data, steps)
+    if animation:
+        output, extension = await render_animation(image_data, steps, animation, timeout)
+    else:
+        with stage('image_job'):
+            output, extension, stages = await image_executor.run(run_pipeline_job, image_data, steps, timeout=timeout)
+            record_stages(stages)
+    result_cache.set(result_key, (output, extension), len(output))
+    return io.BytesIO(output), extension
+
+async def render_animation(image_data, steps, animation, timeout=None):
+    frames, loop_count, source_format = animation
+    fmt = animation_format(source_format)
+    started = time.monotonic()
+    # الإطارات تُقسم على العمال بالتوازي، ثم تُجمع كلها في ترميز واحد يحفظ المدد والتكرار
+    parts = min(image_executor.workers, frames)
+    tasks = [
+        asyncio.create_task(image_executor.run(
+            run_frames_job, image_data, frames * part // parts, frames * (part + 1) // parts, steps, fmt,
+            timeout=timeout,
+        ))
+        for part in range(parts)
+    ]
+    try:
+        with stage('image_job'):
+            results = await asyncio.gather(*tasks)
+            for _, stages in results:
+                record_stages(stages)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+    
+    if timeout is not None:
+        timeout -= time.monotonic() - started
+        if timeout <= 0:
+            raise JobTimeout()
+    chunks = [frames for frames, _ in results]
+    with stage('image_job'):
+        output, extension, stages = await image_executor.run(encode_animation, chunks, loop_count, fmt, timeout=timeout)
+        record_stages(stages)
+    return output, extension
+
+async def render_edit(source, operation, args, timeout=None):
+    return await render_pipeline(source, ((operation, args),), timeout)
+
+def is_safe_filename(filename):
+    if not filename or len(filename) > 100:
+        return False
+    if '..' in filename or '/' in filename or '\\' in filename:
+        return False
+    if not re.match(r'^[\w\-. ]+$', filename):
+        return False
+    return True
+
+def get_file_path(filename):
+    if not is_safe_filename(filename):
+        return None
+    return USER_FILES_DIR / filename
+
+def get_all_user_files():
+    try:
+        return [f.name for f in USER_FILES_DIR.iterdir() if f.is_file()]
+    except Exception as e:
+        logger.error(f"خطأ في قراءة المجلد: {e}")
+        return []
+
+def rate_limit_message(error):
+    return f"⏳ أرسلت طلبات كثيرة، انتظر {max(1, round(error.retry_after))} ثانية ثم حاول مرة أخرى!"
+
+async def prepare_vision_input(source):
+    loaded = await load_image(source)
+    if not loaded:
+        return None
+    try:
+        with stage('vision_prepare'):
+            data, mime_type = await image_executor.run(prepare_vision_image, loaded[1])
+    except (ExecutorBusy, JobTimeout):
+        # المعالج مشغول: نرسل الصورة الأصلية بدل تأخير الرد
+        return await download_image(source)
+    except Exception as e:
+        logger.error(f"خطأ في فك ترميز الصورة: {e}")
+        return None
+    vision_stats['images'] += 1
+    vision_stats['bytes_in'] += len(loaded[1])
+    vision_stats['bytes_out'] += len(data)
+    return {'mime_type': mime_type, 'data': data}
+
+@traced()
+async def prepare_vision_inputs(attachments):
+    selected = []
+    total_bytes = 0
+    for attachment in attachments:
+        size = getattr(attachment, 'size', 0) or 0
+        if len(selected) >= VISION_MAX_IMAGES or total_bytes + size > VISION_MAX_TOTAL_BYTES:
+            vision_stats['skipped'] += 1
+            continue
+        total_bytes += size
+        selected.append(attachment)
+    if len(selected) < len(attachments):
+        logger.info(f"تم تجاهل {len(attachments) - len(selected)} صورة لتجاوز حد الصور في الرسالة")
+    # التحميل والتصغير لكل الصور بالتوازي
+    images = await asyncio.gather(*(prepare_vision_input(attachment) for attachment in selected))
+    return [image for image in images if image is not None]
+
+@traced()
+async def build_ai_contents(user_id, prompt, attachments=None, with_history=True):
+    images = await prepare_vision_inputs(attachments) if attachments else []
+    
+    history = await conversation_history.get(user_id) if with_history else []
+    return build_contents(history, prompt, images)
+
+def response_cache_key(prompt, contents, attachments, channel_id):
+    # ردود الصور لا تُخزن، والقنوات التي ألغت التخزين لا تقرأ ولا تكتب في الذاكرة المؤقتة
+    if not response_cache.enabled or attachments or channel_id in response_cache_disabled_channels:
+        return None
+    return response_key(prompt, contents[:-1])
+
+async def cached_response(key):
+    while True:
+        cached = response_cache.get(key)
+        if cached:
+            return cached
+        pending = response_cache.pending(key)
+        if pending is None:
+            return None
+        response = await pending
+        if response:
+            return response
+
+@traced()
+async def vision_fingerprint(prompt, attachments):
+    # فقط طلب التحليل الافتراضي لصورة واحدة بلا نص يمكن مشاركته بين الرسائل
+    if not VISION_DEDUP_ENABLED or prompt != IMAGE_ANALYSIS_PROMPT or not attachments or len(attachments) != 1:
+        return None
+    loaded = await load_image(attachments[0])
+    if not loaded:
+        return None
+    try:
+        with stage('vision_hash'):
+            return await image_executor.run(image_hash, loaded[1])
+    except (ExecutorBusy, JobTimeout):
+        return None
+    except Exception as e:
+        logger.warning(f"تعذر حساب بصمة الصورة: {e}")
+        return None
+
+@traced()
+async def get_ai_response(user_id, prompt, attachments=None, guild_id=None, channel_id=None):
+    try:
+        static_response = response_cache.static_response(prompt)
+        if static_response:
+            await conversation_history.append(user_id, prompt, static_response)
+            return static_response
+        
+        fingerprint = await vision_fingerprint(prompt, attachments)
+        ai_response = vision_index.lookup(fingerprint) if fingerprint is not None else None
+        if not ai_response:
+            # التحليل المشترك عبر فهرس الصور يُبنى بلا سجل المستخدم حتى لا يتسرب سياقه لغيره
+            contents = await build_ai_contents(user_id, prompt, attachments, with_history=fingerprint is None)
+            key = response_cache_key(prompt, contents, attachments, channel_id)
+            ai_response = await cached_response(key)
+            if not ai_response:
+                response_cache.begin(key)
+                try:
+                    response = await model_client.generate(contents, user_id=user_id, guild_id=guild_id, kind='vision' if attachments else 'text')
+                    ai_response = response.text
+                finally:
+                    response_cache.finish(key, ai_response)
+            if fingerprint is not None:
+                vision_index.add(fingerprint, ai_response)
+        
+        await conversation_history.append(user_id, prompt, ai_response)
+        return ai_response
+    
+    except RateLimited as e:
+        return rate_limit_message(e)
+    except ModelUnavailable:
+        return MODEL_UNAVAILABLE_MESSAGE
+    except Exception as e:
+        logger.error(f"خطأ في الحصول على رد من Gemini: {e}")
+        return f"❌ عذراً، حدث خطأ في معالجة طلبك: {str(e)}"
+
+@traced()
+async def stream_ai_response(user_id, prompt, attachments=None, guild_id=None, channel_id=None):
+    static_response = response_cache.static_response(prompt)
+    if static_response:
+        await conversation_history.append(user_id, prompt, static_response)
+        yield static_response
+        return
+    
+    parts = []
+    key = None
+    try:
+        fingerprint = await vision_fingerprint(prompt, attachments)
+        cached = vision_index.lookup(fingerprint) if fingerprint is not None else None
+        if not cached:
+            contents = await build_ai_contents(user_id, prompt, attachments, with_history=fingerprint is None)
+            key = response_cache_key(prompt, contents, attachments, channel_id)
+            cached = await cached_response(key)
+        if cached:
+            key = None
+            parts.append(cached)
+            yield cached
+        else:
+            response_cache.begin(key)
+            async for text in model_client.stream(contents, user_id=user_id, guild_id=guild_id, kind='vision' if attachments else 'text'):
+                parts.append(text)
+                yield text
+            response_cache.finish(key, ''.join(parts))
+            key = None
+            if fingerprint is not None and parts:
+                vision_index.add(fingerprint, ''.join(parts))
+    except RateLimited as e:
+        yield rate_limit_message(e)
+        return
+    except ModelUnavailable:
+        yield ("\n\n" if parts else "") + MODEL_UNAVAILABLE_MESSAGE
+        return
+    except Exception as e:
+        logger.error(f"خطأ في الحصول على رد من Gemini: {e}")
+        yield ("\n\n" if parts else "") + f"❌ عذراً، حدث خطأ في معالجة طلبك: {str(e)}"
+        return
+    finally:
+        # فشل أو إلغاء: المنتظرون على نفس الطلب يرسلون طلبهم الخاص
+        response_cache.finish(key)
+    
+    if parts:
+        await conversation_history.append(user_id, prompt, ''.join(parts))
+
+async def mark_output(chunks, request):
+    # أول جزء من النموذج يعني أن الطلب لم يعد قابلاً للإلغاء من طلب أحدث
+    try:
+        async for text in chunks:
+            request.mark_output()
+            yield text
+    finally:
+        await chunks.aclose()
+
+@traced()
+async def send_long_message(channel, text, first_send=None):
+    return await outbound.send_text(channel, text, first_send)
+
+@bot.event
+async def on_ready():
+    logger.info(f'✅ تم تسجيل الدخول كـ {bot.user}')
+    # الأوامر عامة لكل الشاردات، فتُزامن من العملية التي تملك الشارد 0 فقط
+    if is_primary(bot):
+        try:
+            synced = await bot.tree.sync()
+            logger.info(f'✅ تم مزامنة {len(synced)} أمر')
+        except Exception as e:
+            logger.error(f'❌ خطأ في المزامنة: {e}')
+    
+    await bot.change_presence(
+        activity=discord.Activity(
+            type=discord.ActivityType.listening,
+            name="/help للمساعدة"
+        )
+    )
+
+@bot.tree.command(name="ask", description="اسأل البوت أي سؤال")
+@app_commands.describe(question="السؤال الذي تريد طرحه")
+async def ask(interaction: discord.Interaction, question: str):
+    await interaction.response.defer(thinking=True)
+    
+    async def answer(request):
+        if STREAM_MODE != 'off':
+            reply = await deliver_stream(
+                mark_output(stream_ai_response(interaction.user.id, request.prompt, guild_id=interaction.guild_id, channel_id=interaction.channel_id), request),
+                outbound.sender(interaction.channel),
+                first_send=outbound.sender(interaction.channel, interaction.followup.send)
+            )
+            if not reply.sent_messages:
+                await interaction.followup.send(EMPTY_RESPONSE_MESSAGE)
+            return
+        
+        response = await get_ai_response(interaction.user.id, request.prompt, guild_id=interaction.guild_id, channel_id=interaction.channel_id)
+        request.mark_output()
+        await send_long_message(interaction.channel, response, first_send=interaction.followup.send)
+    
+    try:
+        # الأمر له رد مؤجل ينتظر، لذا يُرتب مع طلبات المستخدم الأخرى لكن لا يُلغى
+        await user_requests.run(interaction.user.id, UserRequest(question, cancellable=False), answer)
+    except Exception as e:
+        logger.error(f"خطأ في أمر ask: {e}")
+        await interaction.followup.send(f"❌ حدث خطأ: {str(e)}")
+
+@bot.tree.command(name="help", description="عرض دليل استخدام البوت")
+async def help_command(interaction: discord.Interaction):
+    help_text = """
+# 📚 دليل استخدام البوت
+
+## 🎯 الأوامر الأساسية:
+**`/ask [سؤال]`** - اسأل البوت أي سؤال
+**`/help`** - عرض هذا الدليل
+**`/clear`** - مسح سجل محادثتك
+**`/ping`** - فحص سرعة استجابة البوت
+
+## 💻 أوامر البرمجة وإنشاء الملفات:
+**`/createfile [اسم] [وصف]`** - إنشاء ملف وكتابة كود بداخله (متاح للجميع)
+مثال: `/createfile calculator.py برنامج آلة حاسبة بسيطة`
+
+## 🎨 أوامر تعديل الصور:
+**`/rotate [صورة] [درجات]`** - تدوير الصورة (90, 180, 270)
+**`/resize [صورة] [عرض] [ارتفاع]`** - تغيير حجم الصورة
+**`/filter [صورة] [نوع]`** - تطبيق فلتر ({})
+**`/crop [صورة] [left] [top] [right] [bottom]`** - قص الصورة
+**`/addtext [صورة] [نص] [x] [y]`** - إضافة نص على الصورة
+**`/edit [صورة] [خطوات]`** - عدة تعديلات دفعة واحدة (مثال: `rotate 90 | grayscale | resize 800x600`)
+
+## 🛡️ أوامر الإدارة (للمشرفين فقط):
+**`/setchannel`** - تفعيل الرد التلقائي في هذه القناة
+**`/removechannel`** - إلغاء الرد التلقائي من هذه القناة
+**`/listchannels`** - عرض القنوات المفعلة
+**`/clearallchannels`** - إزالة جميع القنوات المفعلة
+**`/listfiles`** - عرض جميع الملفات المنشأة
+**`/readfile [اسم]`** - قراءة محتوى ملف معين
+**`/deletefile [اسم]`** - حذف ملف معين
+**`/cachestats`** - إحصائيات التخزين المؤقت للصور
+**`/responsecache`** - تشغيل أو إيقاف الردود المخزنة في القناة
+**`/profile [ثواني]`** - قياس أداء البوت (cProfile) وإرسال النتيجة كملف
+
+## 💬 طرق التفاعل:
+✅ **Slash Commands** - استخدم الأوامر أعلاه
+✅ **@منشن** - اذكر البوت في رسالتك (@{})
+✅ **الرد** - رد على رسالة البوت مباشرة
+✅ **رد تلقائي** - في القنوات المفعلة سيرد البوت تلقائياً
+
+## 🧠 إدارة السياق:
+• يحفظ البوت آخر {} تبادلات لكل مستخدم
+• يفهم الأسئلة بناءً على السياق السابق
+• استخدم `/clear` لبدء محادثة جديدة
+
+## 🤖 مدعوم بـ:
+**Google Gemini 2.0 Flash Experimental**
+نموذج ذكاء اصطناعي متقدم للإجابة على أسئلتك وكتابة الأكواد
+
+---
+💡 **نصيحة**: جرب سؤال البوت عن أي موضوع أو إنشاء ملفات برمجية!
+""".format(", ".join(FILTERS), bot.user.mention, MAX_HISTORY)
+    
+    await interaction.response.send_message(help_text)
+
+@bot.tree.command(name="clear", description="مسح سجل محادثتك مع البوت")
+async def clear(interaction: discord.Interaction):
+    user_id = interaction.user.id
+    if await conversation_history.clear(user_id):
+        await interaction.response.send_message("✅ تم مسح سجل محادثتك بنجاح!")
+    else:
+        await interaction.response.send_message("ℹ️ لا يوجد سجل محادثات لمسحه.")
+
+@bot.tree.command(name="ping", description="فحص سرعة استجابة البوت")
+async def ping(interaction: discord.Interaction):
+    latency = round(bot.latency * 1000)
+    await interaction.response.send_message(
+        f"🏓 بونج!\n⚡ سرعة الاستجابة: `{latency}ms`"
+    )
+
+@bot.tree.command(name="cachestats", description="عرض إحصائيات ذاكرة التخزين المؤقت للصور (للمشرفين فقط)")
+@app_commands.default_permissions(administrator=True)
+async def cachestats(interaction: discord.Interaction):
+    lines = ["📊 **إحصائيات التخزين المؤقت:**"]
+    for name, cache in (("الصور المصدرية", source_cache), ("نتائج التعديل", result_cache)):
+        stats = cache.stats()
+        lines.append(
+            f"• **{name}**: {stats['entries']} عنصر، "
+            f"{stats['bytes'] // 1024}/{stats['max_bytes'] // 1024} KB، "
+            f"إصابات {stats['hits']} / إخفاقات {stats['misses']} "
+            f"({stats['hit_rate']:.0%})، إخراج {stats['evictions']}"
+        )
+    history_stats = conversation_history.stats()
+    lines.append(
+        f"• **سجل المحادثات**: {history_stats['hot_users']} مستخدم في الذاكرة "
+        f"({history_stats['hot_bytes'] // 1024} KB)، تحميل من القرص {history_stats['cold_loads']}، "
+        f"إخراج {history_stats['evictions']}، بانتظار الحفظ {history_stats['dirty']}"
+    )
+    if shared_store.watch:
+        store_stats = shared_store.stats()
+        lines.append(
+            f"• **الشاردات** {getattr(bot, 'shard_ids', None)} من {bot.shard_count}: تغييرات منشورة {store_stats['published']}، "
+            f"مستلمة {store_stats['received']}، سجلات أُبطلت {history_stats['invalidations']}"
+        )
+    executor_stats = image_executor.stats()
+    lines.append(
+        f"• **معالجة الصور** ({executor_stats['backend']}): قيد الانتظار {executor_stats['pending']}/{executor_stats['queue_size']}، "
+        f"مكتملة {executor_stats['completed']}، مرفوضة {executor_stats['rejected']}، تجاوزت المهلة {executor_stats['timed_out']}، "
+        f"ذروة الذاكرة لآخر مهمة {executor_stats['last_peak_rss'] // (1024 * 1024)} MB (الأعلى {executor_stats['max_peak_rss'] // (1024 * 1024)} MB)"
+    )
+    batch_stats = auto_reply_batcher.stats()
+    if auto_reply_batcher.enabled:
+        lines.append(
+            f"• **تجميع الرد التلقائي** ({batch_stats['mode']}): {batch_stats['messages']} رسالة في {batch_stats['batches']} دفعة، "
+            f"طلبات موفرة {batch_stats['saved_calls']}، بالانتظار {batch_stats['waiting']}"
+        )
+    index_stats = vision_index.stats()
+    lines.append(
+        f"• **تحليلات الصور المكررة**: {index_stats['entries']} بصمة، "
+        f"إصابات {index_stats['hits']}/{index_stats['lookups']} ({index_stats['hit_rate']:.0%})، إخراج {index_stats['evictions']}"
+    )
+    lines.append(
+        f"• **صور مرسلة للنموذج**: {vision_stats['images']} صورة، "
+        f"{vision_stats['bytes_in'] // 1024} KB ← {vision_stats['bytes_out'] // 1024} KB بعد التصغير، متجاهلة {vision_stats['skipped']}"
+    )
+    response_stats = response_cache.stats()
+    lines.append(
+        f"• **الردود المخزنة**: {response_stats['entries']} رد ({response_stats['bytes'] // 1024} KB)، "
+        f"إصابات {response_stats['hits']} ({response_stats['hit_rate']:.0%})، ثابتة {response_stats['static_hits']}، "
+        f"طلبات مدموجة أثناء التنفيذ {response_stats['coalesced']}"
+    )
+    request_stats = user_requests.stats()
+    lines.append(
+        f"• **طلبات المستخدمين** ({request_stats['policy']}): مكتملة {request_stats['completed']}، "
+        f"انتظرت دورها {request_stats['queued']}، ملغاة {request_stats['cancelled']}، مدموجة {request_stats['merged']}، "
+        f"بالانتظار الآن {request_stats['waiting']}"
+    )
+    outbound_stats = outbound.stats()
+    lines.append(
+        f"• **الإرسال**: {outbound_stats['sent']} رسالة، قيد الانتظار {outbound_stats['pending']} في {outbound_stats['channels']} قناة، "
+        f"مدموجة {outbound_stats['coalesced']}، حد المعدل {outbound_stats['rate_limited']}، انتظار {outbound_stats['waited']:.1f} ثانية"
+    )
+    await interaction.response.send_message("\n".join(lines))
+
+@bot.tree.command(name="profile", description="قياس أداء البوت لعدة ثوانٍ وإرسال النتيجة كملف (للمشرفين فقط)")
+@app_commands.describe(seconds="مدة القياس بالثواني")
+@app_commands.default_permissions(administrator=True)
+async def profile(interaction: discord.Interaction, seconds: int = 10):
+    if loop_profiler.running:
+        await interaction.response.send_message("⏳ يوجد قياس أداء قيد التشغيل حالياً، انتظر حتى ينتهي!", ephemeral=True)
+        return
+    
+    await interaction.response.defer(ephemeral=True)
+    report, raw = await loop_profiler.run(seconds)
+    await interaction.followup.send(
+        f"📈 تم قياس أداء حلقة الأحداث لمدة {max(1, min(seconds, loop_profiler.max_seconds))} ثانية",
+        files=[
+            discord.File(fp=io.BytesIO(report.encode('utf-8')), filename="profile.txt"),
+            discord.File(fp=io.BytesIO(raw), filename="profile.prof"),
+        ],
+        ephemeral=True,
+    )
+
+@bot.tree.command(name="setchannel", description="تفعيل الرد التلقائي في هذه القناة (للمشرفين)")
+async def setchannel(interaction: discord.Interaction):
+    if not interaction.user.guild_permissions.manage_channels:
+        await interaction.response.send_message("❌ يجب أن تكون مشرفاً لاستخدام هذا الأمر!")
+        return
+    
+    channel_id = interaction.channel_id
+    await shared_store.set_channel('auto_reply', channel_id, interaction.guild_id, True)
+    await interaction.response.send_message(
+        f"✅ تم تفعيل الرد التلقائي في القناة <#{channel_id}>"
+    )
+
+@bot.tree.command(name="removechannel", description="إلغاء الرد التلقائي من هذه القناة (للمشرفين)")
+async def removechannel(interaction: discord.Interaction):
+    if not interaction.user.guild_permissions.manage_channels:
+        await interaction.response.send_message("❌ يجب أن تكون مشرفاً لاستخدام هذا الأمر!")
+        return
+    
+    channel_id = interaction.channel_id
+    if await shared_store.set_channel('auto_reply', channel_id, interaction.guild_id, False):
+        await interaction.response.send_message(
+            f"✅ تم إلغاء الرد التلقائي من القناة <#{channel_id}>"
+        )
+    else:
+        await interaction.response.send_message("ℹ️ هذه القناة غير مفعلة للرد التلقائي.")
+
+@bot.tree.command(name="listchannels", description="عرض القنوات المفعلة للرد التلقائي (للمشرفين)")
+async def listchannels(interaction: discord.Interaction):
+    if not interaction.user.guild_permissions.manage_channels:
+        await interaction.response.send_message("❌ يجب أن تكون مشرفاً لاستخدام هذا الأمر!")
+        return
+    
+    if not auto_reply_channels:
+        await interaction.response.send_message("ℹ️ لا توجد قنوات مفعلة للرد التلقائي.")
+        return
+    
+    channels_list = "\n".join([f"• <#{ch_id}>" for ch_id in auto_reply_channels])
+    await interaction.response.send_message(
+        f"📋 **القنوات المفعلة للرد التلقائي:**\n{channels_list}"
+    )
+
+@bot.tree.command(name="clearallchannels", description="إزالة جميع القنوات المفعلة (للمشرفين)")
+async def clearallchannels(interaction: discord.Interaction):
+    if not interaction.user.guild_permissions.manage_channels:
+        await interaction.response.send_message("❌ يجب أن تكون مشرفاً لاستخدام هذا الأمر!")
+        return
+    
+    count = await shared_store.clear_channels('auto_reply')
+    await interaction.response.send_message(
+        f"✅ تم إزالة {count} قناة من الرد التلقائي."
+    )
+
+@bot.tree.command(name="responsecache", description="تشغيل أو إيقاف مشاركة الردود المخزنة في هذه القناة (للمشرفين)")
+@app_commands.describe(enabled="السماح بإعادة استخدام الردود المخزنة في هذه القناة")
+async def responsecache(interaction: discord.Interaction, enabled: bool):
+    if not interaction.user.guild_permissions.manage_channels:
+        await interaction.response.send_message("❌ يجب أن تكون مشرفاً لاستخدام هذا الأمر!")
+        return
+    
+    channel_id = interaction.channel_id
+    await shared_store.set_channel('response_cache_off', channel_id, interaction.guild_id, not enabled)
+    if enabled:
+        await interaction.response.send_message(f"✅ تم تفعيل الردود المخزنة في القناة <#{channel_id}>")
+    else:
+        await interaction.response.send_message(f"✅ لن تُستخدم الردود المخزنة في القناة <#{channel_id}>")
+
+@bot.tree.command(name="rotate", description="تدوير الصورة")
+@app_commands.describe(
+    image="الصورة المراد تدويرها",
+    degrees="درجة التدوير"
+)
+@app_commands.choices(degrees=[
+    app_commands.Choice(name="90 درجة", value=90),
+    app_commands.Choice(name="180 درجة", value=180),
+    app_commands.Choice(name="270 درجة", value=270),
+])
+async def rotate(interaction: discord.Interaction, image: discord.Attachment, degrees: app_commands.Choice[int]):
+    await interaction.response.defer(thinking=True)
+    
+    try:
+        if not image.content_type or not image.content_type.startswith('image/'):
+            await interaction.followup.send("❌ يجب أن يكون المرفق صورة!")
+            return
+        
+        rendered = await render_edit(image, 'rotate', (degrees.value,), timeout=interaction_timeout(interaction))
+        if not rendered:
+            await interaction.followup.send("❌ فشل تحميل الصورة!")
+            return
+        img_bytes, extension = rendered
+        
+        await interaction.followup.send(
+            f"✅ تم تدوير الصورة {degrees.value} درجة!",
+            file=discord.File(fp=img_bytes, filename=f"rotated_{degrees.value}.{extension}")
+        )
+    except ImageTooLarge:
+        await interaction.followup.send(IMAGE_TOO_LARGE_MESSAGE)
+    except ExecutorBusy:
+        await interaction.followup.send(BUSY_MESSAGE)
+    except JobTimeout:
+        await interaction.followup.send(TIMEOUT_MESSAGE)
+    except Exception as e:
+        logger.error(f"خطأ في تدوير الصورة: {e}")
+        await interaction.followup.send(f"❌ حدث خطأ: {str(e)}")
+
+@bot.tree.command(name="resize", description="تغيير حجم الصورة")
+@app_commands.describe(
+    image="الصورة المراد تغيير حجمها",
+    width="العرض الجديد بالبكسل",
+    height="الارتفاع الجديد بالبكسل"
+)
+async def resize(interaction: discord.Interaction, image: discord.Attachment, width: int, height: int):
+    await interaction.response.defer(thinking=True)
+    
+    try:
+        if not image.content_type or not image.content_type.startswith('image/'):
+            await interaction.followup.send("❌ يجب أن يكون المرفق صورة!")
+            return
+        
+        if width <= 0 or height <= 0 or width > 4000 or height > 4000:
+            await interaction.followup.send("❌ الأبعاد يجب أن تكون بين 1 و 4000 بكسل!")
+            return
+        
+        rendered = await render_edit(image, 'resize', (width, height), timeout=interaction_timeout(interaction))
+        if not rendered:
+            await interaction.followup.send("❌ فشل تحميل الصورة!")
+            return
+        img_bytes, extension = rendered
+        
+        await interaction.followup.send(
+            f"✅ تم تغيير حجم الصورة إلى {width}x{height}!",
+            file=discord.File(fp=img_bytes, filename=f"resized_{width}x{height}.{extension}")
+        )
+    except ImageTooLarge:
+        await interaction.followup.send(IMAGE_TOO_LARGE_MESSAGE)
+    except ExecutorBusy:
+        await interaction.followup.send(BUSY_MESSAGE)
+    except JobTimeout:
+        await interaction.followup.send(TIMEOUT_MESSAGE)
+    except Exception as e:
+        logger.error(f"خطأ في تغيير حجم الصورة: {e}")
+        await interaction.followup.send(f"❌ حدث خطأ: {str(e)}")
+
+@bot.tree.command(name="filter", description="تطبيق فلتر على الصورة")
+@app_commands.describe(
+    image="الصورة المراد تطبيق الفلتر عليها",
+    filter_type="نوع الفلتر"
+)
+@app_commands.choices(filter_type=[
+    app_commands.Choice(name=f"{spec['emoji']} {spec['label']} ({name.title()})", value=name)
+    for name, spec in FILTERS.items()
+])
+async def filter_cmd(interaction: discord.Interaction, image: discord.Attachment, filter_type: app_commands.Choice[str]):
+    await interaction.response.defer(thinking=True)
+    
+    try:
+        if not image.content_type or not image.content_type.startswith('image/'):
+            await interaction.followup.send("❌ يجب أن يكون المرفق صورة!")
+            return
+        
+        rendered = await render_edit(image, 'filter', (filter_type.value,), timeout=interaction_timeout(interaction))
+        if not rendered:
+            await interaction.followup.send("❌ فشل تحميل الصورة!")
+            return
+        img_bytes, extension = rendered
+        
+        await interaction.followup.send(
+            f"✅ تم تطبيق فلتر {filter_type.name}!",
+            file=discord.File(fp=img_bytes, filename=f"filtered_{filter_type.value}.{extension}")
+        )
+    except ImageTooLarge:
+        await interaction.followup.send(IMAGE_TOO_LARGE_MESSAGE)
+    except ExecutorBusy:
+        await interaction.followup.send(BUSY_MESSAGE)
+    except JobTimeout:
+        await interaction.followup.send(TIMEOUT_MESSAGE)
+    except Exception as e:
+        logger.error(f"خطأ في تطبيق الفلتر: {e}")
+        await interaction.followup.send(f"❌ حدث خطأ: {str(e)}")
+
+@bot.tree.command(name="crop", description="قص الصورة")
+@app_commands.describe(
+    image="الصورة المراد قصها",
+    left="الحافة اليسرى",
+    top="الحافة العلوية",
+    right="الحافة اليمنى",
+    bottom="الحافة السفلية"
+)
+async def crop(interaction: discord.Interaction, image: discord.Attachment, left: int, top: int, right: int, bottom: int):
+    await interaction.response.defer(thinking=True)
+    
+    try:
+        if not image.content_type or not image.content_type.startswith('image/'):
+            await interaction.followup.send("❌ يجب أن يكون المرفق صورة!")
+            return
+        
+        loaded = await load_image(image)
+        if not loaded:
+            await interaction.followup.send("❌ فشل تحميل الصورة!")
+            return
+        
+        img_width, img_height = image_size(loaded[1])
+        if left < 0 or top < 0 or right > img_width or bottom > img_height or left >= right or top >= bottom:
+            await interaction.followup.send(f"❌ إحداثيات القص غير صحيحة! أبعاد الصورة: {img_width}x{img_height}")
+            return
+        
+        rendered = await render_edit(image, 'crop', (left, top, right, bottom), timeout=interaction_timeout(interaction))
+        if not rendered:
+            await interaction.followup.send("❌ فشل تحميل الصورة!")
+            return
+        img_bytes, extension = rendered
+        
+        await interaction.followup.send(
+            f"✅ تم قص الصورة!",
+            file=discord.File(fp=img_bytes, filename=f"cropped.{extension}")
+        )
+    except ImageTooLarge:
+        await interaction.followup.send(IMAGE_TOO_LARGE_MESSAGE)
+    except ExecutorBusy:
+        await interaction.followup.send(BUSY_MESSAGE)
+    except JobTimeout:
+        await interaction.followup.send(TIMEOUT_MESSAGE)
+    except Exception as e:
+        logger.error(f"خطأ في قص الصورة: {e}")
+        await interaction.followup.send(f"❌ حدث خطأ: {str(e)}")
+
+@bot.tree.command(name="addtext", description="إضافة نص على الصورة")
+@app_commands.describe(
+    image="الصورة المراد إضافة النص عليها",
+    text="النص المراد إضافته",
+    x="موضع X للنص (اختياري)",
+    y="موضع Y للنص (اختياري)"
+)
+async def addtext(interaction: discord.Interaction, image: discord.Attachment, text: str, x: int = 10, y: int = 10):
+    await interaction.response.defer(thinking=True)
+    
+    try:
+        if not image.content_type or not image.content_type.startswith('image/'):
+            await interaction.followup.send("❌ يجب أن يكون المرفق صورة!")
+            return
+        
+        rendered = await render_edit(image, 'addtext', (text, x, y), timeout=interaction_timeout(interaction))
+        if not rendered:
+            await interaction.followup.send("❌ فشل تحميل الصورة!")
+            return
+        img_bytes, extension = rendered
+        
+        await interaction.followup.send(
+            f"✅ تم إضافة النص على الصورة!",
+            file=discord.File(fp=img_bytes, filename=f"with_text.{extension}")
+        )
+    except ImageTooLarge:
+        await interaction.followup.send(IMAGE_TOO_LARGE_MESSAGE)
+    except ExecutorBusy:
+        await interaction.followup.send(BUSY_MESSAGE)
+    except JobTimeout:
+        await interaction.followup.send(TIMEOUT_MESSAGE)
+    except Exception as e:
+        logger.error(f"خطأ في إضافة النص: {e}")
+        await interaction.followup.send(f"❌ حدث خطأ: {str(e)}")
+
+@bot.tree.command(name="edit", description="تطبيق عدة تعديلات على الصورة دفعة واحدة")
+@app_commands.describe(
+    image="الصورة المراد تعديلها",
+    steps="الخطوات بالترتيب، مثل: rotate 90 | grayscale | resize 800x600"
+)
+async def edit(interaction: discord.Interaction, image: discord.Attachment, steps: str):
+    await interaction.response.defer(thinking=True)
+    
+    try:
+        if not image.content_type or not image.content_type.startswith('image/'):
+            await interaction.followup.send("❌ يجب أن يكون المرفق صورة!")
+            return
+        
+        try:
+            chain = parse_edit_chain(steps)
+        except EditChainError as e:
+            await interaction.followup.send(str(e))
+            return
+        
+        file, reply_text = await process_image_edit(image, chain, timeout=interaction_timeout(interaction))
+        if file:
+            await interaction.followup.send(reply_text, file=file)
+        else:
+            await interaction.followup.send(reply_text)
+    except Exception as e:
+        logger.error(f"خطأ في أمر edit: {e}")
+        await interaction.followup.send(f"❌ حدث خطأ: {str(e)}")
+
+@bot.tree.command(name="createfile", description="إنشاء ملف وكتابة كود بداخله")
+@app_commands.describe(
+    filename="اسم الملف (مثال: script.py, index.html)",
+    description="وصف للكود المطلوب كتابته في الملف"
+)
+async def createfile(interaction: discord.Interaction, filename: str, description: str):
+    await interaction.response.defer(thinking=True)
+    
+    try:
+        if not is_safe_filename(filename):
+            await interaction.followup.send("❌ اسم الملف غير صالح! استخدم أحرف وأرقام و(-_.) فقط")
+            return
+        
+        file_path = get_file_path(filename)
+        
+        prompt = f"""أنت مبرمج خبير. المستخدم يريد إنشاء ملف باسم '{filename}' يحتوي على الكود التالي:
+
+{description}
+
+يرجى كتابة الكود الكامل والجاهز للتشغيل. لا تضف أي شرح أو تعليقات خارج الكود - فقط الكود نفسه.
+إذا كان الملف HTML، أضف كود HTML كامل.
+إذا كان Python، أضف كود Python كامل.
+وهكذا حسب نوع الملف."""
+        
+        response = await model_client.generate(prompt, user_id=interaction.user.id, guild_id=interaction.guild_id)
+        code_content = response.text
+        
+        code_content = code_content.strip()
+        if code_content.startswith('```'):
+            lines = code_content.split('\n')
+            if lines[0].startswith('```'):
+                lines = lines[1:]
+            if lines and lines[-1].strip() == '```':
+                lines = lines[:-1]
+            code_content = '\n'.join(lines)
+        
+        with open(file_path, 'w', encoding='utf-8') as f:
+            f.write(code_content)
+        
+        file_size = len(code_content)
+        line_count = code_content.count('\n') + 1
+        
+        await interaction.followup.send(
+            f"✅ تم إنشاء الملف بنجاح!\n"
+            f"📄 الاسم: `{filename}`\n"
+            f"📊 الحجم: {file_size} حرف\n"
+            f"📝 عدد الأسطر: {line_count}\n\n"
+            f"يمكنك قراءة محتوى الملف باستخدام `/readfile {filename}`",
+            file=discord.File(file_path, filename=filename)
+        )
+    
+    except RateLimited as e:
+        await interaction.followup.send(rate_limit_message(e))
+    except ModelUnavailable:
+        await interaction.followup.send(MODEL_UNAVAILABLE_MESSAGE)
+    except Exception as e:
+        logger.error(f"خطأ في إنشاء الملف: {e}")
+        await interaction.followup.send(f"❌ حدث خطأ في إنشاء الملف: {str(e)}")
+
+@bot.tree.command(name="listfiles", description="عرض جميع الملفات المنشأة (للمشرفين فقط)")
+@app_commands.default_permissions(administrator=True)
+async def listfiles(interaction: discord.Interaction):
+    try:
+        files = get_all_user_files()
+        
+        if not files:
+            await interaction.response.send_message("ℹ️ لا توجد ملفات منشأة بعد.")
+            return
+        
+        files_list = "\n".join([f"• `{f}`" for f in files])
+        total_size = sum([os.path.getsize(USER_FILES_DIR / f) for f in files])
+        
+        await interaction.response.send_message(
+            f"📁 **الملفات المنشأة ({len(files)}):**\n{files_list}\n\n"
+            f"📊 **الحجم الإجمالي:** {total_size} بايت"
+        )
+    except Exception as e:
+        logger.error(f"خطأ في عرض الملفات: {e}")
+        await interaction.response.send_message(f"❌ حدث خطأ: {str(e)}")
+
+@bot.tree.command(name="readfile", description="قراءة محتوى ملف (للمشرفين فقط)")
+@app_commands.describe(filename="اسم الملف المراد قراءته")
+@app_commands.default_permissions(administrator=True)
+async def readfile(interaction: discord.Interaction, filename: str):
+    await interaction.response.defer(thinking=True)
+    
+    try:
+        if not is_safe_filename(filename):
+            await interaction.followup.send("❌ اسم الملف غير صالح!")
+            return
+        
+        file_path = get_file_path(filename)
+        
+        if not file_path.exists():
+            await interaction.followup.send(f"❌ الملف `{filename}` غير موجود!")
+            return
+        
+        with open(file_path, 'r', encoding='utf-8') as f:
+            content = f.read()
+        
+        if len(content) > 1900:
+            await interaction.followup.send(
+                f"📄 **الملف:** `{filename}`\n"
+                f"⚠️ الملف كبير جداً للعرض هنا. سيتم إرساله كمرفق.",
+                file=discord.File(file_path, filename=filename)
+            )
+        else:
+            await interaction.followup.send(
+                f"📄 **الملف:** `{filename}`\n```\n{content}\n```",
+                file=discord.File(file_path, filename=filename)
+            )
+    
+    except Exception as e:
+        logger.error(f"خطأ في قراءة الملف: {e}")
+        await interaction.followup.send(f"❌ حدث خطأ: {str(e)}")
+
+@bot.tree.command(name="deletefile", description="حذف ملف (للمشرفين فقط)")
+@app_commands.describe(filename="اسم الملف المراد حذفه")
+@app_commands.default_permissions(administrator=True)
+async def deletefile(interaction: discord.Interaction, filename: str):
+    try:
+        if not is_safe_filename(filename):
+            await interaction.response.send_message("❌ اسم الملف غير صالح!")
+            return
+        
+        file_path = get_file_path(filename)
+        
+        if not file_path.exists():
+            await interaction.response.send_message(f"❌ الملف `{filename}` غير موجود!")
+            return
+        
+        file_path.unlink()
+        await interaction.response.send_message(f"✅ تم حذف الملف `{filename}` بنجاح!")
+    
+    except Exception as e:
+        logger.error(f"خطأ في حذف الملف: {e}")
+        await interaction.response.send_message(f"❌ حدث خطأ: {str(e)}")
+
+def message_content(message):
+    return message.content.replace(f'<@{bot.user.id}>', '').strip()
+
+def image_attachments_of(message):
+    image_attachments = []
+    if message.attachments:
+        for attachment in message.attachments:
+            if attachment.content_type and attachment.content_type.startswith('image/'):
+                image_attachments.append(attachment)
+    return image_attachments
+
+async def reply_to_message(message, content, image_attachments):
+    outcome = 'error'
+    try:
+        with trace('message'):
+            await handle_message(message, content, image_attachments)
+        outcome = 'ok'
+    finally:
+        observe_command('message', message.created_at, outcome)
+
+async def handle_message(message, content, image_attachments):
+    async with message.channel.typing():
+        if not content and not image_attachments:
+            await message.reply("مرحباً! كيف يمكنني مساعدتك؟ 😊\nيمكنك إرسال نص أو صورة أو كليهما!")
+            return
+        
+        if image_attachments and content:
+            steps = detect_image_edit_request(content)
+            if steps:
+                try:
+                    files, reply_text = await process_image_edits(image_attachments, tuple(steps))
+                    if files:
+                        await message.reply(reply_text, files=files)
+                    else:
+                        await message.reply(reply_text)
+                    return
+                except Exception as e:
+                    logger.error(f"خطأ في تعديل الصورة التلقائي: {e}")
+        
+        if not content and image_attachments:
+            content = IMAGE_ANALYSIS_PROMPT
+        
+        try:
+            request = UserRequest(content, image_attachments)
+            await user_requests.run(message.author.id, request, lambda request: answer_message(message, request))
+        except Exception as e:
+            logger.error(f"خطأ في معالجة الرسالة: {e}")
+            await message.reply(f"❌ حدث خطأ: {str(e)}")
+
+async def answer_message(message, request):
+    guild_id = message.guild.id if message.guild else None
+    if STREAM_MODE != 'off':
+        reply = await deliver_stream(
+            mark_output(stream_ai_response(message.author.id, request.prompt, request.attachments, guild_id, message.channel.id), request),
+            outbound.sender(message.channel)
+        )
+        if not reply.sent_messages:
+            await message.reply(EMPTY_RESPONSE_MESSAGE)
+    else:
+        response = await get_ai_response(message.author.id, request.prompt, request.attachments, guild_id, message.channel.id)
+        request.mark_output()
+        await send_long_message(message.channel, response)
+
+async def reply_to_batch(messages):
+    if len(messages) == 1:
+        await reply_to_message(messages[0], message_content(messages[0]), image_attachments_of(messages[0]))
+        return
+    
+    # دفعة من رسائل متتالية: طلب واحد للنموذج ورد واحد على آخر رسالة
+    several_authors = len({message.author.id for message in messages}) > 1
+    lines = []
+    image_attachments = []
+    for message in messages:
+        content = message_content(message)
+        if content:
+            lines.append(f"{message.author.display_name}: {content}" if several_authors else content)
+        image_attachments.extend(image_attachments_of(message))
+    await reply_to_message(messages[-1], "\n".join(lines), image_attachments)
+
+auto_reply_batcher = MessageBatcher(reply_to_batch)
+
+@bot.event
+async def on_app_command_completion(interaction, command):
+    observe_command(command.qualified_name, interaction.created_at, 'ok')
+    end_trace()
+
+@bot.tree.error
+async def on_app_command_error(interaction, error):
+    command = interaction.command.qualified_name if interaction.command else 'unknown'
+    observe_command(command, interaction.created_at, 'error')
+    end_trace()
+    logger.error(f"خطأ في الأمر {command}: {error}")
+
+@bot.event
+async def on_message(message):
+    if message.author == bot.user:
+        return
+    
+    should_reply = False
+    
+    if bot.user in message.mentions:
+        should_reply = True
+    
+    elif message.reference and message.reference.resolved:
+        if message.reference.resolved.author == bot.user:
+            should_reply = True
+    
+    elif message.channel.id in auto_reply_channels:
+        if auto_reply_batcher.enabled:
+            auto_reply_batcher.add(message)
+        else:
+            should_reply = True
+    
+    if should_reply:
+        await reply_to_message(message, message_content(message), image_attachments_of(message))
+    
+    await bot.process_commands(message)
+
+async def run_bot():
+    await health_server.start()
+    await shared_store.start()
+    await conversation_history.start()
+    await vision_index.start()
+    try:
+        async with bot:
+            await bot.start(DISCORD_TOKEN)
+    finally:
+        await auto_reply_batcher.close()
+        await outbound.close()
+        await downloader.close()
+        await conversation_history.close()
+        await shared_store.close()
+        await vision_index.close()
+        await health_server.close()
+        image_executor.shutdown()
+
+def main():
+    if is_supervisor():
+        logger.info("🚀 جاري تشغيل عمليات الشاردات...")
+        asyncio.run(ShardSupervisor(LAUNCHER).run())
+        return
+    logger.info("🚀 جاري تشغيل البوت...")
+    try:
+        asyncio.run(run_bot())
+    except KeyboardInterrupt:
+        pass
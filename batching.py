@@ -0,0 +1,97 @@
+import os
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# off: رد على كل رسالة | author: تجميع رسائل نفس الكاتب في القناة | channel: تجميع القناة كلها
+AUTO_REPLY_BATCH = os.getenv('AUTO_REPLY_BATCH', 'off')
+AUTO_REPLY_BATCH_WINDOW = float(os.getenv('AUTO_REPLY_BATCH_WINDOW', 2.0))
+AUTO_REPLY_BATCH_MAX_MESSAGES = int(os.getenv('AUTO_REPLY_BATCH_MAX_MESSAGES', 5))
+AUTO_REPLY_BATCH_MAX_DELAY = float(os.getenv('AUTO_REPLY_BATCH_MAX_DELAY', 6.0))
+
+
+class PendingBatch:
+    __slots__ = ('messages', 'started', 'handle')
+
+    def __init__(self, started):
+        self.messages = []
+        self.started = started
+        self.handle = None
+
+
+class MessageBatcher:
+    def __init__(self, handler, mode=AUTO_REPLY_BATCH, window=AUTO_REPLY_BATCH_WINDOW,
+                 max_messages=AUTO_REPLY_BATCH_MAX_MESSAGES, max_delay=AUTO_REPLY_BATCH_MAX_DELAY):
+        self.handler = handler
+        self.mode = mode
+        self.window = window
+        self.max_messages = max_messages
+        self.max_delay = max_delay
+        self.batches = 0
+        self.messages = 0
+        self._pending = {}
+        self._tasks = set()
+
+    @property
+    def enabled(self):
+        return self.mode in ('author', 'channel')
+
+    def _key(self, message):
+        if self.mode == 'channel':
+            return message.channel.id
+        return message.channel.id, message.author.id
+
+    def add(self, message):
+        loop = asyncio.get_running_loop()
+        key = self._key(message)
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = self._pending[key] = PendingBatch(loop.time())
+        batch.messages.append(message)
+        self.messages += 1
+
+        if batch.handle is not None:
+            batch.handle.cancel()
+        if len(batch.messages) >= self.max_messages:
+            self._flush(key)
+            return
+        # نافذة هدوء تتجدد مع كل رسالة، لكن لا يتأخر الرد أكثر من max_delay من أول رسالة
+        delay = min(self.window, batch.started + self.max_delay - loop.time())
+        batch.handle = loop.call_later(max(0.0, delay), self._flush, key)
+
+    def _flush(self, key):
+        batch = self._pending.pop(key, None)
+        if batch is None:
+            return
+        if batch.handle is not None:
+            batch.handle.cancel()
+        self.batches += 1
+        task = asyncio.create_task(self._run(batch.messages))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, messages):
+        try:
+            await self.handler(messages)
+        except Exception as e:
+            logger.error(f"خطأ في معالجة دفعة الرسائل: {e}")
+
+    async def close(self):
+        for batch in self._pending.values():
+            if batch.handle is not None:
+                batch.handle.cancel()
+        self._pending.clear()
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self):
+        return {
+            'mode': self.mode,
+            'waiting': sum(len(batch.messages) for batch in self._pending.values()),
+            'batches': self.batches,
+            'messages': self.messages,
+            'saved_calls': self.messages - self.batches - sum(len(b.messages) for b in self._pending.values()),
+        }
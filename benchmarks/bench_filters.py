@@ -0,0 +1,77 @@
+import argparse
+import os
+import sys
+import time
+
+from PIL import Image, ImageEnhance, ImageFilter, ImageOps
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from image_filters import FILTERS, apply_filter  # noqa: E402
+
+
+def legacy_apply_filter(image, filter_type):
+    # نسخة من التنفيذ القديم (حلقات بكسل ببايثون) للمقارنة فقط
+    if filter_type == "blur":
+        return image.filter(ImageFilter.BLUR)
+    elif filter_type == "sharpen":
+        return image.filter(ImageFilter.SHARPEN)
+    elif filter_type == "grayscale":
+        return ImageOps.grayscale(image).convert("RGB")
+    elif filter_type == "sepia":
+        grayscale = ImageOps.grayscale(image)
+        sepia = Image.new("RGB", image.size)
+        pixels = sepia.load()
+        gray_pixels = grayscale.load()
+        for i in range(image.size[0]):
+            for j in range(image.size[1]):
+                gray = gray_pixels[i, j]
+                pixels[i, j] = (int(gray * 1.0), int(gray * 0.95), int(gray * 0.82))
+        return sepia
+    elif filter_type == "bright":
+        return ImageEnhance.Brightness(image).enhance(1.5)
+    elif filter_type == "contrast":
+        return ImageEnhance.Contrast(image).enhance(1.5)
+    return image
+
+
+def make_image(megapixels):
+    side = int((megapixels * 1_000_000) ** 0.5)
+    gradient = Image.linear_gradient('L').resize((side, side))
+    noise = Image.effect_noise((side, side), 64)
+    return Image.merge('RGB', (gradient, noise, gradient.transpose(Image.Transpose.ROTATE_90)))
+
+
+def measure(func, image, filter_type, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(image, filter_type)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="قياس تكلفة كل فلتر لكل ميغابكسل (قبل/بعد)")
+    parser.add_argument('--megapixels', type=float, default=2.0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--check', action='store_true', help="التحقق من تطابق المخرجات مع التنفيذ القديم")
+    args = parser.parse_args()
+
+    image = make_image(args.megapixels)
+    mp = image.width * image.height / 1_000_000
+
+    print(f"image: {image.width}x{image.height} ({mp:.2f} MP)")
+    print(f"{'filter':<12}{'before ms/MP':>14}{'after ms/MP':>14}{'speedup':>10}")
+    for name in FILTERS:
+        before = measure(legacy_apply_filter, image, name, args.repeat) * 1000 / mp
+        after = measure(apply_filter, image, name, args.repeat) * 1000 / mp
+        print(f"{name:<12}{before:>14.2f}{after:>14.2f}{before / after:>9.1f}x")
+        if args.check:
+            same = legacy_apply_filter(image, name).tobytes() == apply_filter(image, name).tobytes()
+            print(f"{'':<12}identical output: {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import intent_matcher  # noqa: E402
+from intent_matcher import match_intent  # noqa: E402
+from corpus import make_corpus  # noqa: E402
+
+NAME_INTENTS = {'name_question'}
+EDIT_INTENTS = {'rotate', 'filter'}
+
+
+def legacy_check_name_question(text):
+    name_patterns = [
+        'وش اسمك', 'ماهو اسمك', 'شو اسمك', 'شنو اسمك',
+        'ما اسمك', 'ايش اسمك', 'وين اسمك',
+        'what is your name', 'whats your name', "what's your name",
+        'who are you', 'your name'
+    ]
+    text_lower = text.lower().strip()
+    for pattern in name_patterns:
+        if pattern in text_lower:
+            return True
+    return False
+
+
+def legacy_detect_image_edit_request(text):
+    if not text:
+        return None, None
+    text_lower = text.lower().strip()
+    rotate_patterns = [
+        ('دور', 'rotate'), ('دوره', 'rotate'), ('دورها', 'rotate'),
+        ('لف', 'rotate'), ('لفه', 'rotate'), ('لفها', 'rotate'),
+        ('rotate', 'rotate'), ('turn', 'rotate')
+    ]
+    for ar, en in rotate_patterns:
+        if ar in text_lower:
+            if '90' in text_lower:
+                return 'rotate', 90
+            elif '180' in text_lower:
+                return 'rotate', 180
+            elif '270' in text_lower:
+                return 'rotate', 270
+            else:
+                return 'rotate', 90
+    filter_patterns = {
+        'أبيض وأسود': 'grayscale', 'ابيض واسود': 'grayscale', 'black and white': 'grayscale',
+        'grayscale': 'grayscale', 'رمادي': 'grayscale',
+        'سيبيا': 'sepia', 'sepia': 'sepia', 'قديم': 'sepia',
+        'ضبابي': 'blur', 'blur': 'blur', 'تضبيب': 'blur',
+        'حاد': 'sharpen', 'sharpen': 'sharpen', 'واضح': 'sharpen',
+        'ساطع': 'bright', 'bright': 'bright', 'فاتح': 'bright', 'أفتح': 'bright',
+        'تباين': 'contrast', 'contrast': 'contrast'
+    }
+    for pattern, filter_type in filter_patterns.items():
+        if pattern in text_lower:
+            return 'filter', filter_type
+    return None, None
+
+
+def legacy(text):
+    return legacy_check_name_question(text), legacy_detect_image_edit_request(text)
+
+
+def compiled(text):
+    # بدون الاستفادة من تكرار نفس الرسالة في المجموعة؛ المسح يُشارك فقط بين الاستدعاءين
+    intent_matcher._scan.cache_clear()
+    intent = match_intent(text, EDIT_INTENTS)
+    edit = (intent.name, intent.param) if intent else (None, None)
+    return match_intent(text, NAME_INTENTS) is not None, edit
+
+
+def measure(func, corpus, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in corpus:
+            func(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="قياس سرعة مطابقة النوايا على مجموعة رسائل")
+    parser.add_argument('--size', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--show-diff', type=int, default=10, help="عدد أمثلة الاختلاف المعروضة")
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.size)
+    total_chars = sum(len(text) for text in corpus)
+    print(f"corpus: {len(corpus)} messages, {total_chars / len(corpus):.0f} chars avg")
+
+    for name, func in (('legacy', legacy), ('compiled', compiled)):
+        elapsed = measure(func, corpus, args.repeat)
+        print(f"{name:<10}{len(corpus) / elapsed:>12.0f} msg/s{elapsed * 1e6 / len(corpus):>10.2f} us/msg")
+
+    diffs = {}
+    for text in corpus:
+        old, new = legacy(text), compiled(text)
+        if old != new:
+            diffs.setdefault(text, (old, new))
+    print(f"distinct messages with different results: {len(diffs)}")
+    # الرسائل القصيرة أولاً لأنها أسهل في المراجعة
+    for text, (old, new) in sorted(diffs.items(), key=lambda item: len(item[0]))[:args.show_diff]:
+        print(f"  {text!r}\n    legacy={old} compiled={new}")
+
+
+if __name__ == "__main__":
+    main()
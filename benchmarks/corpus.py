@@ -0,0 +1,60 @@
+import random
+
+ARABIC_MESSAGES = [
+    "السلام عليكم، كيف حالكم اليوم؟",
+    "ممكن أحد يشرح لي الدورة القادمة متى تبدأ؟",
+    "مين فاز في الدوري السعودي أمس؟",
+    "دورها 90 لو سمحت",
+    "لفها 180",
+    "خليها أبيض وأسود",
+    "أبغى الصورة تكون سيبيا",
+    "وش اسمك؟",
+    "ما هو اسمك يا بوت",
+    "اكتب لي كود بايثون يحسب مجموع الأرقام من 1 إلى 100",
+    "ليش الكود هذا ما يشتغل؟ يطلع لي خطأ في السطر الثالث",
+    "الصورة مو واضحة، ممكن توضحها؟",
+    "هذا الموضوع قديم جداً",
+    "خليها ساطعة شوي",
+    "زود التباين",
+    "ترجم لي هذي الجملة للإنجليزي",
+    "عندي سؤال عن الرياضيات: كم جذر 144؟",
+    "ودورها ٢٧٠ درجة",
+    "خلّيها رماديّة",
+    "أحتاج مساعدة في واجب الفيزياء عن الحركة الدائرية",
+]
+
+ENGLISH_MESSAGES = [
+    "hey, what's up?",
+    "what is your name?",
+    "who are you anyway",
+    "rotate it 180 please",
+    "turn it black and white",
+    "can you make this sepia",
+    "please blur the background",
+    "explain how a hash map works",
+    "write a python function that reverses a linked list",
+    "it's my turn to ask a question: how do transformers work?",
+    "make it brighter and increase the contrast",
+    "what's the capital of Australia?",
+    "sharpen this photo",
+    "turn 270",
+    "I need help debugging my discord bot, it keeps disconnecting",
+]
+
+FILLERS = [
+    "", " 🙏", " شكراً", " please", " بسرعة", " ولا يهمك", " lol", " ؟؟",
+    " وبعدين ابغى اعرف اكثر عن الموضوع", " and also tell me more about it",
+]
+
+
+def make_corpus(size, seed=1234):
+    rng = random.Random(seed)
+    messages = ARABIC_MESSAGES + ENGLISH_MESSAGES
+    corpus = []
+    for _ in range(size):
+        text = rng.choice(messages) + rng.choice(FILLERS)
+        if rng.random() < 0.15:
+            # رسائل طويلة (لصق سجلات أو أكواد) كما يحدث فعلاً في القنوات
+            text += "\n" + " ".join(rng.choice(messages) for _ in range(rng.randint(5, 40)))
+        corpus.append(text)
+    return corpus
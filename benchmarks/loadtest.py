@@ -0,0 +1,735 @@
+import argparse
+import asyncio
+import io
+import itertools
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+
+import aiohttp
+from aiohttp import web
+import discord
+from discord import app_commands
+from google.api_core import exceptions as google_exceptions
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_filters import make_image  # noqa: E402
+from corpus import make_corpus  # noqa: E402
+
+SCENARIOS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scenarios')
+BOT_USER_ID = 1000
+
+# قيم افتراضية لكل ملف سيناريو؛ الملف يغيّر ما يحتاجه فقط
+DEFAULTS = {
+    'duration': 30,
+    'rate': 100,
+    'warmup': 3,
+    'drain_timeout': 60,
+    'max_in_flight': 5000,
+    'sample_interval': 1.0,
+    'users': 500,
+    'guilds': 5,
+    'channels': 100,
+    'auto_reply_channels': 10,
+    'mix': {'mention_text': 1},
+    'model': {
+        'latency': 0.8,
+        'jitter': 0.5,
+        'vision_latency': 0.6,
+        'first_token': 0.25,
+        'chunks': 6,
+        'chars': 600,
+        'error_rate': 0.0,
+        'retryable_ratio': 0.8,
+        'stream_error_rate': 0.0,
+    },
+    'discord': {
+        'api_latency': 0.05,
+        'jitter': 0.5,
+        'burst': 5,
+        'period': 5.0,
+        'rate_limit_rate': 0.0,
+        'retry_after': 1.0,
+    },
+    'images': {'count': 8, 'megapixels': 0.5, 'quality': 85},
+    'env': {},
+}
+
+# بيئة تناسب الحمل الاصطناعي: بلا حدود Gemini لكل مستخدم وبلا إعادة محاولة طويلة
+BASE_ENV = {
+    'DISCORD_TOKEN': 'loadtest',
+    'GEMINI_API_KEY': 'loadtest',
+    'GEMINI_USER_RPM': '0',
+    'GEMINI_GUILD_RPM': '0',
+    'GEMINI_BACKOFF_BASE': '0.05',
+    'METRICS': 'on',
+    'TRACE_SLOW_SECONDS': '1000000',
+}
+
+EDIT_PROMPTS = ["rotate 90", "لفها 180", "خليها ابيض واسود", "blur", "sharpen then rotate 90"]
+VISION_PROMPTS = ["", "ما الذي في هذه الصورة؟", "describe this image", "اقرأ النص في الصورة"]
+SLASH_EDIT_STEPS = ["rotate 90 | grayscale | resize 800x600", "blur then bright then contrast", "sharpen > rotate 270"]
+
+
+def load_scenario(path):
+    with open(path, encoding='utf-8') as f:
+        scenario = json.load(f)
+    merged = {}
+    for key, default in DEFAULTS.items():
+        value = scenario.get(key, default)
+        if isinstance(default, dict) and key not in ('mix', 'env'):
+            value = {**default, **value}
+        merged[key] = value
+    merged['name'] = scenario.get('name', os.path.splitext(os.path.basename(path))[0])
+    return merged
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, round(p / 100 * len(values) + 0.5) - 1))
+    return values[index]
+
+
+def current_rss_bytes():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def slope(points):
+    # ميل أقل المربعات (بايت/ثانية)؛ أدق من الفرق بين أول وآخر عينة
+    if len(points) < 2:
+        return 0.0
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    denominator = sum((x - mean_x) ** 2 for x, _ in points)
+    if not denominator:
+        return 0.0
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / denominator
+
+
+def jittered(rng, value, jitter):
+    return max(0.0, value * (1 + rng.uniform(-jitter, jitter)))
+
+
+# --- بديل Gemini ---
+
+class FakeChunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    def __init__(self, config, rng, corpus):
+        self.config = config
+        self.rng = rng
+        self.corpus = corpus
+        self.calls = 0
+        self.streams = 0
+        self.errors = Counter()
+
+    def _latency(self, contents):
+        latency = jittered(self.rng, self.config['latency'], self.config['jitter'])
+        parts = contents[-1]['parts'] if contents else ()
+        if any(not isinstance(part, str) for part in parts):
+            latency += jittered(self.rng, self.config['vision_latency'], self.config['jitter'])
+        return latency
+
+    def _maybe_fail(self):
+        if self.rng.random() >= self.config['error_rate']:
+            return
+        if self.rng.random() < self.config['retryable_ratio']:
+            self.errors['retryable'] += 1
+            raise google_exceptions.ServiceUnavailable("fake model overloaded")
+        self.errors['fatal'] += 1
+        raise google_exceptions.InvalidArgument("fake model rejected the request")
+
+    def _text(self):
+        size = max(1, int(jittered(self.rng, self.config['chars'], self.config['jitter'])))
+        parts, total = [], 0
+        while total < size:
+            text = self.rng.choice(self.corpus)
+            parts.append(text)
+            total += len(text) + 1
+        return ' '.join(parts)[:size]
+
+    async def generate_content_async(self, contents, stream=False):
+        self.calls += 1
+        latency = self._latency(contents)
+        if stream:
+            self.streams += 1
+            # الخطأ قبل أول جزء يمكن إعادة محاولته؛ بعده يصل للمستخدم كنص ناقص
+            await asyncio.sleep(min(latency, self.config['first_token']))
+            self._maybe_fail()
+            return self._stream(self._text(), max(0.0, latency - self.config['first_token']))
+        await asyncio.sleep(latency)
+        self._maybe_fail()
+        return FakeChunk(self._text())
+
+    async def _stream(self, text, remaining):
+        count = max(1, self.config['chunks'])
+        size = -(-len(text) // count)
+        for i in range(count):
+            if i:
+                await asyncio.sleep(remaining / (count - 1))
+                if self.rng.random() < self.config['stream_error_rate'] / count:
+                    self.errors['stream'] += 1
+                    raise google_exceptions.ServiceUnavailable("fake stream interrupted")
+            yield FakeChunk(text[i * size:(i + 1) * size])
+
+
+# --- بديل Discord ---
+
+class FakeUser:
+    def __init__(self, user_id, name, bot=False):
+        self.id = user_id
+        self.name = name
+        self.display_name = name
+        self.bot = bot
+        self.mention = f'<@{user_id}>'
+
+    def __str__(self):
+        return self.name
+
+
+class FakeGuild:
+    def __init__(self, guild_id):
+        self.id = guild_id
+
+
+class FakeChannel:
+    def __init__(self, layer, channel_id, guild):
+        self.layer = layer
+        self.id = channel_id
+        self.guild = guild
+
+    async def send(self, content=None, **kwargs):
+        return await self.layer.send(self, content, kwargs)
+
+    def typing(self):
+        return self.layer.typing(self)
+
+
+class FakeReference:
+    def __init__(self, resolved):
+        self.resolved = resolved
+
+
+class FakeMessage:
+    def __init__(self, layer, channel, author, content, attachments=(), mentions=(), reference=None):
+        self.layer = layer
+        self.id = next(layer.ids)
+        self.channel = channel
+        self.guild = channel.guild if channel is not None else None
+        self.author = author
+        self.content = content
+        self.attachments = list(attachments)
+        self.mentions = list(mentions)
+        self.reference = reference
+        self.created_at = discord.utils.utcnow()
+
+    async def reply(self, content=None, **kwargs):
+        return await self.layer.send(self.channel, content, kwargs)
+
+    async def edit(self, content=None, **kwargs):
+        await self.layer.edit(self)
+        self.content = content
+        return self
+
+
+class FakeAttachment:
+    def __init__(self, layer, url, filename, size):
+        self.layer = layer
+        self.id = next(layer.ids)
+        self.url = url
+        self.filename = filename
+        self.content_type = 'image/jpeg'
+        self.size = size
+
+    async def read(self):
+        # مثل Attachment.read(): طلب HTTP حقيقي لعنوان المرفق
+        return await self.layer.fetch(self.url)
+
+
+class FakeInteractionResponse:
+    def __init__(self, layer):
+        self.layer = layer
+        self._done = False
+
+    def is_done(self):
+        return self._done
+
+    async def defer(self, thinking=False, ephemeral=False):
+        await self.layer.api()
+        self._done = True
+
+    async def send_message(self, content=None, **kwargs):
+        await self.layer.api()
+        self.layer.sends += 1
+        self._done = True
+
+
+class FakeWebhook:
+    def __init__(self, layer):
+        self.layer = layer
+
+    async def send(self, content=None, **kwargs):
+        # الردود اللاحقة عبر webhook التفاعل لا تخضع لحد القناة
+        return await self.layer.send(None, content, kwargs)
+
+
+class FakeInteraction:
+    def __init__(self, layer, channel, user, command):
+        self.id = next(layer.ids)
+        self.type = discord.InteractionType.application_command
+        self.data = {'name': command.name}
+        self.command = command
+        self.user = user
+        self.channel = channel
+        self.channel_id = channel.id
+        self.guild_id = channel.guild.id
+        self.created_at = discord.utils.utcnow()
+        self.response = FakeInteractionResponse(layer)
+        self.followup = FakeWebhook(layer)
+
+
+class FakeDiscord:
+    def __init__(self, config, rng, bot_user):
+        self.config = config
+        self.rng = rng
+        self.bot_user = bot_user
+        self.ids = itertools.count(10 ** 17)
+        self.sends = 0
+        self.edits = 0
+        self.files = 0
+        self.rate_limited = 0
+        self.fetches = 0
+        self.session = None
+        self._windows = {}
+
+    async def api(self):
+        await asyncio.sleep(jittered(self.rng, self.config['api_latency'], self.config['jitter']))
+
+    def _check_rate_limit(self, channel_id):
+        # نفس حد Discord للرسائل: burst رسالة كل period ثانية لكل قناة
+        now = time.monotonic()
+        window = self._windows.setdefault(channel_id, deque())
+        while window and now - window[0] >= self.config['period']:
+            window.popleft()
+        if len(window) >= self.config['burst']:
+            self.rate_limited += 1
+            raise discord.RateLimited(window[0] + self.config['period'] - now)
+        if self.rng.random() < self.config['rate_limit_rate']:
+            self.rate_limited += 1
+            raise discord.RateLimited(self.config['retry_after'])
+        window.append(now)
+
+    async def send(self, channel, content, kwargs):
+        if channel is not None:
+            self._check_rate_limit(channel.id)
+        await self.api()
+        self.sends += 1
+        if kwargs.get('file') is not None or kwargs.get('files'):
+            self.files += 1
+        return FakeMessage(self, channel, self.bot_user, content or '')
+
+    async def edit(self, message):
+        await self.api()
+        self.edits += 1
+
+    @asynccontextmanager
+    async def typing(self, channel):
+        yield
+
+    async def fetch(self, url):
+        self.fetches += 1
+        async with self.session.get(url) as response:
+            response.raise_for_status()
+            return await response.read()
+
+
+class AttachmentServer:
+    # يقدم صور الاختبار كما تقدمها cdn.discordapp.com، فيمر التحميل بمسار HTTP الحقيقي
+    def __init__(self, images):
+        self.images = images
+        self.requests = 0
+        self.url = None
+        self._runner = None
+
+    async def handle(self, request):
+        self.requests += 1
+        index = int(request.match_info['index'])
+        return web.Response(body=self.images[index], content_type='image/jpeg')
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get('/attachments/{index}/{filename}', self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, '127.0.0.1', 0)
+        await site.start()
+        host, port = self._runner.addresses[0][:2]
+        self.url = f'http://{host}:{port}'
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    def attachment_url(self, index):
+        return f'{self.url}/attachments/{index}/image_{index}.jpg'
+
+
+def make_images(config):
+    images = []
+    count = max(1, config['count'])
+    for index in range(count):
+        # تدوير مختلف لكل صورة حتى لا تتطابق بصمتها في فهرس الرؤية
+        image = make_image(config['megapixels']).rotate(index * 360 / count)
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', quality=config['quality'])
+        images.append(buffer.getvalue())
+    return images
+
+
+# --- المحرك ---
+
+class LoadTest:
+    def __init__(self, scenario, main, seed=1):
+        self.scenario = scenario
+        self.main = main
+        self.rng = random.Random(seed)
+        self.corpus = make_corpus(2000, seed=seed)
+        self.bot_user = FakeUser(BOT_USER_ID, 'loadtest-bot', bot=True)
+        self.layer = FakeDiscord(scenario['discord'], self.rng, self.bot_user)
+        self.model = FakeModel(scenario['model'], self.rng, self.corpus)
+        self.server = AttachmentServer(make_images(scenario['images']))
+        self.users = [FakeUser(2000 + i, f'user{i}') for i in range(scenario['users'])]
+        guilds = [FakeGuild(3000 + i) for i in range(scenario['guilds'])]
+        self.channels = [FakeChannel(self.layer, 4000 + i, guilds[i % len(guilds)]) for i in range(scenario['channels'])]
+        self.auto_channels = self.channels[:scenario['auto_reply_channels']]
+        self.mention_channels = self.channels[scenario['auto_reply_channels']:] or self.channels
+        self.latencies = {}
+        self.outcomes = Counter()
+        self.errors = Counter()
+        self.error_samples = {}
+        self.samples = []
+        self.dropped = 0
+        self.timed_out = 0
+        self.tasks = set()
+        self.completed = 0
+
+    # أنواع الأحداث؛ كل منها يستدعي معالج main كما يستدعيه discord.py
+
+    def _text(self):
+        return self.rng.choice(self.corpus)
+
+    def _attachment(self):
+        index = self.rng.randrange(len(self.server.images))
+        return FakeAttachment(self.layer, self.server.attachment_url(index), f'image_{index}.jpg',
+                              len(self.server.images[index]))
+
+    def _message(self, content, channel=None, attachments=(), mention=True, reference=None):
+        channel = channel or self.rng.choice(self.mention_channels)
+        if mention:
+            content = f'<@{BOT_USER_ID}> {content}'.rstrip()
+        return FakeMessage(self.layer, channel, self.rng.choice(self.users), content, attachments,
+                           [self.bot_user] if mention else (), reference)
+
+    async def mention_text(self):
+        await self.main.on_message(self._message(self._text()))
+
+    async def reply_thread(self):
+        resolved = FakeMessage(self.layer, None, self.bot_user, '')
+        await self.main.on_message(self._message(self._text(), mention=False, reference=FakeReference(resolved)))
+
+    async def auto_reply(self):
+        # مع AUTO_REPLY_BATCH يعود on_message فوراً والرد يُقاس من مقاييس الأوامر لا من هنا
+        channel = self.rng.choice(self.auto_channels or self.channels)
+        await self.main.on_message(self._message(self._text(), channel=channel, mention=False))
+
+    async def vision(self):
+        await self.main.on_message(self._message(self.rng.choice(VISION_PROMPTS), attachments=[self._attachment()]))
+
+    async def edit_message(self):
+        await self.main.on_message(self._message(self.rng.choice(EDIT_PROMPTS), attachments=[self._attachment()]))
+
+    async def _slash(self, command, *args):
+        interaction = FakeInteraction(self.layer, self.rng.choice(self.channels), self.rng.choice(self.users), command)
+        await self.main.bot.tree.interaction_check(interaction)
+        try:
+            await command.callback(interaction, *args)
+        except Exception as e:
+            await self.main.on_app_command_error(interaction, e)
+            raise
+        await self.main.on_app_command_completion(interaction, command)
+
+    async def slash_ask(self):
+        await self._slash(self.main.ask, self._text())
+
+    async def slash_rotate(self):
+        degrees = self.rng.choice((90, 180, 270))
+        await self._slash(self.main.rotate, self._attachment(), app_commands.Choice(name=str(degrees), value=degrees))
+
+    async def slash_edit(self):
+        await self._slash(self.main.edit, self._attachment(), self.rng.choice(SLASH_EDIT_STEPS))
+
+    EVENTS = ('mention_text', 'reply_thread', 'auto_reply', 'vision', 'edit_message',
+              'slash_ask', 'slash_rotate', 'slash_edit')
+
+    async def _dispatch(self, kind, scheduled, measured):
+        try:
+            await getattr(self, kind)()
+            self.outcomes['ok'] += 1
+        except Exception as e:
+            self.outcomes['error'] += 1
+            key = f'{kind}: {e.__class__.__name__}'
+            self.errors[key] += 1
+            self.error_samples.setdefault(key, str(e)[:120])
+        finally:
+            self.completed += 1
+        # من اللحظة المجدولة لا لحظة البدء الفعلية، فتأخر حلقة الأحداث يظهر في الزمن
+        if measured:
+            self.latencies.setdefault(kind, []).append(time.monotonic() - scheduled)
+
+    def _sample(self, started):
+        history = self.main.conversation_history.stats()
+        self.samples.append({
+            't': round(time.monotonic() - started, 3),
+            'completed': self.completed,
+            'in_flight': len(self.tasks),
+            'history_users': history['hot_users'],
+            'history_bytes': history['hot_bytes'],
+            'rss_bytes': current_rss_bytes(),
+            'outbound_pending': self.main.outbound.pending,
+            'image_pending': self.main.image_executor.pending,
+        })
+
+    async def _sampler(self, started):
+        while True:
+            self._sample(started)
+            await asyncio.sleep(self.scenario['sample_interval'])
+
+    async def _generate(self, started):
+        mix = {kind: weight for kind, weight in self.scenario['mix'].items() if weight > 0}
+        unknown = set(mix) - set(self.EVENTS)
+        if unknown:
+            raise ValueError(f"unknown event kinds in mix: {', '.join(sorted(unknown))}")
+        kinds, weights = list(mix), list(mix.values())
+        rate, duration, warmup = self.scenario['rate'], self.scenario['duration'], self.scenario['warmup']
+        # وصول مفتوح (Poisson): الأحداث لا تنتظر اكتمال ما قبلها، مثل مستخدمين حقيقيين
+        offset = 0.0
+        while True:
+            offset += self.rng.expovariate(rate)
+            if offset >= duration:
+                return
+            delay = started + offset - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if len(self.tasks) >= self.scenario['max_in_flight']:
+                self.dropped += 1
+                continue
+            kind = self.rng.choices(kinds, weights)[0]
+            task = asyncio.create_task(self._dispatch(kind, started + offset, offset >= warmup))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def run(self):
+        main = self.main
+        main.bot._connection.user = self.bot_user
+        main.model_client.model = self.model
+        # لا توجد أوامر بالبادئة، وget_context يحتاج حالة اتصال حقيقية بالبوابة
+        main.bot.process_commands = ignore_prefix_commands
+        await self.server.start()
+        self.layer.session = aiohttp.ClientSession()
+        await main.shared_store.start()
+        for channel in self.auto_channels:
+            await main.shared_store.set_channel('auto_reply', channel.id, channel.guild.id, True)
+        await main.conversation_history.start()
+        await main.vision_index.start()
+        started = time.monotonic()
+        sampler = asyncio.create_task(self._sampler(started))
+        try:
+            await self._generate(started)
+            generated = time.monotonic()
+            if self.tasks:
+                _, pending = await asyncio.wait(set(self.tasks), timeout=self.scenario['drain_timeout'])
+                self.timed_out = len(pending)
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+            finished = time.monotonic()
+            self._sample(started)
+        finally:
+            sampler.cancel()
+            await main.auto_reply_batcher.close()
+            await main.outbound.close()
+            await main.downloader.close()
+            await main.conversation_history.close()
+            await main.shared_store.close()
+            await main.vision_index.close()
+            await self.layer.session.close()
+            await self.server.close()
+            main.image_executor.shutdown()
+        return self.report(generated - started, finished - started)
+
+    def report(self, generating, elapsed):
+        kinds = {}
+        every = []
+        for kind, values in self.latencies.items():
+            values.sort()
+            every.extend(values)
+            kinds[kind] = latency_summary(values)
+        every.sort()
+        samples = [sample for sample in self.samples if sample['t'] >= self.scenario['warmup']]
+        return {
+            'scenario': self.scenario['name'],
+            'rate': self.scenario['rate'],
+            'duration': round(generating, 3),
+            'elapsed': round(elapsed, 3),
+            'events': self.completed,
+            'dropped': self.dropped,
+            'timed_out': self.timed_out,
+            'offered_rate': round(self.completed / max(1e-9, generating), 2),
+            # ما اكتمل بنجاح على كامل المدة بما فيها تفريغ الطلبات المتبقية
+            'throughput': round(self.outcomes['ok'] / max(1e-9, elapsed), 2),
+            'outcomes': dict(self.outcomes),
+            'errors': {key: {'count': count, 'sample': self.error_samples[key]}
+                       for key, count in self.errors.most_common(20)},
+            'latency': latency_summary(every),
+            'by_kind': kinds,
+            'history': {
+                'start_bytes': samples[0]['history_bytes'] if samples else 0,
+                'end_bytes': samples[-1]['history_bytes'] if samples else 0,
+                'end_users': samples[-1]['history_users'] if samples else 0,
+                'bytes_per_second': round(slope([(s['t'], s['history_bytes']) for s in samples]), 1),
+                'bytes_per_event': round(slope([(s['completed'], s['history_bytes']) for s in samples]), 1),
+                'rss_bytes_per_second': round(slope([(s['t'], s['rss_bytes'] or 0) for s in samples]), 1),
+            },
+            'discord': {
+                'sends': self.layer.sends,
+                'edits': self.layer.edits,
+                'files': self.layer.files,
+                'rate_limited': self.layer.rate_limited,
+                'attachment_requests': self.server.requests,
+            },
+            'model': {
+                'calls': self.model.calls,
+                'streams': self.model.streams,
+                'injected_errors': dict(self.model.errors),
+                **self.main.model_client.stats(),
+            },
+            'outbound': self.main.outbound.stats(),
+            'images': self.main.image_executor.stats(),
+            'samples': self.samples,
+        }
+
+
+async def ignore_prefix_commands(message):
+    return None
+
+
+def latency_summary(values):
+    if not values:
+        return {'count': 0}
+    return {
+        'count': len(values),
+        'p50': round(percentile(values, 50), 4),
+        'p95': round(percentile(values, 95), 4),
+        'p99': round(percentile(values, 99), 4),
+        'max': round(values[-1], 4),
+    }
+
+
+def format_bytes(value):
+    for unit, scale in (('GB', 1 << 30), ('MB', 1 << 20), ('KB', 1 << 10)):
+        if abs(value) >= scale:
+            return f"{value / scale:.1f} {unit}"
+    return f"{value:.0f} B"
+
+
+def print_report(report, out=sys.stdout):
+    def row(name, summary):
+        if not summary.get('count'):
+            print(f"{name:<16}{0:>8}", file=out)
+            return
+        print(f"{name:<16}{summary['count']:>8}" + ''.join(
+            f"{summary[key] * 1000:>10.0f}" for key in ('p50', 'p95', 'p99', 'max')), file=out)
+
+    print(f"scenario {report['scenario']}: {report['events']} events in {report['elapsed']:.1f}s "
+          f"(offered {report['offered_rate']} ev/s, served {report['throughput']} ev/s, {report['dropped']} dropped, {report['timed_out']} timed out)", file=out)
+    print(f"{'kind':<16}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}", file=out)
+    for kind, summary in sorted(report['by_kind'].items()):
+        row(kind, summary)
+    row('all', report['latency'])
+    history = report['history']
+    print(f"conversation_history: {format_bytes(history['start_bytes'])} -> {format_bytes(history['end_bytes'])} "
+          f"({history['end_users']} users, {format_bytes(history['bytes_per_second'])}/s, "
+          f"{format_bytes(history['bytes_per_event'])}/event); RSS {format_bytes(history['rss_bytes_per_second'])}/s", file=out)
+    discord_stats = report['discord']
+    print(f"discord: {discord_stats['sends']} sends, {discord_stats['edits']} edits, {discord_stats['files']} files, "
+          f"{discord_stats['rate_limited']} rate limited", file=out)
+    model = report['model']
+    print(f"model: {model['calls']} calls, {model['retries']} retries, {model['failures']} failures, "
+          f"injected {model['injected_errors']}", file=out)
+    for error, details in report['errors'].items():
+        print(f"  error {error} x{details['count']}: {details['sample']}", file=out)
+
+
+def prepare_environment(scenario, data_dir):
+    # الإعدادات تُقرأ عند استيراد الوحدات، لذا تُضبط البيئة قبل import app
+    env = {
+        **BASE_ENV,
+        'HISTORY_DB_PATH': os.path.join(data_dir, 'history.db'),
+        'SHARED_STORE_PATH': os.path.join(data_dir, 'shared.db'),
+        'VISION_INDEX_PATH': os.path.join(data_dir, 'vision_index.json'),
+        **scenario['env'],
+    }
+    for key, value in env.items():
+        os.environ[key] = str(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="اختبار حمل شامل لمعالجات البوت مع بدائل محلية لـ Discord و Gemini")
+    parser.add_argument('scenario', nargs='?', default=os.path.join(SCENARIOS_DIR, 'mixed.json'),
+                        help="ملف السيناريو (JSON)")
+    parser.add_argument('--rate', type=float, help="أحداث في الثانية بدل قيمة السيناريو")
+    parser.add_argument('--duration', type=float, help="مدة توليد الأحداث بالثواني")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help="حفظ التقرير الكامل مع عينات الذاكرة كـ JSON")
+    parser.add_argument('--log-level', default='CRITICAL', help="مستوى سجلات البوت أثناء الاختبار")
+    args = parser.parse_args()
+
+    scenario = load_scenario(args.scenario)
+    if args.rate:
+        scenario['rate'] = args.rate
+    if args.duration:
+        scenario['duration'] = args.duration
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        prepare_environment(scenario, data_dir)
+        import app as bot_main
+        logging.getLogger().setLevel(args.log_level)
+        report = asyncio.run(LoadTest(scenario, bot_main, args.seed).run())
+
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+
+
+if __name__ == '__main__':
+    main()
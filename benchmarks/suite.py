@@ -0,0 +1,343 @@
+import argparse
+import io
+import json
+import os
+import platform
+import re
+import statistics
+import sys
+import time
+
+import PIL
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import intent_matcher  # noqa: E402
+from bench_filters import make_image  # noqa: E402
+from conversation import Turn, build_contents, new_history  # noqa: E402
+from corpus import make_corpus  # noqa: E402
+from edit_pipeline import parse_edit_chain, steps_from_text  # noqa: E402
+from image_filters import FILTERS, apply_filter  # noqa: E402
+from image_ops import (  # noqa: E402
+    add_text_to_image, crop_image, decode_image, encode_image, image_hash, prepare_vision_image,
+    resize_image, rotate_image, run_pipeline_job,
+)
+from outbound import plan_messages, split_message  # noqa: E402
+from response_cache import response_key  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+TEXT_SIZES = {'1k': 1_000, '64k': 64_000, '1m': 1_000_000, '4m': 4_000_000}
+IMAGE_SIZES = {'0.25mp': 0.25, '1mp': 1.0, '4mp': 4.0}
+QUICK_IMAGE_SIZES = ('1mp',)
+NAME_INTENTS = {'name_question'}
+EDIT_CHAINS = [
+    "rotate 90 | grayscale | resize 800x600",
+    "لفها 180 ثم خليها ابيض واسود",
+    "crop 10 10 500 400 > sharpen > text مرحبا",
+    "blur then bright then contrast",
+]
+
+# كل حالة: اسم ودالة تجهيز تعيد الدالة المقاسة بلا معاملات
+CASES = {}
+
+
+def case(name, quick=True):
+    def register(setup):
+        CASES[name] = (setup, quick)
+        return setup
+    return register
+
+
+def make_text(size):
+    corpus = make_corpus(2000, seed=7)
+    parts, total = [], 0
+    while total < size:
+        for text in corpus:
+            parts.append(text)
+            total += len(text) + 1
+            if total >= size:
+                break
+    return '\n'.join(parts)[:size]
+
+
+def make_history(turn_chars):
+    history = new_history()
+    text = make_text(turn_chars * 2)
+    while len(history) < history.maxlen:
+        history.append(Turn(text[:turn_chars], text[turn_chars:]))
+    return history
+
+
+def jpeg_bytes(image, quality=90):
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=quality)
+    return buffer.getvalue()
+
+
+def register_text_cases():
+    for label, size in TEXT_SIZES.items():
+        @case(f'text/split_message/{label}', quick=size <= 64_000)
+        def setup(size=size):
+            text = make_text(size)
+            return lambda: split_message(text)
+
+    @case('text/plan_messages/8k')
+    def setup_plan():
+        text = make_text(8_000)
+        return lambda: plan_messages(text, mode='auto', attachment_chars=6_000)
+
+
+def register_intent_cases():
+    corpus = []
+
+    def messages():
+        if not corpus:
+            corpus.extend(make_corpus(2000))
+        return corpus
+
+    def per_message(func):
+        def run():
+            # مسح ذاكرة المسح لكل رسالة كي لا يقيس التكرار داخل المجموعة
+            for text in messages():
+                intent_matcher._scan.cache_clear()
+                func(text)
+        return run
+
+    @case('intents/detect_image_edit_request/2000msg')
+    def setup_edit():
+        messages()
+        return per_message(steps_from_text)
+
+    @case('intents/name_question/2000msg')
+    def setup_name():
+        messages()
+        return per_message(lambda text: intent_matcher.match_intent(text, NAME_INTENTS))
+
+    @case('intents/parse_edit_chain')
+    def setup_chain():
+        def run():
+            for chain in EDIT_CHAINS:
+                intent_matcher._scan.cache_clear()
+                parse_edit_chain(chain)
+        return run
+
+
+def register_context_cases():
+    for label, turn_chars in (('short_turns', 200), ('long_turns', 4000)):
+        @case(f'context/build_contents/{label}')
+        def setup(turn_chars=turn_chars):
+            history = make_history(turn_chars)
+            prompt = make_text(500)
+            return lambda: build_contents(history, prompt)
+
+    @case('context/response_key/long_turns')
+    def setup_key():
+        history = make_history(4000)
+        prompt = make_text(500)
+        contents = build_contents(history, prompt)
+        return lambda: response_key(prompt, contents)
+
+
+def register_image_cases():
+    for size_label, megapixels in IMAGE_SIZES.items():
+        quick = size_label in QUICK_IMAGE_SIZES
+
+        def image_case(name, build, megapixels=megapixels, quick=quick, size_label=size_label):
+            @case(f'image/{name}/{size_label}', quick=quick)
+            def setup():
+                image = make_image(megapixels)
+                return build(image)
+
+        for filter_type in FILTERS:
+            image_case(f'filter/{filter_type}', lambda image, f=filter_type: lambda: apply_filter(image, f))
+        image_case('rotate/90', lambda image: lambda: rotate_image(image, 90))
+        image_case('rotate/45', lambda image: lambda: rotate_image(image, 45))
+        image_case('resize/half', lambda image: lambda: resize_image(image, image.width // 2, image.height // 2))
+        image_case('resize/thumbnail', lambda image: lambda: resize_image(image, 256, 256))
+        image_case('crop/center', lambda image: lambda: crop_image(
+            image, image.width // 4, image.height // 4, image.width * 3 // 4, image.height * 3 // 4))
+        image_case('addtext', lambda image: lambda: add_text_to_image(image, "Benchmark نص", (10, 10)))
+        for fmt in ('PNG', 'JPEG', 'WEBP'):
+            image_case(f'encode/{fmt.lower()}', lambda image, fmt=fmt: lambda: encode_image(image, preferred=fmt))
+
+        def bytes_case(name, build, megapixels=megapixels, quick=quick, size_label=size_label):
+            @case(f'image/{name}/{size_label}', quick=quick)
+            def setup():
+                return build(jpeg_bytes(make_image(megapixels)))
+
+        bytes_case('decode/jpeg', lambda data: lambda: decode_image(data))
+        bytes_case('image_hash', lambda data: lambda: image_hash(data))
+        bytes_case('prepare_vision', lambda data: lambda: prepare_vision_image(data))
+        bytes_case('pipeline/rotate_filter', lambda data: lambda: run_pipeline_job(
+            data, (('rotate', (90,)), ('filter', ('sepia',)))))
+        bytes_case('pipeline/resize_first', lambda data: lambda: run_pipeline_job(
+            data, (('resize', (640, 480)), ('filter', ('sharpen',)))))
+
+
+register_text_cases()
+register_intent_cases()
+register_context_cases()
+register_image_cases()
+
+
+def autorange(func, min_time):
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return loops
+        # قفز مباشر للعدد التقريبي الكافي بدل المضاعفة خطوة خطوة
+        loops = max(loops * 2, int(loops * min_time / max(elapsed, 1e-9)))
+
+
+def measure(func, repeat, min_time):
+    func()
+    loops = autorange(func, min_time)
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        samples.append((time.perf_counter() - start) / loops)
+    return {
+        'min': min(samples),
+        'median': statistics.median(samples),
+        'loops': loops,
+        'repeat': repeat,
+    }
+
+
+def select_cases(pattern=None, quick=False, names=None):
+    return [
+        name for name, (_, in_quick) in CASES.items()
+        if (not pattern or re.search(pattern, name)) and (in_quick or not quick)
+        and (names is None or name in names)
+    ]
+
+
+def run_suite(pattern=None, quick=False, repeat=5, min_time=0.05, names=None, out=sys.stdout):
+    selected = [(name, CASES[name][0]) for name in select_cases(pattern, quick, names)]
+    results = {}
+    for name, setup in selected:
+        results[name] = measure(setup(), repeat, min_time)
+        print(f"{name:<48}{format_time(results[name]['min']):>12}{format_time(results[name]['median']):>12}", file=out)
+    return {
+        'meta': {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'pillow': PIL.__version__,
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+            'quick': quick,
+            'repeat': repeat,
+            'min_time': min_time,
+        },
+        'results': results,
+    }
+
+
+def format_time(seconds):
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+
+def compare(baseline, current, threshold, expected=None):
+    # المقارنة على أفضل زمن (min) لأنه الأقل تأثراً بضجيج الجهاز
+    regressions = []
+    rows = []
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            rows.append((name, None, result['min'], None, 'new'))
+            continue
+        ratio = result['min'] / base['min']
+        if ratio > 1 + threshold:
+            status = 'REGRESSION'
+            regressions.append(name)
+        elif ratio < 1 - threshold:
+            status = 'faster'
+        else:
+            status = ''
+        rows.append((name, base['min'], result['min'], ratio, status))
+    expected = set(baseline['results']) if expected is None else set(expected) & set(baseline['results'])
+    missing = sorted(expected - set(current['results']))
+    return rows, regressions, missing
+
+
+def load(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save(path, data):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="مجموعة قياسات الأداء للمسارات الساخنة دون Discord أو Gemini")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    def add_run_options(command):
+        command.add_argument('--filter', help="تعبير نمطي لاختيار الحالات بالاسم")
+        command.add_argument('--quick', action='store_true', help="الأحجام المتوسطة فقط")
+        command.add_argument('--repeat', type=int, default=5)
+        command.add_argument('--min-time', type=float, default=0.05, help="أقل زمن لكل عينة بالثواني")
+
+    run = sub.add_parser('run', help="تشغيل القياسات وحفظها كخط أساس")
+    add_run_options(run)
+    run.add_argument('--output', default=DEFAULT_BASELINE)
+
+    cmp = sub.add_parser('compare', help="مقارنة نتيجة حالية بخط أساس")
+    add_run_options(cmp)
+    cmp.add_argument('--baseline', default=DEFAULT_BASELINE)
+    cmp.add_argument('--current', help="ملف نتائج محفوظ بدل التشغيل الآن")
+    cmp.add_argument('--threshold', type=float, default=0.2, help="نسبة التباطؤ التي تعتبر تراجعاً")
+    cmp.add_argument('--output', help="حفظ النتيجة الحالية أيضاً")
+
+    sub.add_parser('list', help="عرض أسماء الحالات")
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        for name, (_, quick) in CASES.items():
+            print(f"{name}{'' if quick else '  (full only)'}")
+        return
+
+    if args.command == 'run':
+        print(f"{'case':<48}{'min':>12}{'median':>12}")
+        data = run_suite(args.filter, args.quick, args.repeat, args.min_time)
+        save(args.output, data)
+        print(f"saved {len(data['results'])} results to {args.output}")
+        return
+
+    baseline = load(args.baseline)
+    # الحالات الموجودة في خط الأساس فقط، مع الفلتر و --quick إن حُددا
+    expected = select_cases(args.filter, args.quick, set(baseline['results']))
+    if args.current:
+        current = load(args.current)
+    else:
+        print(f"{'case':<48}{'min':>12}{'median':>12}")
+        current = run_suite(names=set(expected), repeat=args.repeat, min_time=args.min_time)
+    if args.output:
+        save(args.output, current)
+
+    rows, regressions, missing = compare(baseline, current, args.threshold, expected)
+    print(f"\n{'case':<48}{'baseline':>12}{'current':>12}{'ratio':>8}  status")
+    for name, base, value, ratio, status in rows:
+        base_text = format_time(base) if base is not None else '-'
+        ratio_text = f"{ratio:.2f}x" if ratio is not None else '-'
+        print(f"{name:<48}{base_text:>12}{format_time(value):>12}{ratio_text:>8}  {status}")
+    for name in missing:
+        print(f"{name:<48}{'':>12}{'-':>12}{'-':>8}  missing")
+    print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    def __init__(self, max_bytes, ttl=None, max_entries=None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        entry = self._entries.get(key)
+        return entry is not None and not self._expired(entry)
+
+    def _expired(self, entry):
+        expires_at = entry[2]
+        return expires_at is not None and expires_at <= time.monotonic()
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.total_bytes -= size
+
+    def get(self, key, default=None):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        if self._expired(entry):
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, key, value, size=1, ttl=None):
+        if size > self.max_bytes:
+            return False
+        if key in self._entries:
+            self._remove(key)
+
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        self._entries[key] = (value, size, expires_at)
+        self.total_bytes += size
+
+        while self.total_bytes > self.max_bytes or (self.max_entries and len(self._entries) > self.max_entries):
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+        return True
+
+    def pop(self, key, default=None):
+        if key not in self._entries:
+            return default
+        value = self._entries[key][0]
+        self._remove(key)
+        return value
+
+    def clear(self):
+        self._entries.clear()
+        self.total_bytes = 0
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'bytes': self.total_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'hit_rate': round(self.hit_rate(), 3),
+        }
@@ -0,0 +1,59 @@
+import os
+import time
+from collections import deque, namedtuple
+
+MAX_HISTORY = int(os.getenv('MAX_HISTORY', 10))
+MAX_CONTEXT_CHARS = int(os.getenv('MAX_CONTEXT_CHARS', 24000))
+MAX_TURN_CHARS = int(os.getenv('MAX_TURN_CHARS', 4000))
+MIN_TRUNCATED_CHARS = 200
+TRUNCATION_MARK = ' …'
+
+# at: وقت الإضافة، لدمج ما كتبته عمليات الشاردات المختلفة لنفس المستخدم بالترتيب (0 للسجلات القديمة)
+Turn = namedtuple('Turn', ['user', 'assistant', 'at'], defaults=(0.0,))
+
+
+def new_history():
+    return deque(maxlen=MAX_HISTORY)
+
+
+def add_turn(history, user, assistant):
+    # deque بحد أقصى: إضافة الدور الجديد تُسقط الأقدم تلقائياً بتكلفة O(1)
+    history.append(Turn(user, assistant, time.time()))
+
+
+def truncate(text, limit):
+    if len(text) <= limit:
+        return text
+    return text[:max(0, limit - len(TRUNCATION_MARK))] + TRUNCATION_MARK
+
+
+def select_turns(history, budget):
+    selected = []
+    remaining = budget
+    for turn in reversed(history):
+        user = truncate(turn.user, MAX_TURN_CHARS)
+        assistant = truncate(turn.assistant, MAX_TURN_CHARS)
+        cost = len(user) + len(assistant)
+        if cost <= remaining:
+            selected.append((user, assistant))
+            remaining -= cost
+            continue
+
+        # أول دور لا يتسع (وهو الأقدم بين المختارة) يُقتطع بدلاً من إسقاطه إن بقي مكان كافٍ
+        if remaining >= MIN_TRUNCATED_CHARS * 2:
+            half = remaining // 2
+            selected.append((truncate(user, half), truncate(assistant, remaining - min(len(user), half))))
+        break
+
+    selected.reverse()
+    return selected
+
+
+def build_contents(history, prompt, images=(), budget=MAX_CONTEXT_CHARS):
+    prompt = truncate(prompt, budget)
+    contents = []
+    for user, assistant in select_turns(history, budget - len(prompt)):
+        contents.append({'role': 'user', 'parts': [user]})
+        contents.append({'role': 'model', 'parts': [assistant]})
+    contents.append({'role': 'user', 'parts': [prompt, *images]})
+    return contents
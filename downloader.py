@@ -0,0 +1,85 @@
+import os
+import logging
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+MAX_DOWNLOAD_BYTES = int(os.getenv('MAX_DOWNLOAD_BYTES', 25 * 1024 * 1024))
+DOWNLOAD_CONNECTIONS = int(os.getenv('DOWNLOAD_CONNECTIONS', 32))
+DOWNLOAD_CONNECTIONS_PER_HOST = int(os.getenv('DOWNLOAD_CONNECTIONS_PER_HOST', 8))
+DOWNLOAD_TIMEOUT = float(os.getenv('DOWNLOAD_TIMEOUT', 30))
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
+class DownloadError(Exception):
+    pass
+
+
+def is_image_content_type(content_type):
+    return bool(content_type) and content_type.split(';', 1)[0].strip().lower().startswith('image/')
+
+
+class ImageDownloader:
+    def __init__(self, max_bytes=MAX_DOWNLOAD_BYTES, limit=DOWNLOAD_CONNECTIONS,
+                 limit_per_host=DOWNLOAD_CONNECTIONS_PER_HOST, timeout=DOWNLOAD_TIMEOUT):
+        self.max_bytes = max_bytes
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.timeout = timeout
+        self._session = None
+
+    def _get_session(self):
+        # جلسة واحدة طويلة العمر على حلقة البوت لإعادة استخدام الاتصالات (DNS/TCP/TLS)
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=300,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def fetch(self, url, max_bytes=None):
+        max_bytes = max_bytes or self.max_bytes
+        session = self._get_session()
+        async with session.get(url) as response:
+            if response.status != 200:
+                raise DownloadError(f"HTTP {response.status}")
+
+            if not is_image_content_type(response.headers.get('Content-Type')):
+                raise DownloadError(f"نوع المحتوى غير مدعوم: {response.headers.get('Content-Type')}")
+
+            content_length = response.headers.get('Content-Length')
+            if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+                raise DownloadError(f"حجم الملف ({content_length} بايت) يتجاوز الحد ({max_bytes} بايت)")
+
+            chunks = []
+            received = 0
+            async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                received += len(chunk)
+                if received > max_bytes:
+                    raise DownloadError(f"حجم الملف يتجاوز الحد ({max_bytes} بايت)")
+                chunks.append(chunk)
+            return b''.join(chunks)
+
+    async def read_attachment(self, attachment, max_bytes=None):
+        # Attachment.read() يستخدم جلسة HTTP الخاصة بـ discord.py
+        max_bytes = max_bytes or self.max_bytes
+        if not is_image_content_type(attachment.content_type):
+            raise DownloadError(f"نوع المحتوى غير مدعوم: {attachment.content_type}")
+        if attachment.size > max_bytes:
+            raise DownloadError(f"حجم الملف ({attachment.size} بايت) يتجاوز الحد ({max_bytes} بايت)")
+        return await attachment.read()
+
+    async def read(self, source, max_bytes=None):
+        if isinstance(source, str):
+            return await self.fetch(source, max_bytes)
+        return await self.read_attachment(source, max_bytes)
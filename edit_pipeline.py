@@ -0,0 +1,118 @@
+import os
+import re
+from image_filters import FILTERS, filter_label
+from intent_matcher import match_all, normalize
+
+MAX_EDIT_STEPS = int(os.getenv('MAX_EDIT_STEPS', 8))
+MAX_DIMENSION = 4000
+EDIT_INTENTS = {'rotate', 'filter'}
+STEP_SEPARATORS = re.compile(r'\s*(?:\||>|→|،|\bthen\b|\bثم\b)\s*')
+NUMBERS = re.compile(r'-?\d+')
+NUMERIC_ARGS = re.compile(r'^[-\d\s,x×]*$')
+
+
+class EditChainError(ValueError):
+    pass
+
+
+def steps_from_text(text):
+    # طلب بلغة طبيعية: كل نية تعديل تصبح خطوة بترتيب ظهورها في الرسالة
+    steps = []
+    for intent in match_all(text, EDIT_INTENTS):
+        step = (intent.name, (intent.param,))
+        if not steps or steps[-1] != step:
+            steps.append(step)
+    return steps[:MAX_EDIT_STEPS]
+
+
+def _numbers(text, count, name):
+    values = [int(value) for value in NUMBERS.findall(normalize(text))]
+    if len(values) != count:
+        raise EditChainError(f"❌ الخطوة `{name}` تحتاج {count} أرقام")
+    return values
+
+
+def parse_step(text):
+    words = text.split(maxsplit=1)
+    if not words:
+        return []
+    name = words[0].lower()
+    rest = words[1] if len(words) > 1 else ''
+    if name in ('rotate', 'resize', 'crop') and not NUMERIC_ARGS.match(normalize(rest)):
+        # "rotate 90 and grayscale": ليست صيغة أمر بسيطة، فتُفهم كلغة طبيعية
+        name = None
+    step = _parse_command(name, rest) if name else None
+    if step:
+        return [step]
+
+    # ليست صيغة أمر: نجرب فهمها كطلب بلغة طبيعية ("خليها ابيض واسود")
+    steps = steps_from_text(text)
+    if steps:
+        return steps
+    raise EditChainError(f"❌ خطوة غير مفهومة: `{text}`")
+
+
+def _parse_command(name, rest):
+    if name in FILTERS:
+        return 'filter', (name,)
+    if name == 'filter':
+        if rest.strip().lower() not in FILTERS:
+            raise EditChainError(f"❌ فلتر غير معروف: `{rest.strip()}`")
+        return 'filter', (rest.strip().lower(),)
+    if name == 'rotate':
+        degrees = _numbers(rest, 1, name)[0] if rest.strip() else 90
+        if not -360 < degrees < 360:
+            raise EditChainError("❌ زاوية التدوير يجب أن تكون بين -359 و 359")
+        return 'rotate', (degrees,)
+    if name == 'resize':
+        width, height = _numbers(rest, 2, name)
+        if not (1 <= width <= MAX_DIMENSION and 1 <= height <= MAX_DIMENSION):
+            raise EditChainError(f"❌ الأبعاد يجب أن تكون بين 1 و {MAX_DIMENSION} بكسل!")
+        return 'resize', (width, height)
+    if name == 'crop':
+        return 'crop', tuple(_numbers(rest, 4, name))
+    if name == 'text':
+        if not rest.strip():
+            raise EditChainError("❌ الخطوة `text` تحتاج نصاً")
+        return 'addtext', (rest.strip(), 10, 10)
+    return None
+
+
+def parse_edit_chain(text):
+    steps = []
+    for part in STEP_SEPARATORS.split(text.strip()):
+        steps.extend(parse_step(part))
+    if not steps:
+        raise EditChainError("❌ لم أجد أي خطوة تعديل")
+    if len(steps) > MAX_EDIT_STEPS:
+        raise EditChainError(f"❌ الحد الأقصى {MAX_EDIT_STEPS} خطوات في السلسلة")
+    return tuple(steps)
+
+
+def describe_step(operation, args):
+    if operation == 'rotate':
+        return f"تدوير {args[0]} درجة"
+    if operation == 'filter':
+        return f"فلتر {filter_label(args[0])}"
+    if operation == 'resize':
+        return f"تغيير الحجم إلى {args[0]}x{args[1]}"
+    if operation == 'crop':
+        return "قص"
+    if operation == 'addtext':
+        return "إضافة نص"
+    return operation
+
+
+def describe_steps(steps):
+    return " ثم ".join(describe_step(operation, args) for operation, args in steps)
+
+
+def steps_filename(steps):
+    # الأسماء القديمة للتعديل الواحد تبقى كما هي
+    if len(steps) == 1:
+        operation, args = steps[0]
+        if operation == 'rotate':
+            return f"rotated_{args[0]}"
+        if operation == 'filter':
+            return f"filtered_{args[0]}"
+    return "edited"
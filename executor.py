@@ -0,0 +1,155 @@
+import os
+import time
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from metrics import record_stages
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXECUTOR = os.getenv('IMAGE_EXECUTOR', 'process')
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', min(4, os.cpu_count() or 1)))
+IMAGE_QUEUE_SIZE = int(os.getenv('IMAGE_QUEUE_SIZE', IMAGE_WORKERS * 4))
+IMAGE_JOB_TIMEOUT = float(os.getenv('IMAGE_JOB_TIMEOUT', 60))
+
+
+def peak_rss_bytes():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def reset_peak_rss():
+    # Linux: كتابة 5 في clear_refs تعيد عداد أعلى RSS، فيصبح القياس لكل مهمة لا لعمر العملية
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def measured_call(func, args):
+    # وقت البدء بساعة النظام لأنها مشتركة بين العمليات، ومنه يُحسب وقت الانتظار في الطابور
+    started = time.time()
+    reset_peak_rss()
+    result = func(*args)
+    return result, peak_rss_bytes(), started
+
+
+def timed_call(func, args):
+    started = time.time()
+    return func(*args), started
+
+
+class ExecutorBusy(Exception):
+    pass
+
+
+class JobTimeout(Exception):
+    pass
+
+
+class ImageExecutor:
+    def __init__(self, backend=IMAGE_EXECUTOR, workers=IMAGE_WORKERS,
+                 queue_size=IMAGE_QUEUE_SIZE, timeout=IMAGE_JOB_TIMEOUT):
+        self.backend = backend
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.last_peak_rss = 0
+        self.max_peak_rss = 0
+        self._pool = None
+
+    def _get_pool(self):
+        if self._pool is None:
+            if self.backend == 'process':
+                # spawn بدلاً من fork: العامل لا يرث حالة البوت وحلقة الأحداث. spawn يعيد تنفيذ ملف التشغيل
+                # باسم __mp_main__، لذا main.py مجرد نقطة تشغيل والبوت في app.py، فيستورد العامل image_ops فقط
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                )
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='image')
+        return self._pool
+
+    def _job_done(self, loop):
+        # تُستدعى من خيط المجمع عندما تنتهي المهمة فعلاً، لا عند انتهاء مهلة انتظارها
+        def release(_):
+            try:
+                loop.call_soon_threadsafe(self._release)
+            except RuntimeError:
+                # الحلقة أُغلقت أثناء الإيقاف
+                pass
+        return release
+
+    def _release(self):
+        self.pending -= 1
+
+    async def run(self, func, *args, timeout=None):
+        if self.pending >= self.queue_size:
+            self.rejected += 1
+            raise ExecutorBusy()
+
+        timeout = self.timeout if timeout is None else min(timeout, self.timeout)
+        loop = asyncio.get_running_loop()
+        self.pending += 1
+        job = None
+        try:
+            # إلغاء المهمة (انتهاء المهلة أو صلاحية التفاعل) يلغي الطلب إن لم يبدأ تنفيذه بعد
+            submitted = time.time()
+            # كل عامل عملية مستقلة، فذروة RSS فيه تخص هذه المهمة وحدها
+            call = measured_call if self.backend == 'process' else timed_call
+            job = self._get_pool().submit(call, func, args)
+            # مهمة بدأت قبل انتهاء المهلة تظل تشغل عاملاً، فتبقى محسوبة في pending حتى تنتهي
+            job.add_done_callback(self._job_done(loop))
+            output = await asyncio.wait_for(asyncio.wrap_future(job), timeout)
+            if self.backend == 'process':
+                result, peak_rss, started = output
+                self.last_peak_rss = peak_rss
+                self.max_peak_rss = max(self.max_peak_rss, peak_rss)
+            else:
+                result, started = output
+            record_stages((('image_queue', max(0.0, started - submitted)),))
+            self.completed += 1
+            return result
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise JobTimeout()
+        except BrokenProcessPool:
+            logger.error("❌ توقفت إحدى عمليات معالجة الصور، سيتم إنشاء مجمع جديد")
+            self._pool = None
+            raise
+        finally:
+            if job is None:
+                self.pending -= 1
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self):
+        return {
+            'backend': self.backend,
+            'workers': self.workers,
+            'pending': self.pending,
+            'queue_size': self.queue_size,
+            'completed': self.completed,
+            'rejected': self.rejected,
+            'timed_out': self.timed_out,
+            'last_peak_rss': self.last_peak_rss,
+            'max_peak_rss': self.max_peak_rss,
+        }
@@ -0,0 +1,115 @@
+import os
+import math
+import time
+import asyncio
+import logging
+from aiohttp import web
+from metrics import REGISTRY, CONTENT_TYPE, METRICS_ENABLED
+
+logger = logging.getLogger(__name__)
+
+HEALTH_HOST = os.getenv('HEALTH_HOST', '0.0.0.0')
+HEALTH_PORT = int(os.getenv('PORT', 5000))
+HEALTH_MAX_LATENCY = float(os.getenv('HEALTH_MAX_LATENCY', 5))
+HEALTH_MAX_LOOP_LAG = float(os.getenv('HEALTH_MAX_LOOP_LAG', 1))
+HEALTH_LAG_INTERVAL = float(os.getenv('HEALTH_LAG_INTERVAL', 0.5))
+HEALTH_MAX_QUEUE = int(os.getenv('HEALTH_MAX_QUEUE', 500))
+
+
+class LoopLagMonitor:
+    # مهمة تنام فترة ثابتة وتقيس كم تأخر استيقاظها: أي تأخير هو وقت كانت فيه الحلقة محجوزة
+    def __init__(self, interval=HEALTH_LAG_INTERVAL):
+        self.interval = interval
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self.lag = max(0.0, time.monotonic() - started - self.interval)
+            self.max_lag = max(self.max_lag, self.lag)
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+class HealthServer:
+    def __init__(self, bot, host=HEALTH_HOST, port=HEALTH_PORT, max_latency=HEALTH_MAX_LATENCY,
+                 max_loop_lag=HEALTH_MAX_LOOP_LAG):
+        self.bot = bot
+        self.host = host
+        self.port = port
+        self.max_latency = max_latency
+        self.max_loop_lag = max_loop_lag
+        self.lag_monitor = LoopLagMonitor()
+        self.started = time.time()
+        self._queues = {}
+        self._runner = None
+        self.app = web.Application()
+        self.app.router.add_get('/', self.handle_root)
+        self.app.router.add_get('/live', self.handle_live)
+        # /health هو مسار فحص Render، فيعكس الجاهزية الفعلية لا مجرد أن العملية حية
+        self.app.router.add_get('/health', self.handle_ready)
+        self.app.router.add_get('/ready', self.handle_ready)
+        if METRICS_ENABLED:
+            self.app.router.add_get('/metrics', self.handle_metrics)
+
+    def add_queue(self, name, depth, limit):
+        self._queues[name] = (depth, limit)
+
+    def readiness(self):
+        checks = {}
+        checks['gateway'] = not self.bot.is_closed() and self.bot.is_ready()
+        latency = self.bot.latency
+        checks['latency'] = math.isfinite(latency) and latency <= self.max_latency
+        checks['loop_lag'] = self.lag_monitor.lag <= self.max_loop_lag
+        # طابور ممتلئ ضغط طبيعي يُرفض عنده العمل الجديد، لا عطل: فشل الفحص هنا يجعل Render يعيد تشغيل بوت
+        # مشغول ويُسقط كل الطلبات الجارية، لذا العمق يُعرض فقط ولا يدخل في الجاهزية
+        queues = {}
+        for name, (depth, limit) in self._queues.items():
+            current = depth()
+            queues[name] = {'depth': current, 'limit': limit, 'full': current >= limit}
+        details = {
+            'latency_ms': round(latency * 1000) if math.isfinite(latency) else None,
+            'loop_lag_ms': round(self.lag_monitor.lag * 1000),
+            'max_loop_lag_ms': round(self.lag_monitor.max_lag * 1000),
+            'queues': queues,
+            'guilds': len(self.bot.guilds),
+            'uptime': round(time.time() - self.started),
+        }
+        return all(checks.values()), checks, details
+
+    async def handle_root(self, request):
+        return web.json_response({'status': 'ok', 'bot': 'running'})
+
+    async def handle_live(self, request):
+        return web.json_response({'status': 'alive'})
+
+    async def handle_ready(self, request):
+        ready, checks, details = self.readiness()
+        body = {'status': 'healthy' if ready else 'unhealthy', 'checks': checks, **details}
+        return web.json_response(body, status=200 if ready else 503)
+
+    async def handle_metrics(self, request):
+        return web.Response(body=REGISTRY.render().encode('utf-8'), headers={'Content-Type': CONTENT_TYPE})
+
+    async def start(self):
+        self.lag_monitor.start()
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info(f"🩺 خادم الفحص يعمل على المنفذ {self.port}")
+
+    async def close(self):
+        await self.lag_monitor.close()
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
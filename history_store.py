@@ -0,0 +1,275 @@
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from conversation import MAX_HISTORY, Turn, new_history, add_turn
+
+logger = logging.getLogger(__name__)
+
+HISTORY_DB_PATH = os.getenv('HISTORY_DB_PATH', 'data/history.db')
+HISTORY_HOT_USERS = int(os.getenv('HISTORY_HOT_USERS', 1000))
+HISTORY_HOT_BYTES = int(os.getenv('HISTORY_HOT_MB', 32)) * 1024 * 1024
+HISTORY_FLUSH_INTERVAL = float(os.getenv('HISTORY_FLUSH_INTERVAL', 2.0))
+
+
+def history_nbytes(history):
+    return sum(len(turn.user.encode('utf-8')) + len(turn.assistant.encode('utf-8')) for turn in history)
+
+
+def merge_turns(*sources, cleared_at=0.0, limit=MAX_HISTORY):
+    # اتحاد نسخ نفس السجل (من القرص ومن كل عملية) مرتباً بوقت الإضافة؛ الدور الموجود في نسختين يبقى مرة واحدة
+    # وما أُضيف قبل آخر مسح للسجل يُسقط حتى لا تعيده عملية لم تعلم بالمسح بعد
+    merged = {}
+    for turns in sources:
+        for turn in turns:
+            turn = Turn(*turn)
+            if not cleared_at or turn.at > cleared_at:
+                merged.setdefault(tuple(turn), turn)
+    return sorted(merged.values(), key=lambda turn: turn.at)[-limit:]
+
+
+class SQLiteHistoryBackend:
+    def __init__(self, path):
+        self.path = path
+        self._conn = None
+
+    def open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS history ('
+            'user_id INTEGER PRIMARY KEY, turns TEXT NOT NULL, updated_at REAL NOT NULL, '
+            'cleared_at REAL NOT NULL DEFAULT 0)'
+        )
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(history)')}
+        if 'cleared_at' not in columns:
+            self._conn.execute('ALTER TABLE history ADD COLUMN cleared_at REAL NOT NULL DEFAULT 0')
+        self._conn.commit()
+
+    def load(self, user_id):
+        row = self._conn.execute('SELECT turns FROM history WHERE user_id = ?', (user_id,)).fetchone()
+        return json.loads(row[0]) if row else []
+
+    def save_many(self, items):
+        # قراءة ثم دمج ثم كتابة في معاملة واحدة: عملية أخرى ربما حفظت أدواراً لنفس المستخدم منذ آخر قراءة
+        now = time.time()
+        saved = {}
+        with self._conn:
+            # BEGIN IMMEDIATE يحجز الكتابة قبل القراءة فلا تتداخل عمليتان بين القراءة والكتابة
+            self._conn.execute('BEGIN IMMEDIATE')
+            for user_id, turns in items:
+                row = self._conn.execute(
+                    'SELECT turns, cleared_at FROM history WHERE user_id = ?', (user_id,)
+                ).fetchone()
+                stored, cleared_at = (json.loads(row[0]), row[1]) if row else ([], 0.0)
+                merged = merge_turns(stored, turns, cleared_at=cleared_at)
+                self._conn.execute(
+                    'INSERT INTO history (user_id, turns, updated_at) VALUES (?, ?, ?) '
+                    'ON CONFLICT(user_id) DO UPDATE SET turns = excluded.turns, updated_at = excluded.updated_at',
+                    (user_id, json.dumps(merged, ensure_ascii=False), now)
+                )
+                saved[user_id] = (merged, cleared_at)
+        return saved
+
+    def clear(self, user_id):
+        # يبقى صف فارغ بوقت المسح بدل الحذف، فلا تُعاد الأدوار الأقدم عند دمج نسخة عملية أخرى
+        now = time.time()
+        with self._conn:
+            row = self._conn.execute('SELECT turns FROM history WHERE user_id = ?', (user_id,)).fetchone()
+            self._conn.execute(
+                'INSERT INTO history (user_id, turns, updated_at, cleared_at) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT(user_id) DO UPDATE SET turns = excluded.turns, updated_at = excluded.updated_at, '
+                'cleared_at = excluded.cleared_at',
+                (user_id, '[]', now, now)
+            )
+        return bool(row and json.loads(row[0]))
+
+    def count(self):
+        return self._conn.execute("SELECT COUNT(*) FROM history WHERE turns != '[]'").fetchone()[0]
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class HistoryStore:
+    def __init__(self, backend=None, max_users=HISTORY_HOT_USERS, max_bytes=HISTORY_HOT_BYTES,
+                 flush_interval=HISTORY_FLUSH_INTERVAL, notify=None):
+        self.backend = backend
+        # notify(user_ids): يُستدعى بعد حفظ سجلات على القرص، لتُبطل العمليات الأخرى نسخها المحلية
+        self.notify = notify
+        self.max_users = max_users
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.hot_bytes = 0
+        self.hot_hits = 0
+        self.cold_loads = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._hot = OrderedDict()
+        self._sizes = {}
+        self._dirty = set()
+        self._pending = {}
+        self._cleared = set()
+        self._flush_task = None
+        # خيط واحد لقاعدة البيانات: كل عمليات القرص متسلسلة وخارج حلقة الأحداث
+        self._db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='history-db')
+
+    def __len__(self):
+        return len(self._hot)
+
+    async def _run_db(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._db_executor, func, *args)
+
+    async def start(self):
+        if self.backend is None:
+            return
+        await self._run_db(self.backend.open)
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        if self.backend is not None:
+            await self.flush()
+            await self._run_db(self.backend.close)
+        self._db_executor.shutdown(wait=True)
+
+    async def get(self, user_id):
+        history = self._hot.get(user_id)
+        if history is not None:
+            self._hot.move_to_end(user_id)
+            self.hot_hits += 1
+            return history
+
+        if user_id in self._pending:
+            turns = self._pending[user_id]
+        elif self.backend is not None:
+            turns = await self._run_db(self.backend.load, user_id)
+            self.cold_loads += 1
+            # ربما حمّل طلب آخر نفس المستخدم أثناء انتظار القرص
+            if user_id in self._hot:
+                return await self.get(user_id)
+        else:
+            turns = []
+
+        history = new_history()
+        history.extend(Turn(*turn) for turn in turns)
+        self._insert(user_id, history)
+        return history
+
+    def _insert(self, user_id, history):
+        self._hot[user_id] = history
+        self._resize(user_id)
+        self._evict()
+
+    def _resize(self, user_id):
+        size = history_nbytes(self._hot[user_id])
+        self.hot_bytes += size - self._sizes.get(user_id, 0)
+        self._sizes[user_id] = size
+
+    def _evict(self):
+        while len(self._hot) > 1 and (len(self._hot) > self.max_users or self.hot_bytes > self.max_bytes):
+            user_id, history = self._hot.popitem(last=False)
+            self.hot_bytes -= self._sizes.pop(user_id, 0)
+            self.evictions += 1
+            if user_id in self._dirty:
+                self._dirty.discard(user_id)
+                if self.backend is not None:
+                    self._pending[user_id] = [tuple(turn) for turn in history]
+
+    async def append(self, user_id, user, assistant):
+        history = await self.get(user_id)
+        add_turn(history, user, assistant)
+        if user_id in self._hot:
+            self._resize(user_id)
+            self._dirty.add(user_id)
+            self._evict()
+        elif self.backend is not None:
+            self._pending[user_id] = [tuple(turn) for turn in history]
+
+    async def clear(self, user_id):
+        existed = bool(self._hot.get(user_id)) or bool(self._pending.get(user_id))
+        if user_id in self._hot:
+            self._hot[user_id].clear()
+            self._resize(user_id)
+        self._dirty.discard(user_id)
+        self._pending.pop(user_id, None)
+        self._cleared.add(user_id)
+        if self.backend is not None:
+            existed = await self._run_db(self.backend.clear, user_id) or existed
+            if self.notify is not None:
+                await self.notify([user_id])
+        return existed
+
+    def invalidate(self, user_id):
+        # عملية أخرى غيّرت سجل المستخدم: تُحذف النسخة المحلية فيُقرأ من القرص في الطلب التالي
+        # ما لم يُحفظ بعد محلياً يبقى، ويُدمج مع ما على القرص عند الحفظ
+        if self.backend is None or user_id in self._dirty or user_id in self._pending:
+            return
+        if self._hot.pop(user_id, None) is not None:
+            self.hot_bytes -= self._sizes.pop(user_id, 0)
+            self.invalidations += 1
+
+    async def flush(self):
+        if self.backend is None:
+            self._dirty.clear()
+            self._pending.clear()
+            return
+        batch = dict(self._pending)
+        for user_id in self._dirty:
+            if user_id in self._hot:
+                batch[user_id] = [tuple(turn) for turn in self._hot[user_id]]
+        self._dirty.clear()
+        self._pending.clear()
+        self._cleared.clear()
+        if batch:
+            try:
+                saved = await self._run_db(self.backend.save_many, list(batch.items()))
+            except Exception as e:
+                logger.error(f"خطأ في حفظ سجل المحادثات: {e}")
+                for user_id, turns in batch.items():
+                    self._pending.setdefault(user_id, turns)
+                return
+            for user_id, (turns, cleared_at) in saved.items():
+                self._refresh(user_id, turns, cleared_at)
+            if self.notify is not None:
+                await self.notify(list(batch))
+
+    def _refresh(self, user_id, turns, cleared_at):
+        # النسخة المحلية تأخذ نتيجة الدمج (أدوار العمليات الأخرى)، مع ما أُضيف محلياً أثناء الحفظ
+        # إلا إن مُسح السجل محلياً أثناء الحفظ
+        history = self._hot.get(user_id)
+        if history is None or user_id in self._cleared:
+            return
+        merged = merge_turns(turns, history, cleared_at=cleared_at)
+        history.clear()
+        history.extend(merged)
+        self._resize(user_id)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def stats(self):
+        return {
+            'hot_users': len(self._hot),
+            'hot_bytes': self.hot_bytes,
+            'dirty': len(self._dirty) + len(self._pending),
+            'hot_hits': self.hot_hits,
+            'cold_loads': self.cold_loads,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+        }
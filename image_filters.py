@@ -0,0 +1,113 @@
+import os
+from PIL import Image, ImageFilter, ImageOps
+
+FILTERS = {}
+# فوق هذا الحجم تُعالج الصورة على شرائح أفقية بدل نسخ وسيطة بحجم الصورة كاملة
+FILTER_TILE_PIXELS = int(float(os.getenv('FILTER_TILE_MEGAPIXELS', 8)) * 1_000_000)
+FILTER_STRIP_PIXELS = 1_000_000
+
+
+def register_filter(name, label, emoji, func, margin=0, tileable=True):
+    # margin: عدد البكسلات المجاورة التي يحتاجها الفلتر عند حدود الشريحة
+    # tileable=False للفلاتر التي تعتمد على إحصاءات الصورة كاملة (مثل التباين)
+    FILTERS[name] = {'label': label, 'emoji': emoji, 'apply': func, 'margin': margin, 'tileable': tileable}
+
+
+def _clip(value):
+    return max(0, min(255, int(value)))
+
+
+def _normalize_mode(image):
+    if image.mode in ('RGB', 'RGBA', 'L'):
+        return image
+    if image.mode in ('LA', 'PA') or 'transparency' in image.info:
+        return image.convert('RGBA')
+    return image.convert('RGB')
+
+
+def _apply_lut(image, lut):
+    # كل القنوات اللونية تمر على نفس الجدول، وقناة الشفافية تبقى كما هي
+    bands = image.getbands()
+    table = []
+    for band in bands:
+        table.extend(range(256) if band == 'A' else lut)
+    return image.point(table)
+
+
+def kernel_filter(kernel):
+    def apply(image):
+        return _normalize_mode(image).filter(kernel)
+    return apply
+
+
+def lut_filter(func):
+    lut = [_clip(func(v)) for v in range(256)]
+
+    def apply(image):
+        return _apply_lut(_normalize_mode(image), lut)
+    return apply
+
+
+def tint_filter(r, g, b):
+    lut = [_clip(v * r) for v in range(256)]
+    lut += [_clip(v * g) for v in range(256)]
+    lut += [_clip(v * b) for v in range(256)]
+
+    def apply(image):
+        return ImageOps.grayscale(image).convert('RGB').point(lut)
+    return apply
+
+
+def _grayscale(image):
+    return ImageOps.grayscale(image).convert('RGB')
+
+
+def _contrast(image, factor=1.5):
+    image = _normalize_mode(image)
+    histogram = image.convert('L').histogram()
+    total = sum(histogram)
+    mean = int(sum(i * count for i, count in enumerate(histogram)) / total + 0.5) if total else 0
+    lut = [_clip(mean + factor * (v - mean)) for v in range(256)]
+    return _apply_lut(image, lut)
+
+
+def kernel_margin(kernel):
+    return kernel.filterargs[0][1] // 2
+
+
+register_filter('blur', 'ضبابي', '🌫️', kernel_filter(ImageFilter.BLUR), margin=kernel_margin(ImageFilter.BLUR))
+register_filter('sharpen', 'حاد', '✨', kernel_filter(ImageFilter.SHARPEN), margin=kernel_margin(ImageFilter.SHARPEN))
+register_filter('grayscale', 'أبيض وأسود', '⚫', _grayscale)
+register_filter('sepia', 'سيبيا', '🟤', tint_filter(1.0, 0.95, 0.82))
+register_filter('bright', 'ساطع', '☀️', lut_filter(lambda v: v * 1.5))
+register_filter('contrast', 'تباين عالي', '🎨', _contrast, tileable=False)
+
+
+def apply_tiled(image, func, margin, strip_pixels=FILTER_STRIP_PIXELS):
+    width, height = image.size
+    strip_height = max(1, strip_pixels // max(1, width))
+    output = None
+    for top in range(0, height, strip_height):
+        bottom = min(height, top + strip_height)
+        # الشريحة تُقص مع هامش من الجيران ثم يُحذف الهامش بعد الفلتر
+        source_top, source_bottom = max(0, top - margin), min(height, bottom + margin)
+        result = func(image.crop((0, source_top, width, source_bottom)))
+        result = result.crop((0, top - source_top, width, top - source_top + bottom - top))
+        if output is None:
+            output = Image.new(result.mode, image.size)
+        output.paste(result, (0, top))
+    return output
+
+
+def apply_filter(image, filter_type, tile_pixels=FILTER_TILE_PIXELS):
+    spec = FILTERS.get(filter_type)
+    if not spec:
+        return image
+    if spec['tileable'] and image.width * image.height > tile_pixels:
+        return apply_tiled(image, spec['apply'], spec['margin'])
+    return spec['apply'](image)
+
+
+def filter_label(filter_type):
+    spec = FILTERS.get(filter_type)
+    return spec['label'] if spec else filter_type
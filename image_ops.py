@@ -0,0 +1,372 @@
+import io
+import os
+import math
+import time
+import hashlib
+from collections import namedtuple
+from PIL import Image, ImageChops, ImageOps, ImageStat
+from image_filters import apply_filter
+
+IMAGE_OUTPUT_FORMAT = os.getenv('IMAGE_OUTPUT_FORMAT', 'auto').upper().replace('JPG', 'JPEG')
+IMAGE_MAX_OUTPUT_BYTES = int(os.getenv('IMAGE_MAX_OUTPUT_BYTES', 8 * 1024 * 1024))
+JPEG_QUALITY = int(os.getenv('JPEG_QUALITY', 90))
+WEBP_QUALITY = int(os.getenv('WEBP_QUALITY', 85))
+QUALITY_STEPS = (85, 75, 65, 50, 35)
+FORMAT_EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp'}
+# النموذج يصغّر الصور داخلياً على أي حال، فلا فائدة من رفع ما هو أكبر من ذلك
+VISION_MAX_SIDE = int(os.getenv('VISION_MAX_SIDE', 1536))
+VISION_JPEG_QUALITY = int(os.getenv('VISION_JPEG_QUALITY', 85))
+IMAGE_MAX_PIXELS = int(float(os.getenv('IMAGE_MAX_MEGAPIXELS', 40)) * 1_000_000)
+IMAGE_MAX_INPUT_BYTES = int(os.getenv('IMAGE_MAX_INPUT_MB', 25)) * 1024 * 1024
+# Pillow نفسه يرفض ما يتجاوز ضعف الحد (DecompressionBombError) كخط دفاع ثانٍ
+Image.MAX_IMAGE_PIXELS = IMAGE_MAX_PIXELS
+ANIMATION_MAX_FRAMES = int(os.getenv('ANIMATION_MAX_FRAMES', 300))
+# مجموع بكسلات كل الإطارات قبل التعديل وبعده؛ الإطارات الخام (حتى 4 بايت للبكسل) تُنسخ
+# نحو ثلاث مرات بين العامل والعملية الرئيسية ومهمة الترميز، فـ 24 ميغابكسل ≈ 300 MB في الذروة
+ANIMATION_MAX_PIXELS = int(float(os.getenv('ANIMATION_MAX_MEGAPIXELS', 24)) * 1_000_000)
+ANIMATED_FORMATS = ('GIF', 'WEBP')
+# value=None: صورة تعتمد على تفاصيل دقيقة (نصوص، لقطات شاشة) أو بلا تفاصيل، فلا تُطابق إلا بالـ digest
+ImageFingerprint = namedtuple('ImageFingerprint', ['digest', 'value', 'thumbnail'])
+HASH_DETAIL_SIZE = 64
+HASH_THUMBNAIL_SIZE = 8
+HASH_MIN_ENERGY = 2.0
+HASH_MIN_BITS = 8
+
+
+class ImageTooLarge(ValueError):
+    pass
+
+
+def open_image(image_data, max_pixels=IMAGE_MAX_PIXELS, max_bytes=IMAGE_MAX_INPUT_BYTES):
+    # فحص الأبعاد من الترويسة قبل فك ترميز أي بكسل
+    if len(image_data) > max_bytes:
+        raise ImageTooLarge(f"image is {len(image_data)} bytes, limit is {max_bytes}")
+    try:
+        img = Image.open(io.BytesIO(image_data))
+    except (Image.DecompressionBombError, Image.DecompressionBombWarning) as e:
+        raise ImageTooLarge(str(e)) from e
+    width, height = img.size
+    if width * height > max_pixels:
+        img.close()
+        raise ImageTooLarge(f"image is {width}x{height}, limit is {max_pixels} pixels")
+    return img
+
+
+def decode_image(image_data, target=None):
+    img = open_image(image_data)
+    if target:
+        # JPEG: فك الترميز بمقياس مصغر مباشرة إن كان الناتج سيُصغّر لاحقاً
+        img.draft(img.mode, target)
+    img.load()
+    return img
+
+
+def image_size(image_data):
+    # Image.open يقرأ الترويسة فقط دون فك ترميز البكسلات
+    with open_image(image_data) as img:
+        return img.size
+
+
+def image_hash(image_data, hash_size=8):
+    # dHash (64 بت) للبحث عن الصور المتقاربة، ومصغّر ملون 8x8 لتأكيد التطابق، و sha256 للتطابق التام
+    digest = hashlib.sha256(image_data).hexdigest()
+    with open_image(image_data) as img:
+        img.draft('RGB', (HASH_DETAIL_SIZE * 2, HASH_DETAIL_SIZE * 2))
+        rgb = img.convert('RGB').resize((HASH_DETAIL_SIZE, HASH_DETAIL_SIZE), Image.Resampling.BOX, reducing_gap=2.0)
+    gray = rgb.convert('L')
+    thumbnail = rgb.resize((HASH_THUMBNAIL_SIZE, HASH_THUMBNAIL_SIZE), Image.Resampling.BOX).tobytes()
+
+    # النصوص تختفي في التصغير: لقطتا شاشة مختلفتان لهما نفس البصمة تقريباً (خلفية واحدة بخطوط رمادية)
+    # لذا تُقاس التفاصيل الضائعة بين 64 و16 بكسل مقارنة بالتباين الباقي في النسخة 16x16
+    coarse = gray.resize((16, 16), Image.Resampling.BOX)
+    lost = ImageStat.Stat(ImageChops.difference(gray, coarse.resize(gray.size, Image.Resampling.NEAREST))).mean[0]
+    energy = ImageStat.Stat(ImageChops.difference(coarse.crop((0, 0, 15, 16)), coarse.crop((1, 0, 16, 16)))).mean[0]
+
+    pixels = gray.resize((hash_size + 1, hash_size), Image.Resampling.BOX).tobytes()
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    bits = value.bit_count()
+    if energy < HASH_MIN_ENERGY or lost > energy or not HASH_MIN_BITS <= bits <= hash_size * hash_size - HASH_MIN_BITS:
+        value = None
+    return ImageFingerprint(digest, value, thumbnail)
+
+
+def rotate_image(image, degrees):
+    if image.mode == 'RGBA':
+        image = image.convert('RGB')
+    return image.rotate(degrees, expand=True)
+
+
+def resize_image(image, width, height):
+    # reducing_gap: تصغير كبير يمر أولاً على reduce() الصحيحة ثم LANCZOS على صورة أصغر بكثير
+    return image.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+
+def crop_image(image, left, top, right, bottom):
+    if not (0 <= left < right <= image.width and 0 <= top < bottom <= image.height):
+        raise ValueError(f"crop box ({left}, {top}, {right}, {bottom}) outside image {image.width}x{image.height}")
+    return image.crop((left, top, right, bottom))
+
+
+def add_text_to_image(image, text, position=(10, 10), color=(255, 255, 255)):
+    from PIL import ImageDraw, ImageFont
+
+    draw = ImageDraw.Draw(image)
+    try:
+        font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 40)
+    except Exception:
+        font = ImageFont.load_default()
+
+    draw.text(position, text, fill=color, font=font)
+    return image
+
+
+def has_alpha(image):
+    return image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info)
+
+
+def choose_format(image, source_format=None, preferred=IMAGE_OUTPUT_FORMAT):
+    alpha = has_alpha(image)
+    if preferred in FORMAT_EXTENSIONS:
+        return 'PNG' if preferred == 'JPEG' and alpha else preferred
+    if alpha:
+        return 'PNG'
+    if source_format in ('JPEG', 'MPO'):
+        return 'JPEG'
+    if source_format == 'WEBP':
+        return 'WEBP'
+    return 'PNG'
+
+
+def _save(image, fmt, quality=None):
+    buffer = io.BytesIO()
+    if fmt == 'JPEG':
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        image.save(buffer, format='JPEG', quality=quality or JPEG_QUALITY, optimize=True)
+    elif fmt == 'WEBP':
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if has_alpha(image) else 'RGB')
+        image.save(buffer, format='WEBP', quality=quality or WEBP_QUALITY, method=4)
+    else:
+        image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def encode_image(image, source_format=None, max_bytes=IMAGE_MAX_OUTPUT_BYTES, preferred=IMAGE_OUTPUT_FORMAT):
+    fmt = choose_format(image, source_format, preferred)
+    data = _save(image, fmt)
+    if len(data) <= max_bytes:
+        return data, FORMAT_EXTENSIONS[fmt]
+
+    # لم تتسع المخرجات: ننتقل إلى ترميز مع فقد وجودة متدرجة، ثم تصغير الأبعاد كحل أخير
+    lossy = 'WEBP' if has_alpha(image) or fmt != 'JPEG' else 'JPEG'
+    for quality in QUALITY_STEPS:
+        data = _save(image, lossy, quality)
+        if len(data) <= max_bytes:
+            return data, FORMAT_EXTENSIONS[lossy]
+
+    while len(data) > max_bytes and min(image.size) > 64:
+        image = image.resize((int(image.width * 0.75), int(image.height * 0.75)), Image.Resampling.LANCZOS)
+        data = _save(image, lossy, QUALITY_STEPS[-1])
+    return data, FORMAT_EXTENSIONS[lossy]
+
+
+def prepare_vision_image(image_data, max_side=VISION_MAX_SIDE, quality=VISION_JPEG_QUALITY):
+    img = open_image(image_data)
+    if (img.format == 'JPEG' and max(img.size) <= max_side and img.mode in ('RGB', 'L')
+            and img.getexif().get(0x0112, 1) == 1):
+        # صورة صغيرة بصيغة مناسبة أصلاً: نرسلها كما هي دون فقد جيل إضافي من الجودة
+        return image_data, 'image/jpeg'
+
+    # JPEG: فك الترميز مباشرة بمقياس 1/2 أو 1/4 أو 1/8 بدل الدقة الكاملة
+    img.draft('RGB', (max_side, max_side))
+    img = ImageOps.exif_transpose(img)
+
+    if has_alpha(img):
+        img = img.convert('RGBA')
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel('A'))
+        img = background
+    elif img.mode != 'RGB':
+        img = img.convert('RGB')
+    img.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+    return _save(img, 'JPEG', quality), 'image/jpeg'
+
+
+OPERATIONS = {
+    'rotate': rotate_image,
+    'resize': resize_image,
+    'filter': apply_filter,
+    'crop': crop_image,
+    'addtext': lambda image, text, x, y: add_text_to_image(image, text, (x, y)),
+}
+
+
+def draft_target(steps):
+    # أول خطوة تصغير تسمح بفك ترميز JPEG بدقة أقل؛ draft لا ينزل أبداً تحت الحجم المطلوب
+    if steps and steps[0][0] == 'resize':
+        return steps[0][1]
+    return None
+
+
+class StageClock:
+    # توقيت مراحل المهمة داخل العملية العاملة؛ يعود مع النتيجة لأن المقاييس تُسجل في العملية الرئيسية
+    def __init__(self):
+        self.stages = {}
+        self._last = time.perf_counter()
+
+    def lap(self, name):
+        now = time.perf_counter()
+        self.stages[name] = self.stages.get(name, 0.0) + now - self._last
+        self._last = now
+
+    def items(self):
+        return list(self.stages.items())
+
+
+def run_pipeline_job(image_data, steps):
+    # تُنفذ داخل عملية عاملة: المدخلات والمخرجات بايتات مرمزة وليست كائنات PIL
+    # كل الخطوات على نفس الصورة المفكوكة، ثم ترميز واحد في النهاية
+    clock = StageClock()
+    img = decode_image(image_data, draft_target(steps))
+    clock.lap('decode')
+    edited = img
+    for operation, args in steps:
+        edited = OPERATIONS[operation](edited, *args)
+        clock.lap(operation)
+    data, extension = encode_image(edited, img.format)
+    clock.lap('encode')
+    return data, extension, clock.items()
+
+
+def output_size(size, steps):
+    # أبعاد الناتج من هندسة الخطوات دون فك أي بكسل؛ الفلاتر والنص لا تغيّر الأبعاد
+    # تعيد أيضاً أكبر مساحة وسيطة، لأن كل إطار يمر بها داخل العامل
+    width, height = size
+    largest = width * height
+    for operation, args in steps:
+        if operation == 'resize':
+            width, height = args
+        elif operation == 'crop':
+            left, top, right, bottom = args
+            width, height = right - left, bottom - top
+        elif operation == 'rotate':
+            if args[0] % 90 == 0:
+                if args[0] % 180:
+                    width, height = height, width
+            else:
+                radians = math.radians(args[0])
+                cos, sin = abs(math.cos(radians)), abs(math.sin(radians))
+                width, height = math.ceil(width * cos + height * sin), math.ceil(width * sin + height * cos)
+        largest = max(largest, width * height)
+    return (width, height), largest
+
+
+def animation_info(image_data, steps=(), max_frames=ANIMATION_MAX_FRAMES, max_pixels=ANIMATION_MAX_PIXELS):
+    # None للصور الثابتة؛ الحدود تُفحص على المدخل والناتج قبل فك ترميز أي إطار
+    with open_image(image_data) as img:
+        if img.format not in ANIMATED_FORMATS or not getattr(img, 'is_animated', False):
+            return None
+        frames = img.n_frames
+        width, height = img.size
+        if frames > max_frames:
+            raise ImageTooLarge(f"animation has {frames} frames, limit is {max_frames}")
+        if frames * width * height > max_pixels:
+            raise ImageTooLarge(f"animation has {frames} frames of {width}x{height}, limit is {max_pixels} pixels")
+        # إطار صغير مكبَّر (10x10 إلى 4000x4000) يمر بفحص المدخل لكن ناتجه بالغيغابايتات
+        (out_width, out_height), largest = output_size(img.size, steps)
+        if frames * out_width * out_height > max_pixels:
+            raise ImageTooLarge(
+                f"edited animation would have {frames} frames of {out_width}x{out_height}, limit is {max_pixels} pixels"
+            )
+        if largest > IMAGE_MAX_PIXELS:
+            raise ImageTooLarge(f"edited frame would reach {largest} pixels, limit is {IMAGE_MAX_PIXELS}")
+        return frames, img.info.get('loop', 0), img.format
+
+
+def animation_format(source_format, preferred=IMAGE_OUTPUT_FORMAT):
+    return 'WEBP' if preferred == 'WEBP' or source_format == 'WEBP' else 'GIF'
+
+
+def run_frames_job(image_data, start, stop, steps, fmt):
+    # تُنفذ داخل عملية عاملة على جزء من الإطارات؛ تُفك الإطارات واحداً تلو الآخر
+    # والناتج بكسلات خام لأن تجميع الحركة يحتاج كل الإطارات في ترميز واحد
+    frames = []
+    clock = StageClock()
+    with open_image(image_data) as img:
+        for index in range(start, stop):
+            # GIF: الانتقال لإطار يفك ما قبله تسلسلياً لأن كل إطار يُرسم فوق سابقه
+            img.seek(index)
+            img.load()
+            duration = img.info.get('duration', 100)
+            # قناة الشفافية فقط لإطارات فيها شفافية فعلاً؛ غيرها RGB فيُكمم لـ GIF ويُنقل بثلاث بايتات للبكسل
+            frame = img.convert('RGBA' if has_alpha(img) else 'RGB')
+            clock.lap('decode')
+            for operation, args in steps:
+                frame = OPERATIONS[operation](frame, *args)
+                clock.lap(operation)
+            if fmt == 'GIF' and not has_alpha(frame):
+                # التكميم أثقل خطوات ترميز GIF، فيتم هنا بالتوازي ويصغر الناتج للثلث
+                frame = frame.convert('RGB').quantize(256)
+            frames.append((frame.mode, frame.size, frame.tobytes(), frame.getpalette(), duration))
+            clock.lap('encode')
+    return frames, clock.items()
+
+
+def _frame_image(mode, size, data, palette):
+    frame = Image.frombytes(mode, size, data)
+    if palette:
+        frame.putpalette(palette)
+    return frame
+
+
+def _save_animation(frames, durations, loop, fmt, quality=None):
+    buffer = io.BytesIO()
+    options = {'save_all': True, 'append_images': frames[1:], 'duration': durations, 'loop': loop}
+    if fmt == 'WEBP':
+        options.update(quality=quality or WEBP_QUALITY, method=4)
+    else:
+        options.update(disposal=2, optimize=False)
+    frames[0].save(buffer, format=fmt, **options)
+    return buffer.getvalue()
+
+
+def encode_animation(chunks, loop, fmt, max_bytes=IMAGE_MAX_OUTPUT_BYTES):
+    clock = StageClock()
+    data, extension = _encode_animation(chunks, loop, fmt, max_bytes)
+    clock.lap('encode')
+    return data, extension, clock.items()
+
+
+def _encode_animation(chunks, loop, fmt, max_bytes):
+    frames, durations = [], []
+    for chunk in chunks:
+        for mode, size, data, palette, duration in chunk:
+            frames.append(_frame_image(mode, size, data, palette))
+            durations.append(duration)
+    if len({frame.size for frame in frames}) > 1:
+        raise ValueError("animation frames have different sizes after editing")
+
+    data = _save_animation(frames, durations, loop, fmt)
+    if len(data) <= max_bytes:
+        return data, fmt.lower()
+
+    # نفس تدرج الصور الثابتة: WebP مع فقد بجودة متدرجة، ثم تصغير الأبعاد كحل أخير
+    for quality in QUALITY_STEPS:
+        data = _save_animation(frames, durations, loop, 'WEBP', quality)
+        if len(data) <= max_bytes:
+            return data, 'webp'
+
+    while len(data) > max_bytes and min(frames[0].size) > 64:
+        size = (int(frames[0].width * 0.75), int(frames[0].height * 0.75))
+        frames = [frame.convert('RGBA').resize(size, Image.Resampling.LANCZOS) for frame in frames]
+        data = _save_animation(frames, durations, loop, 'WEBP', QUALITY_STEPS[-1])
+    return data, 'webp'
+
+
+def run_image_job(image_data, operation, args):
+    return run_pipeline_job(image_data, ((operation, args),))[:2]
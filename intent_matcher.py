@@ -0,0 +1,253 @@
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+Intent = namedtuple('Intent', ['name', 'param', 'priority', 'start', 'end'])
+
+DIACRITICS = list(range(0x064B, 0x0653)) + [0x0670, 0x0640]
+NORMALIZE_TABLE = str.maketrans({
+    **{chr(code): None for code in DIACRITICS},
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ى': 'ي', 'ئ': 'ي', 'ؤ': 'و',
+    '’': "'", '‘': "'",
+    **{chr(0x0660 + d): str(d) for d in range(10)},
+    **{chr(0x06F0 + d): str(d) for d in range(10)},
+})
+NORMALIZE_MAP = {chr(code): value or '' for code, value in NORMALIZE_TABLE.items()}
+# translate يبحث في القاموس عن كل حرف من النص؛ هنا يُبحث فقط عن الأحرف التي تحتاج تطبيعاً وهو أسرع بكثير
+NORMALIZE_CHARS = re.compile('[' + re.escape(''.join(NORMALIZE_MAP)) + ']')
+ARABIC_LETTERS = '[\u0600-\u06FF]'
+
+# النص يُطبّع قبل البحث فالأرقام لاتينية دائماً؛ الرقم السابق يُفحص في find_degrees لأن lookbehind
+# في بداية التعبير يمنع re من القفز مباشرة إلى المواضع المحتملة
+DEGREES_PATTERN = re.compile(r'(90|180|270)(?!\d)')
+DEGREES_WINDOW = 40
+# أسئلة الاستفسار والشرح ("هل الصورة واضحة؟"، "how to blur ...") ليست طلبات تعديل
+QUESTION_PATTERN = re.compile(
+    r'(?:ما|ماذا|هل|كيف|لماذا|ليش|ليه|متي|اين|وين|شو|وش|ايش|شنو|اشرح|'
+    r'what|how|why|when|where|which|who|is|are|does|do|explain)(?!\w)'
+)
+QUESTION_PHRASES = ('how to', 'كيف ')
+# فعل أمر قبل الكلمة مباشرة ("خليها واضحة"، "make it brighter") يجعلها طلباً حتى داخل سؤال
+CAUSATIVE_PATTERN = re.compile(r'(?:خلي|اجعل|حول|سوي|make|turn|convert)\w*(?:\s+\w+)?\s+$')
+CAUSATIVE_WINDOW = 30
+
+INTENTS = []
+_phrases = {}
+_pattern = None
+
+
+def normalize(text):
+    text = text.lower()
+    # استبدال واحد لكل حرف مختلف بدل المرور على كل الحروف
+    for char in set(NORMALIZE_CHARS.findall(text)):
+        text = text.replace(char, NORMALIZE_MAP[char])
+    return text.strip()
+
+
+def _phrase_variants(phrase, article, feminine):
+    phrase = ' '.join(normalize(phrase).split())
+    variants = {phrase}
+    if feminine and phrase.endswith('ه'):
+        variants.add(phrase[:-1] + 'ة')
+    if article and re.match(ARABIC_LETTERS, phrase):
+        variants |= {'ال' + variant for variant in variants}
+    return variants
+
+
+def register_intent(name, phrases, param=None, priority=10, article=False, feminine=False, guard=None):
+    global _pattern
+    index = len(INTENTS)
+    INTENTS.append({'name': name, 'phrases': phrases, 'param': param, 'priority': priority, 'guard': guard})
+    for phrase in phrases:
+        for variant in _phrase_variants(phrase, article, feminine):
+            _phrases[variant] = index
+    _pattern = None
+
+
+def _trie_regex(node):
+    # شجرة بادئات: كل موضع في النص يُرفض من أول حرف بدل تجربة كل عبارة على حدة
+    end = '' in node
+    branches = []
+    for char in sorted(k for k in node if k):
+        token = r'\s+' if char == ' ' else re.escape(char)
+        branches.append(token + _trie_regex(node[char]))
+    if not branches:
+        return ''
+    body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+    if end:
+        return '(?:' + body + ')?'
+    return body
+
+
+def compiled_pattern():
+    global _pattern
+    if _pattern is not None:
+        return _pattern
+    trie = {}
+    for phrase in _phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[''] = True
+    _scan.cache_clear()
+    # التعبير يبدأ بالشجرة مباشرة فيتخطى re المواضع التي لا تبدأ بها أي عبارة؛ حد الكلمة قبلها يُفحص في _scan
+    _pattern = re.compile(_trie_regex(trie) + r'(?!\w)')
+    return _pattern
+
+
+def _is_word_char(char):
+    return char.isalnum() or char == '_'
+
+
+def _word_start(text, start, phrase):
+    # بداية كلمة حقيقية، مع السماح بحرف العطف "و" أو "ف" قبل الكلمة العربية
+    if start == 0 or not _is_word_char(text[start - 1]):
+        return start
+    if text[start - 1] in 'وف' and (start == 1 or not _is_word_char(text[start - 2])) and phrase[0] >= '\u0600':
+        return start - 1
+    return None
+
+
+def _resolve_param(entry, text, start, end):
+    param = entry['param']
+    if callable(param):
+        return param(text, start, end)
+    return param
+
+
+def find_degrees(text, pos=0, endpos=None):
+    for match in DEGREES_PATTERN.finditer(text, pos, len(text) if endpos is None else endpos):
+        if match.start() == 0 or not text[match.start() - 1].isdigit():
+            return match
+    return None
+
+
+def with_degrees(text, start, end):
+    # "دور" و"لف" وحدهما غامضتان ("ما دور هذا الشخص")، فتُقبلان فقط مع زاوية صريحة بعدهما
+    return find_degrees(text, end, end + DEGREES_WINDOW) is not None
+
+
+@lru_cache(maxsize=256)
+def is_question(text):
+    return QUESTION_PATTERN.match(text) is not None or any(phrase in text for phrase in QUESTION_PHRASES)
+
+
+def requested(text, start, end):
+    if not is_question(text):
+        return True
+    return (CAUSATIVE_PATTERN.search(text, max(0, start - CAUSATIVE_WINDOW), start) is not None
+            or with_degrees(text, start, end))
+
+
+def rotation_degrees(text, start, end):
+    # الزاوية الأقرب بعد الكلمة، ثم أي زاوية في النص، ثم 90 افتراضياً
+    match = find_degrees(text, end, end + DEGREES_WINDOW) or find_degrees(text)
+    return int(match.group(1)) if match else 90
+
+
+@lru_cache(maxsize=256)
+def _scan(text):
+    # نفس الرسالة تُفحص عادةً مرتين (سؤال الاسم ثم طلب التعديل)، فالتطبيع والمسح يُعاد استخدامهما
+    text = normalize(text)
+    pattern = compiled_pattern()
+    found = []
+    pos = 0
+    while pos is not None:
+        restart = None
+        for match in pattern.finditer(text, pos):
+            phrase = match.group()
+            start = match.start()
+            if start and _is_word_char(text[start - 1]):
+                start = _word_start(text, start, phrase)
+            if start is None:
+                # منتصف كلمة: قد تبدأ عبارة صحيحة داخل المطابقة المرفوضة، فالبحث يُستأنف من الحرف التالي
+                restart = match.start() + 1
+                break
+            index = _phrases.get(phrase)
+            if index is None:
+                index = _phrases[' '.join(phrase.split())]
+            found.append((INTENTS[index], start, match.end()))
+        pos = restart
+    return text, tuple(found)
+
+
+def _allowed(entry, text, start, end):
+    guard = entry['guard']
+    return guard is None or guard(text, start, end)
+
+
+def _candidates(text, found, names):
+    for entry, start, end in found:
+        if names and entry['name'] not in names:
+            continue
+        if _allowed(entry, text, start, end):
+            yield entry, start, end
+
+
+def find_intents(text, names=None):
+    if not text:
+        return []
+    text, found = _scan(text)
+    return [
+        Intent(entry['name'], _resolve_param(entry, text, start, end), entry['priority'], start, end)
+        for entry, start, end in _candidates(text, found, names)
+    ]
+
+
+def match_intent(text, names=None):
+    if not text:
+        return None
+    text, found = _scan(text)
+    best = None
+    for entry, start, end in found:
+        if names and entry['name'] not in names:
+            continue
+        # الشرط يُفحص فقط لمرشح يتفوق على الأفضل حتى الآن
+        if best is not None and entry['priority'] <= best[0]['priority']:
+            continue
+        if _allowed(entry, text, start, end):
+            best = (entry, start, end)
+    if best is None:
+        return None
+    # المعامل (مثل زاوية التدوير) يُحسب للنية الفائزة فقط
+    entry, start, end = best
+    return Intent(entry['name'], _resolve_param(entry, text, start, end), entry['priority'], start, end)
+
+
+def match_all(text, names=None, min_priority=10):
+    # كل النوايا بترتيب ظهورها (لسلاسل التعديل)؛ النوايا الضعيفة فقط إن لم توجد غيرها
+    found = find_intents(text, names)
+    strong = [intent for intent in found if intent.priority >= min_priority]
+    if strong:
+        return sorted(strong, key=lambda intent: intent.start)
+    best = match_intent(text, names)
+    return [best] if best else []
+
+
+register_intent('name_question', [
+    'وش اسمك', 'ماهو اسمك', 'ما هو اسمك', 'شو اسمك', 'شنو اسمك',
+    'ما اسمك', 'ايش اسمك', 'وين اسمك', 'من انت',
+    'what is your name', 'whats your name', "what's your name",
+    'who are you', 'your name',
+], priority=100)
+
+register_intent('rotate', [
+    'دوره', 'دورها', 'دوريها', 'دور الصورة', 'دور الصوره', 'لفه', 'لفها', 'لفيها', 'لف الصورة', 'لف الصوره',
+    'تدوير', 'rotate', 'rotated',
+], param=rotation_degrees, priority=30, guard=requested)
+register_intent('rotate', ['دور', 'لف'], param=rotation_degrees, priority=30, guard=with_degrees)
+# "turn" وحدها غامضة ("turn it black and white") لذا أولويتها أقل من الفلاتر
+register_intent('rotate', ['turn'], param=rotation_degrees, priority=5, guard=with_degrees)
+
+register_intent('filter', ['أبيض وأسود', 'ابيض واسود', 'black and white', 'grayscale', 'greyscale', 'رمادي', 'رماديه'],
+                param='grayscale', priority=20, article=True, feminine=True, guard=requested)
+register_intent('filter', ['سيبيا', 'sepia', 'قديم', 'قديمه'], param='sepia', priority=20, article=True, feminine=True,
+                guard=requested)
+register_intent('filter', ['ضبابي', 'ضبابيه', 'blur', 'تضبيب'], param='blur', priority=20, article=True, feminine=True,
+                guard=requested)
+register_intent('filter', ['حاد', 'حاده', 'sharpen', 'واضح', 'واضحه'], param='sharpen', priority=20, article=True,
+                feminine=True, guard=requested)
+register_intent('filter', ['ساطع', 'ساطعه', 'bright', 'brighter', 'فاتح', 'فاتحه'],
+                param='bright', priority=20, article=True, feminine=True, guard=requested)
+register_intent('filter', ['تباين', 'contrast'], param='contrast', priority=20, article=True, guard=requested)
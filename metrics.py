@@ -0,0 +1,202 @@
+import os
+import time
+from bisect import bisect_left
+from tracing import add_stages, span
+
+METRICS_ENABLED = os.getenv('METRICS', 'on') != 'off'
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values = {}
+
+    def inc(self, *labels, amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in self.values.items():
+            yield self.name, _labels(self.labels, labels), value
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        # لكل مجموعة تسميات: عدّاد لكل حد (غير تراكمي) ثم خانة +Inf ثم المجموع
+        self.series = {}
+
+    def observe(self, value, *labels):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def time(self, *labels):
+        return Timer(self, labels)
+
+    def samples(self):
+        for labels, series in self.series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series):
+                cumulative += count
+                yield self.name + '_bucket', _labels(self.labels, labels, f'le="{_number(bound)}"'), cumulative
+            yield self.name + '_sum', _labels(self.labels, labels), series[-1]
+            yield self.name + '_count', _labels(self.labels, labels), cumulative
+
+
+class Timer:
+    __slots__ = ('histogram', 'labels', 'errors', 'started')
+
+    def __init__(self, histogram, labels, errors=None):
+        self.histogram = histogram
+        self.labels = labels
+        self.errors = errors
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.started, *self.labels)
+        # الإلغاء (BaseException) ليس فشلاً للمرحلة
+        if self.errors is not None and exc_type is not None and issubclass(exc_type, Exception):
+            self.errors.inc(*self.labels)
+        return False
+
+
+class Collected:
+    # قيم تُقرأ وقت الطلب فقط (أطوال الطوابير، نسب الكاش): لا تكلفة على المسار الساخن
+    def __init__(self, name, help, labels, collect, kind='gauge'):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.collect = collect
+        self.kind = kind
+
+    def samples(self):
+        values = self.collect()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for labels, value in values.items():
+            if not isinstance(labels, tuple):
+                labels = (labels,)
+            yield self.name, _labels(self.labels, labels), value
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self.register(Counter(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def collected(self, name, help, labels, collect, kind='gauge'):
+        return self.register(Collected(name, help, labels, collect, kind))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{labels} {_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'bot_stage_seconds', 'Duration of each request handling stage', ('stage',))
+STAGE_ERRORS = REGISTRY.counter(
+    'bot_stage_errors_total', 'Stage executions that raised', ('stage',))
+GEMINI_SECONDS = REGISTRY.histogram(
+    'bot_gemini_seconds', 'Duration of a single Gemini API call', ('kind', 'outcome'))
+GEMINI_FIRST_TOKEN_SECONDS = REGISTRY.histogram(
+    'bot_gemini_first_token_seconds', 'Time until the first streamed Gemini chunk', ('kind',))
+SEND_SECONDS = REGISTRY.histogram(
+    'bot_discord_send_seconds', 'Duration of a single Discord send', ('outcome',))
+COMMAND_SECONDS = REGISTRY.histogram(
+    'bot_command_seconds', 'End-to-end handling time per command', ('command', 'outcome'))
+
+
+class Stage:
+    # مرحلة واحدة تُسجل في المدرج الزمني وكجزء من تتبع الطلب الحالي إن وجد
+    __slots__ = ('timer', 'span')
+
+    def __init__(self, name):
+        self.timer = Timer(STAGE_SECONDS, (name,), STAGE_ERRORS) if METRICS_ENABLED else _NULL_TIMER
+        self.span = span(name)
+
+    def __enter__(self):
+        self.span.__enter__()
+        self.timer.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.timer.__exit__(exc_type, exc, tb)
+        self.span.__exit__(exc_type, exc, tb)
+        return False
+
+
+def stage(name):
+    return Stage(name)
+
+
+def record_stages(stages):
+    # توقيتات تُقاس داخل عمليات معالجة الصور وتعود مع النتيجة
+    add_stages(stages)
+    if METRICS_ENABLED:
+        for name, seconds in stages:
+            STAGE_SECONDS.observe(seconds, name)
+
+
+def observe(histogram, seconds, *labels):
+    if METRICS_ENABLED:
+        histogram.observe(seconds, *labels)
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
@@ -0,0 +1,206 @@
+import os
+import time
+import random
+import asyncio
+import logging
+from google.api_core import exceptions as google_exceptions
+from cache import TTLCache
+from metrics import GEMINI_SECONDS, GEMINI_FIRST_TOKEN_SECONDS, observe
+from tracing import add_span, current_span, span
+
+logger = logging.getLogger(__name__)
+
+GEMINI_CONCURRENCY = int(os.getenv('GEMINI_CONCURRENCY', 8))
+GEMINI_MAX_RETRIES = int(os.getenv('GEMINI_MAX_RETRIES', 3))
+GEMINI_BACKOFF_BASE = float(os.getenv('GEMINI_BACKOFF_BASE', 1.0))
+GEMINI_BACKOFF_MAX = float(os.getenv('GEMINI_BACKOFF_MAX', 30.0))
+GEMINI_USER_RPM = float(os.getenv('GEMINI_USER_RPM', 10))
+GEMINI_GUILD_RPM = float(os.getenv('GEMINI_GUILD_RPM', 60))
+RATE_LIMIT_TRACKED_KEYS = 10000
+
+RETRYABLE_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.TooManyRequests,
+    google_exceptions.InternalServerError,
+    google_exceptions.BadGateway,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.GatewayTimeout,
+    google_exceptions.DeadlineExceeded,
+    asyncio.TimeoutError,
+)
+
+
+class RateLimited(Exception):
+    def __init__(self, scope, retry_after):
+        super().__init__(f"{scope} rate limited for {retry_after:.1f}s")
+        self.scope = scope
+        self.retry_after = retry_after
+
+
+class ModelUnavailable(Exception):
+    pass
+
+
+class TokenBucket:
+    def __init__(self, per_minute):
+        self.capacity = max(1.0, per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def try_acquire(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def refill_time(self):
+        return (self.capacity - self.tokens) / self.rate
+
+
+class RateLimiter:
+    def __init__(self, per_minute, max_keys=RATE_LIMIT_TRACKED_KEYS):
+        self.per_minute = per_minute
+        # بعد انتهاء مدة إعادة الامتلاء يكون الدلو ممتلئاً، لذا حذفه يعادل إبقاءه
+        self._buckets = TTLCache(max_keys, max_entries=max_keys)
+
+    def check(self, key):
+        if key is None or self.per_minute <= 0:
+            return 0.0
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self.per_minute)
+        wait = bucket.try_acquire()
+        self._buckets.set(key, bucket, ttl=max(1.0, bucket.refill_time()))
+        return wait
+
+
+def retry_after_seconds(error):
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    value = headers.get('Retry-After') if hasattr(headers, 'get') else None
+    if value:
+        try:
+            return float(value)
+        except ValueError:
+            pass
+    for detail in getattr(error, 'details', None) or ():
+        delay = getattr(detail, 'retry_delay', None)
+        if delay is not None:
+            return delay.seconds + delay.nanos / 1e9
+    return None
+
+
+class ModelClient:
+    def __init__(self, model, concurrency=GEMINI_CONCURRENCY, max_retries=GEMINI_MAX_RETRIES,
+                 backoff_base=GEMINI_BACKOFF_BASE, backoff_max=GEMINI_BACKOFF_MAX,
+                 user_rpm=GEMINI_USER_RPM, guild_rpm=GEMINI_GUILD_RPM):
+        self.model = model
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.user_limiter = RateLimiter(user_rpm)
+        self.guild_limiter = RateLimiter(guild_rpm)
+        self.in_flight = 0
+        self.retries = 0
+        self.failures = 0
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    def check_rate_limits(self, user_id=None, guild_id=None):
+        wait = self.user_limiter.check(user_id)
+        if wait:
+            raise RateLimited('user', wait)
+        wait = self.guild_limiter.check(guild_id)
+        if wait:
+            raise RateLimited('guild', wait)
+
+    def _backoff(self, attempt, error):
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            return min(self.backoff_max, retry_after)
+        # full jitter
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def _retry_or_raise(self, attempt, error):
+        if attempt >= self.max_retries:
+            self.failures += 1
+            logger.error(f"❌ فشل طلب Gemini بعد {attempt + 1} محاولات: {error}")
+            raise ModelUnavailable(str(error)) from error
+
+        delay = self._backoff(attempt, error)
+        self.retries += 1
+        logger.warning(f"⚠️ خطأ مؤقت من Gemini ({error.__class__.__name__})، إعادة المحاولة {attempt + 1} بعد {delay:.1f} ثانية")
+        await asyncio.sleep(delay)
+
+    async def generate(self, contents, user_id=None, guild_id=None, kind='text'):
+        self.check_rate_limits(user_id, guild_id)
+        attempt = 0
+        while True:
+            async with self._semaphore:
+                self.in_flight += 1
+                called = time.monotonic()
+                try:
+                    with span(f'gemini_{kind}'):
+                        response = await self.model.generate_content_async(contents)
+                    observe(GEMINI_SECONDS, time.monotonic() - called, kind, 'ok')
+                    return response
+                except RETRYABLE_ERRORS as e:
+                    observe(GEMINI_SECONDS, time.monotonic() - called, kind, 'retryable')
+                    error = e
+                except Exception:
+                    observe(GEMINI_SECONDS, time.monotonic() - called, kind, 'error')
+                    raise
+                finally:
+                    self.in_flight -= 1
+
+            await self._retry_or_raise(attempt, error)
+            attempt += 1
+
+    async def stream(self, contents, user_id=None, guild_id=None, kind='text'):
+        self.check_rate_limits(user_id, guild_id)
+        attempt = 0
+        while True:
+            started = False
+            async with self._semaphore:
+                self.in_flight += 1
+                called = time.monotonic()
+                try:
+                    response = await self.model.generate_content_async(contents, stream=True)
+                    async for chunk in response:
+                        try:
+                            text = chunk.text
+                        except ValueError:
+                            continue
+                        if text:
+                            if not started:
+                                observe(GEMINI_FIRST_TOKEN_SECONDS, time.monotonic() - called, kind)
+                            started = True
+                            yield text
+                    observe(GEMINI_SECONDS, time.monotonic() - called, kind, 'ok')
+                    add_span(current_span(), f'gemini_{kind}_stream', called, time.monotonic() - called)
+                    return
+                except RETRYABLE_ERRORS as e:
+                    observe(GEMINI_SECONDS, time.monotonic() - called, kind, 'retryable')
+                    # بعد وصول أول جزء للمستخدم لا يمكن إعادة المحاولة دون تكرار النص
+                    if started:
+                        self.failures += 1
+                        raise ModelUnavailable(str(e)) from e
+                    error = e
+                except Exception:
+                    observe(GEMINI_SECONDS, time.monotonic() - called, kind, 'error')
+                    raise
+                finally:
+                    self.in_flight -= 1
+
+            await self._retry_or_raise(attempt, error)
+            attempt += 1
+
+    def stats(self):
+        return {
+            'in_flight': self.in_flight,
+            'retries': self.retries,
+            'failures': self.failures,
+        }
@@ -0,0 +1,264 @@
+import io
+import os
+import time
+import asyncio
+import logging
+import contextvars
+from collections import deque
+import discord
+from cache import TTLCache
+from metrics import SEND_SECONDS, observe
+from tracing import add_span, current_span
+
+logger = logging.getLogger(__name__)
+
+MAX_MESSAGE_LENGTH = 2000
+EMBED_DESCRIPTION_LIMIT = 4096
+EMBED_TOTAL_LIMIT = 6000
+MAX_EMBEDS = 10
+
+OUTBOUND_LONG_REPLY = os.getenv('OUTBOUND_LONG_REPLY', 'auto')
+OUTBOUND_ATTACHMENT_CHARS = int(os.getenv('OUTBOUND_ATTACHMENT_CHARS', EMBED_TOTAL_LIMIT))
+OUTBOUND_CONCURRENCY = int(os.getenv('OUTBOUND_CONCURRENCY', 8))
+OUTBOUND_GUILD_CONCURRENCY = int(os.getenv('OUTBOUND_GUILD_CONCURRENCY', 2))
+# حد Discord المعروف لإرسال الرسائل: 5 رسائل كل 5 ثوانٍ لكل قناة
+OUTBOUND_CHANNEL_BURST = int(os.getenv('OUTBOUND_CHANNEL_BURST', 5))
+OUTBOUND_CHANNEL_PERIOD = float(os.getenv('OUTBOUND_CHANNEL_PERIOD', 5.0))
+EMBED_COLOR = 0x5865F2
+
+
+def split_message(text, max_length=MAX_MESSAGE_LENGTH):
+    # مؤشر على النص الأصلي بدل إعادة نسخ الباقي في كل دورة (كان تربيعياً على النصوص الطويلة)
+    messages = []
+    pos = 0
+    length = len(text)
+    while length - pos > max_length:
+        limit = pos + max_length
+        split_pos = text.rfind('\n', pos, limit)
+        if split_pos <= pos:
+            split_pos = text.rfind(' ', pos, limit)
+        if split_pos <= pos:
+            split_pos = limit
+        messages.append(text[pos:split_pos])
+        pos = split_pos
+        while pos < length and text[pos].isspace():
+            pos += 1
+    if pos < length:
+        messages.append(text[pos:])
+    return messages
+
+
+def long_reply_file(text, filename='reply.md'):
+    return discord.File(io.BytesIO(text.encode('utf-8')), filename=filename)
+
+
+def plan_messages(text, mode=OUTBOUND_LONG_REPLY, attachment_chars=OUTBOUND_ATTACHMENT_CHARS):
+    # يحوّل النص إلى قائمة رسائل (kwargs لـ send): نص عادي، أو Embeds بحد أكبر، أو ملف .md واحد
+    if len(text) <= MAX_MESSAGE_LENGTH or mode == 'split':
+        return [{'content': part} for part in split_message(text)]
+    if len(text) > attachment_chars:
+        return [{
+            'content': f"📄 الرد طويل ({len(text)} حرف)، تجده كاملاً في الملف المرفق.",
+            'file': long_reply_file(text),
+        }]
+    parts = split_message(text, EMBED_DESCRIPTION_LIMIT)
+    if len(parts) > MAX_EMBEDS or sum(len(part) for part in parts) > EMBED_TOTAL_LIMIT:
+        return [{'content': "📄 الرد طويل، تجده كاملاً في الملف المرفق.", 'file': long_reply_file(text)}]
+    return [{'embeds': [discord.Embed(description=part, color=EMBED_COLOR) for part in parts]}]
+
+
+def guild_id_of(channel):
+    guild = getattr(channel, 'guild', None)
+    return guild.id if guild else None
+
+
+class ChannelBucket:
+    def __init__(self, burst=OUTBOUND_CHANNEL_BURST, period=OUTBOUND_CHANNEL_PERIOD):
+        self.burst = burst
+        self.period = period
+        self.blocked_until = 0.0
+        self._sent = deque()
+
+    def delay(self):
+        now = time.monotonic()
+        while self._sent and now - self._sent[0] >= self.period:
+            self._sent.popleft()
+        wait = max(0.0, self.blocked_until - now)
+        if len(self._sent) >= self.burst:
+            wait = max(wait, self._sent[0] + self.period - now)
+        return wait
+
+    def record(self):
+        self._sent.append(time.monotonic())
+
+    def block(self, seconds):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+class OutboundItem:
+    __slots__ = ('send', 'kwargs', 'group', 'futures', 'span', 'queued_at')
+
+    def __init__(self, send, kwargs, group):
+        self.send = send
+        self.kwargs = kwargs
+        self.group = group
+        self.futures = [asyncio.get_running_loop().create_future()]
+        # التسليم يتم في مهمة القناة، فيُحفظ امتداد التتبع الخاص بالطلب الذي أرسل الرسالة
+        self.span = current_span()
+        self.queued_at = time.monotonic()
+
+    def can_merge(self, other, max_length):
+        return (
+            self.group is not None and self.group == other.group and self.send == other.send
+            and set(self.kwargs) == {'content'} and set(other.kwargs) == {'content'}
+            and len(self.kwargs['content']) + 1 + len(other.kwargs['content']) <= max_length
+        )
+
+
+class OutboundScheduler:
+    def __init__(self, concurrency=OUTBOUND_CONCURRENCY, guild_concurrency=OUTBOUND_GUILD_CONCURRENCY,
+                 max_length=MAX_MESSAGE_LENGTH):
+        self.max_length = max_length
+        self.guild_concurrency = guild_concurrency
+        self.sent = 0
+        self.coalesced = 0
+        self.rate_limited = 0
+        self.waited = 0.0
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._queues = {}
+        self._workers = {}
+        # حالة حد المعدل تبقى بعد خروج عامل القناة حتى تنتهي نافذتها
+        self._buckets = TTLCache(10000, max_entries=10000)
+        self._guilds = {}
+        self._next_group = 0
+
+    @property
+    def pending(self):
+        return sum(len(queue) for queue in self._queues.values())
+
+    def new_group(self):
+        self._next_group += 1
+        return self._next_group
+
+    def _enqueue(self, channel_id, guild_id, items):
+        # كل دفعة تُضاف كاملة لطابور القناة، فلا تتداخل أجزاء ردّين مختلفين في نفس القناة
+        self._queues.setdefault(channel_id, deque()).extend(items)
+        if channel_id not in self._workers:
+            guild = self._guilds.setdefault(guild_id, [asyncio.Semaphore(self.guild_concurrency), 0])
+            guild[1] += 1
+            # سياق فارغ: عامل القناة يخدم طلبات كثيرة ولا يرث تتبع الطلب الذي أنشأه
+            self._workers[channel_id] = asyncio.create_task(
+                self._drain(channel_id, guild_id), context=contextvars.Context()
+            )
+
+    async def send(self, channel, send=None, group=None, **kwargs):
+        item = OutboundItem(send or channel.send, kwargs, group)
+        self._enqueue(channel.id, guild_id_of(channel), [item])
+        return await item.futures[0]
+
+    async def send_text(self, channel, text, first_send=None):
+        payloads = plan_messages(text)
+        group = self.new_group()
+        items = [
+            OutboundItem(first_send if i == 0 and first_send else channel.send, payload, group)
+            for i, payload in enumerate(payloads)
+        ]
+        self._enqueue(channel.id, guild_id_of(channel), items)
+        return await asyncio.gather(*(item.futures[0] for item in items))
+
+    def sender(self, channel, send=None):
+        group = self.new_group()
+
+        async def send_content(text):
+            return await self.send(channel, send, group, content=text)
+        return send_content
+
+    def _coalesce(self, queue):
+        item = queue.popleft()
+        while queue and item.can_merge(queue[0], self.max_length):
+            other = queue.popleft()
+            item.kwargs['content'] += '\n' + other.kwargs['content']
+            item.futures.extend(other.futures)
+            self.coalesced += 1
+        return item
+
+    async def _drain(self, channel_id, guild_id):
+        queue = self._queues[channel_id]
+        bucket = self._buckets.pop(channel_id) or ChannelBucket()
+        guild = self._guilds[guild_id]
+        item = None
+        try:
+            while queue:
+                item = self._coalesce(queue)
+                delay = bucket.delay()
+                if delay:
+                    self.waited += delay
+                    await asyncio.sleep(delay)
+                async with guild[0], self._semaphore:
+                    await self._deliver(item, bucket)
+                item = None
+        finally:
+            # عند الإلغاء (إيقاف البوت) لا ننتظر الرسائل المتبقية؛ item هنا رسالة لم يكتمل إرسالها
+            if item is not None:
+                queue.appendleft(item)
+            while queue:
+                for future in queue.popleft().futures:
+                    future.cancel()
+            del self._workers[channel_id]
+            self._queues.pop(channel_id, None)
+            self._buckets.set(channel_id, bucket, ttl=max(bucket.period, bucket.delay()))
+            guild[1] -= 1
+            if guild[1] == 0:
+                self._guilds.pop(guild_id, None)
+
+    async def _deliver(self, item, bucket):
+        called = time.monotonic()
+        add_span(item.span, 'discord_wait', item.queued_at, called - item.queued_at)
+        outcome = 'error'
+        try:
+            bucket.record()
+            message = await item.send(**item.kwargs)
+            outcome = 'ok'
+        except discord.RateLimited as e:
+            outcome = 'rate_limited'
+            self.rate_limited += 1
+            bucket.block(e.retry_after)
+            self._fail(item, e)
+        except discord.HTTPException as e:
+            if e.status == 429:
+                outcome = 'rate_limited'
+                self.rate_limited += 1
+                bucket.block(OUTBOUND_CHANNEL_PERIOD)
+            self._fail(item, e)
+        except Exception as e:
+            self._fail(item, e)
+        else:
+            self.sent += 1
+            for future in item.futures:
+                if not future.done():
+                    future.set_result(message)
+        finally:
+            observe(SEND_SECONDS, time.monotonic() - called, outcome)
+            add_span(item.span, 'discord_send', called, time.monotonic() - called)
+
+    async def close(self):
+        workers = list(self._workers.values())
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    def _fail(self, item, error):
+        logger.error(f"خطأ في إرسال رسالة: {error}")
+        for future in item.futures:
+            if not future.done():
+                future.set_exception(error)
+
+    def stats(self):
+        return {
+            'pending': self.pending,
+            'channels': len(self._workers),
+            'sent': self.sent,
+            'coalesced': self.coalesced,
+            'rate_limited': self.rate_limited,
+            'waited': self.waited,
+        }
@@ -0,0 +1,86 @@
+import os
+import json
+import asyncio
+import hashlib
+from cache import TTLCache
+from intent_matcher import match_intent, normalize
+
+RESPONSE_CACHE_ENABLED = os.getenv('RESPONSE_CACHE', 'on') != 'off'
+RESPONSE_CACHE_BYTES = int(os.getenv('RESPONSE_CACHE_MB', 16)) * 1024 * 1024
+RESPONSE_CACHE_TTL = float(os.getenv('RESPONSE_CACHE_TTL', 3600))
+TRAILING_PUNCTUATION = '?!.؟،, '
+
+
+def normalize_prompt(prompt):
+    return ' '.join(normalize(prompt).split()).rstrip(TRAILING_PUNCTUATION)
+
+
+def response_key(prompt, context):
+    # السياق هو أدوار السجل التي ستُرسل فعلاً للنموذج؛ بدون سجل يتشارك الجميع نفس المفتاح
+    payload = json.dumps([normalize_prompt(prompt), context], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, max_bytes=RESPONSE_CACHE_BYTES, ttl=RESPONSE_CACHE_TTL, enabled=RESPONSE_CACHE_ENABLED):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.static_hits = 0
+        self.coalesced = 0
+        self._entries = TTLCache(max_bytes, ttl=ttl)
+        self._static = {}
+        self._inflight = {}
+
+    def add_static(self, intent, response):
+        self._static[intent] = response
+
+    def static_response(self, prompt):
+        # ردود ثابتة مرتبطة بنية (مثل سؤال الاسم) لا تعتمد على السياق ولا تنتهي صلاحيتها
+        if not self._static:
+            return None
+        intent = match_intent(prompt, self._static.keys())
+        if intent is None:
+            return None
+        self.static_hits += 1
+        return self._static[intent.name]
+
+    def get(self, key):
+        if key is None:
+            return None
+        return self._entries.get(key)
+
+    def set(self, key, response):
+        if key is not None and response:
+            self._entries.set(key, response, size=len(response.encode('utf-8')))
+
+    def pending(self, key):
+        # single-flight: طلب مطابق قيد التنفيذ يُنتظر بدل استدعاء النموذج مرة أخرى
+        future = self._inflight.get(key) if key is not None else None
+        if future is None:
+            return None
+        self.coalesced += 1
+        return asyncio.shield(future)
+
+    def begin(self, key):
+        if key is not None and key not in self._inflight:
+            self._inflight[key] = asyncio.get_running_loop().create_future()
+
+    def finish(self, key, response=None):
+        # response=None يعني الفشل أو الإلغاء: المنتظرون يرسلون طلبهم الخاص
+        future = self._inflight.pop(key, None) if key is not None else None
+        self.set(key, response)
+        if future is not None and not future.done():
+            future.set_result(response)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        stats = self._entries.stats()
+        stats.update({
+            'enabled': self.enabled,
+            'static_hits': self.static_hits,
+            'coalesced': self.coalesced,
+            'in_flight': len(self._inflight),
+        })
+        return stats
@@ -0,0 +1,162 @@
+import os
+import sys
+import time
+import signal
+import asyncio
+import logging
+from discord.ext import commands
+
+logger = logging.getLogger(__name__)
+
+# SHARD_COUNT: فارغ = بوت واحد بلا شاردات، auto = العدد الذي يقترحه Discord، أو رقم
+SHARD_COUNT = os.getenv('SHARD_COUNT', '').strip().lower()
+SHARD_PROCESSES = int(os.getenv('SHARD_PROCESSES', 1))
+# يضبطه المشرف لكل عملية عاملة؛ لا يُضبط يدوياً
+SHARD_IDS = os.getenv('SHARD_IDS', '')
+# حد Discord لبدء الجلسات: شارد واحد كل 5 ثوانٍ للبوتات العادية
+SHARD_IDENTIFY_INTERVAL = float(os.getenv('SHARD_IDENTIFY_INTERVAL', 5))
+SHARD_RESTART_MAX_DELAY = float(os.getenv('SHARD_RESTART_MAX_DELAY', 60))
+SHARD_STOP_TIMEOUT = float(os.getenv('SHARD_STOP_TIMEOUT', 30))
+# عملية بقيت تعمل أطول من هذا تُعتبر مستقرة فيعود تأخير إعادة التشغيل لبدايته
+SHARD_STABLE_SECONDS = 60
+
+IS_WORKER = bool(SHARD_IDS)
+
+
+def parse_shard_ids(value):
+    return [int(part) for part in value.split(',') if part.strip()]
+
+
+def total_shards():
+    if SHARD_COUNT.isdigit() and int(SHARD_COUNT) > 0:
+        return int(SHARD_COUNT)
+    # عدة عمليات بلا عدد محدد: شارد واحد لكل عملية
+    return SHARD_PROCESSES
+
+
+def is_supervisor():
+    return SHARD_PROCESSES > 1 and not IS_WORKER
+
+
+def bot_options():
+    if IS_WORKER:
+        return commands.AutoShardedBot, {'shard_count': total_shards(), 'shard_ids': parse_shard_ids(SHARD_IDS)}
+    if SHARD_COUNT == 'auto':
+        return commands.AutoShardedBot, {}
+    if SHARD_COUNT:
+        return commands.AutoShardedBot, {'shard_count': total_shards()}
+    return commands.Bot, {}
+
+
+def is_primary(bot):
+    shard_ids = getattr(bot, 'shard_ids', None)
+    return not shard_ids or 0 in shard_ids
+
+
+def shard_ranges(count, processes):
+    # نطاقات متصلة ومتوازنة: 10 شاردات على 3 عمليات = 4 + 3 + 3
+    processes = max(1, min(processes, count))
+    size, extra = divmod(count, processes)
+    ranges = []
+    start = 0
+    for index in range(processes):
+        stop = start + size + (1 if index < extra else 0)
+        ranges.append(list(range(start, stop)))
+        start = stop
+    return ranges
+
+
+def with_suffix(path, index):
+    if not path:
+        return path
+    root, ext = os.path.splitext(path)
+    return f'{root}.{index}{ext}'
+
+
+class ShardSupervisor:
+    def __init__(self, script, count=None, processes=SHARD_PROCESSES,
+                 identify_interval=SHARD_IDENTIFY_INTERVAL, max_delay=SHARD_RESTART_MAX_DELAY,
+                 stop_timeout=SHARD_STOP_TIMEOUT):
+        self.script = script
+        self.count = count or total_shards()
+        self.ranges = shard_ranges(self.count, processes)
+        self.identify_interval = identify_interval
+        self.max_delay = max_delay
+        self.stop_timeout = stop_timeout
+        self.restarts = 0
+        self._processes = {}
+        self._stopping = asyncio.Event()
+
+    def worker_env(self, index, shard_ids):
+        env = dict(os.environ)
+        env['SHARD_IDS'] = ','.join(str(shard_id) for shard_id in shard_ids)
+        env['SHARD_COUNT'] = str(self.count)
+        # كل عملية تفتح خادم الصحة على منفذ خاص بها: PORT ثم PORT+1 ...
+        env['PORT'] = str(int(os.getenv('PORT', 5000)) + index)
+        # ملف JSON لا يُكتب من عدة عمليات بأمان، فلكل عملية فهرسها
+        env['VISION_INDEX_PATH'] = with_suffix(os.getenv('VISION_INDEX_PATH', 'data/vision_index.json'), index)
+        return env
+
+    async def _wait_stopping(self, seconds):
+        try:
+            await asyncio.wait_for(self._stopping.wait(), seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _keep_alive(self, index, shard_ids):
+        # العمليات تبدأ متتابعة حتى لا تتجاوز مجتمعةً حد بدء الجلسات
+        await self._wait_stopping(self.identify_interval * sum(len(r) for r in self.ranges[:index]))
+        delay = 1.0
+        while not self._stopping.is_set():
+            started = time.monotonic()
+            process = await asyncio.create_subprocess_exec(
+                sys.executable, self.script, env=self.worker_env(index, shard_ids),
+                # جلسة مستقلة: Ctrl+C في الطرفية يصل للمشرف فقط، وهو من يوقف العمليات بالترتيب
+                start_new_session=True,
+            )
+            self._processes[index] = process
+            if self._stopping.is_set():
+                process.send_signal(signal.SIGINT)
+            logger.info(f"🧩 بدأت عملية الشاردات {shard_ids} (pid {process.pid})")
+            code = await process.wait()
+            self._processes.pop(index, None)
+            if self._stopping.is_set():
+                return
+            if time.monotonic() - started >= SHARD_STABLE_SECONDS:
+                delay = 1.0
+            self.restarts += 1
+            logger.error(f"❌ توقفت عملية الشاردات {shard_ids} (رمز {code})، إعادة التشغيل بعد {delay:.0f} ثانية")
+            await self._wait_stopping(delay)
+            delay = min(self.max_delay, delay * 2)
+
+    def stop(self):
+        if self._stopping.is_set():
+            return
+        self._stopping.set()
+        # SIGINT يصل للعملية كـ KeyboardInterrupt فتُحفظ السجلات وتُغلق الاتصالات قبل الخروج
+        for process in self._processes.values():
+            if process.returncode is None:
+                process.send_signal(signal.SIGINT)
+
+    async def _terminate(self):
+        processes = [process for process in self._processes.values() if process.returncode is None]
+        if not processes:
+            return
+        waits = asyncio.gather(*(process.wait() for process in processes))
+        try:
+            await asyncio.wait_for(waits, self.stop_timeout)
+        except asyncio.TimeoutError:
+            for process in processes:
+                if process.returncode is None:
+                    process.kill()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self.stop)
+        logger.info(f"🧩 تشغيل {self.count} شارد على {len(self.ranges)} عملية: {self.ranges}")
+        workers = [asyncio.create_task(self._keep_alive(index, shard_ids))
+                   for index, shard_ids in enumerate(self.ranges)]
+        await self._stopping.wait()
+        await self._terminate()
+        await asyncio.gather(*workers, return_exceptions=True)
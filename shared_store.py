@@ -0,0 +1,223 @@
+import os
+import time
+import uuid
+import sqlite3
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+SHARED_STORE_PATH = os.getenv('SHARED_STORE_PATH', 'data/shared.db')
+STORE_POLL_INTERVAL = float(os.getenv('STORE_POLL_INTERVAL', 1.0))
+STORE_CHANGE_RETENTION = float(os.getenv('STORE_CHANGE_RETENTION', 3600))
+STORE_BUSY_TIMEOUT = 5.0
+# الإعدادات تُقرأ كاملة عند أي تغيير؛ الموضوع محجوز لها في سجل التغييرات
+SETTINGS_TOPIC = 'channel_settings'
+
+
+class SQLiteSharedBackend:
+    def __init__(self, path):
+        self.path = path
+        self._conn = None
+
+    def open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # عدة عمليات على نفس الملف: WAL للقراءة المتزامنة ومهلة انتظار عند قفل الكتابة
+        self._conn = sqlite3.connect(self.path, timeout=STORE_BUSY_TIMEOUT, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS channel_settings ('
+            'setting TEXT NOT NULL, channel_id INTEGER NOT NULL, guild_id INTEGER, updated_at REAL NOT NULL, '
+            'PRIMARY KEY (setting, channel_id))'
+        )
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS changes ('
+            'seq INTEGER PRIMARY KEY AUTOINCREMENT, topic TEXT NOT NULL, key INTEGER, '
+            'origin TEXT NOT NULL, created_at REAL NOT NULL)'
+        )
+        self._conn.commit()
+
+    def last_change(self):
+        return self._conn.execute('SELECT COALESCE(MAX(seq), 0) FROM changes').fetchone()[0]
+
+    def load_settings(self):
+        return self._conn.execute('SELECT setting, channel_id FROM channel_settings').fetchall()
+
+    def _record(self, topic, keys, origin):
+        now = time.time()
+        self._conn.executemany(
+            'INSERT INTO changes (topic, key, origin, created_at) VALUES (?, ?, ?, ?)',
+            [(topic, key, origin, now) for key in keys]
+        )
+
+    def set_channel(self, setting, channel_id, guild_id, enabled, origin):
+        with self._conn:
+            if enabled:
+                cursor = self._conn.execute(
+                    'INSERT OR IGNORE INTO channel_settings (setting, channel_id, guild_id, updated_at) '
+                    'VALUES (?, ?, ?, ?)', (setting, channel_id, guild_id, time.time())
+                )
+            else:
+                cursor = self._conn.execute(
+                    'DELETE FROM channel_settings WHERE setting = ? AND channel_id = ?', (setting, channel_id)
+                )
+            if cursor.rowcount:
+                self._record(SETTINGS_TOPIC, [channel_id], origin)
+        return cursor.rowcount > 0
+
+    def clear_setting(self, setting, origin):
+        with self._conn:
+            cursor = self._conn.execute('DELETE FROM channel_settings WHERE setting = ?', (setting,))
+            if cursor.rowcount:
+                self._record(SETTINGS_TOPIC, [None], origin)
+        return cursor.rowcount
+
+    def publish(self, topic, keys, origin):
+        with self._conn:
+            self._record(topic, keys, origin)
+
+    def changes_since(self, seq):
+        return self._conn.execute(
+            'SELECT seq, topic, key, origin FROM changes WHERE seq > ? ORDER BY seq', (seq,)
+        ).fetchall()
+
+    def prune(self, before):
+        with self._conn:
+            self._conn.execute('DELETE FROM changes WHERE created_at < ?', (before,))
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class SharedStore:
+    # إعدادات القنوات وسجل تغييرات مشترك بين عمليات الشاردات عبر ملف SQLite واحد
+    def __init__(self, backend=None, watch=False, poll_interval=STORE_POLL_INTERVAL,
+                 retention=STORE_CHANGE_RETENTION):
+        self.backend = backend
+        self.watch = watch and backend is not None
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.origin = f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+        self.published = 0
+        self.received = 0
+        self.reloads = 0
+        self._settings = {}
+        self._listeners = {}
+        self._seq = 0
+        self._poll_task = None
+        self._db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='shared-store')
+
+    async def _run_db(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._db_executor, func, *args)
+
+    def channels(self, setting):
+        # نفس الكائن دائماً: يُحدّث في مكانه فيبقى فحص "in" متزامناً ورخيصاً في on_message
+        return self._settings.setdefault(setting, set())
+
+    def on_change(self, topic, callback):
+        self._listeners.setdefault(topic, []).append(callback)
+
+    async def start(self):
+        if self.backend is None:
+            return
+        await self._run_db(self.backend.open)
+        self._seq = await self._run_db(self.backend.last_change)
+        await self._reload_settings()
+        await self._run_db(self.backend.prune, time.time() - self.retention)
+        if self.watch:
+            self._poll_task = asyncio.create_task(self._poll_loop())
+
+    async def close(self):
+        if self._poll_task is not None:
+            self._poll_task.cancel()
+            self._poll_task = None
+        if self.backend is not None:
+            await self._run_db(self.backend.close)
+        self._db_executor.shutdown(wait=True)
+
+    async def _reload_settings(self):
+        rows = await self._run_db(self.backend.load_settings)
+        loaded = {}
+        for setting, channel_id in rows:
+            loaded.setdefault(setting, set()).add(channel_id)
+        for setting in set(self._settings) | set(loaded):
+            current = self.channels(setting)
+            current.clear()
+            current.update(loaded.get(setting, ()))
+        self.reloads += 1
+
+    async def set_channel(self, setting, channel_id, guild_id, enabled):
+        # القرص أولاً: إن فشلت الكتابة يفشل الأمر ولا يتغير شيء
+        if self.backend is not None:
+            changed = await self._run_db(self.backend.set_channel, setting, channel_id, guild_id, enabled, self.origin)
+        else:
+            changed = (channel_id in self.channels(setting)) != enabled
+        if enabled:
+            self.channels(setting).add(channel_id)
+        else:
+            self.channels(setting).discard(channel_id)
+        return changed
+
+    async def clear_channels(self, setting):
+        if self.backend is not None:
+            count = await self._run_db(self.backend.clear_setting, setting, self.origin)
+        else:
+            count = len(self.channels(setting))
+        self.channels(setting).clear()
+        return count
+
+    async def publish(self, topic, keys):
+        # إعلام العمليات الأخرى فقط؛ بلا شاردات لا أحد يستمع
+        if not self.watch or not keys:
+            return
+        try:
+            await self._run_db(self.backend.publish, topic, list(keys), self.origin)
+            self.published += len(keys)
+        except sqlite3.Error as e:
+            logger.error(f"خطأ في نشر تغييرات {topic}: {e}")
+
+    async def poll(self):
+        rows = await self._run_db(self.backend.changes_since, self._seq)
+        if not rows:
+            return
+        self._seq = rows[-1][0]
+        reload_settings = False
+        for _, topic, key, origin in rows:
+            if origin == self.origin:
+                continue
+            self.received += 1
+            if topic == SETTINGS_TOPIC:
+                reload_settings = True
+                continue
+            for callback in self._listeners.get(topic, ()):
+                callback(key)
+        if reload_settings:
+            await self._reload_settings()
+
+    async def _poll_loop(self):
+        polls = 0
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self.poll()
+                polls += 1
+                if polls % 600 == 0:
+                    await self._run_db(self.backend.prune, time.time() - self.retention)
+            except sqlite3.Error as e:
+                logger.error(f"خطأ في قراءة تغييرات المخزن المشترك: {e}")
+
+    def stats(self):
+        return {
+            'channels': {setting: len(channels) for setting, channels in self._settings.items()},
+            'watching': self.watch,
+            'published': self.published,
+            'received': self.received,
+            'reloads': self.reloads,
+        }
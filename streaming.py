@@ -0,0 +1,128 @@
+import os
+import time
+import logging
+import discord
+
+logger = logging.getLogger(__name__)
+
+STREAM_MODE = os.getenv('STREAM_MODE', 'edit')
+STREAM_EDIT_INTERVAL = float(os.getenv('STREAM_EDIT_INTERVAL', 1.2))
+STREAM_MIN_CHARS = int(os.getenv('STREAM_MIN_CHARS', 300))
+STREAM_CURSOR = ' ▌'
+
+
+def find_split_position(text, max_length):
+    split_pos = text.rfind('\n', 0, max_length)
+    if split_pos <= 0:
+        split_pos = text.rfind(' ', 0, max_length)
+    if split_pos <= 0:
+        split_pos = max_length
+    return split_pos
+
+
+def find_safe_boundary(text, min_length):
+    # حدود آمنة: نهاية فقرة أولاً، ثم نهاية سطر، بشرط ألا نقطع داخل كتلة كود مفتوحة
+    for separator in ('\n\n', '\n'):
+        pos = text.rfind(separator)
+        if pos >= min_length and text.count('```', 0, pos) % 2 == 0:
+            return pos
+    return -1
+
+
+class StreamingReply:
+    def __init__(self, send, first_send=None, mode=STREAM_MODE, max_length=2000,
+                 edit_interval=STREAM_EDIT_INTERVAL, min_chars=STREAM_MIN_CHARS):
+        self._send = send
+        self._first_send = first_send or send
+        self.mode = mode
+        self.max_length = max_length
+        self.edit_interval = edit_interval
+        self.min_chars = min_chars
+        self.sent_messages = 0
+        self.first_output_at = None
+        self._buffer = ''
+        self._message = None
+        self._last_edit = 0.0
+        self._started = time.monotonic()
+
+    async def _post(self, text):
+        send = self._first_send if self.sent_messages == 0 else self._send
+        message = await send(text)
+        self.sent_messages += 1
+        if self.first_output_at is None:
+            self.first_output_at = time.monotonic() - self._started
+        return message
+
+    async def _edit(self, text):
+        try:
+            await self._message.edit(content=text)
+        except discord.HTTPException as e:
+            logger.warning(f"تعذر تعديل رسالة البث: {e}")
+        self._last_edit = time.monotonic()
+
+    async def feed(self, text):
+        self._buffer += text
+        if self.mode == 'edit':
+            await self._feed_edit()
+        else:
+            await self._feed_chunks()
+
+    async def _feed_chunks(self):
+        while True:
+            if len(self._buffer) > self.max_length:
+                pos = find_split_position(self._buffer, self.max_length)
+            else:
+                # الرسالة الأولى تُرسل مبكراً، والتالية تُجمع قرب الحد الأقصى لتقليل عدد الرسائل
+                min_length = self.min_chars if self.sent_messages == 0 else self.max_length * 3 // 4
+                pos = find_safe_boundary(self._buffer[:self.max_length], min_length)
+            if pos <= 0:
+                return
+            head, self._buffer = self._buffer[:pos], self._buffer[pos:].lstrip()
+            if head.strip():
+                await self._post(head)
+
+    async def _feed_edit(self):
+        limit = self.max_length - len(STREAM_CURSOR)
+        while len(self._buffer) > limit:
+            # الرسالة الحالية امتلأت: نثبتها ونبدأ رسالة جديدة بالباقي
+            pos = find_split_position(self._buffer, limit)
+            head, self._buffer = self._buffer[:pos], self._buffer[pos:].lstrip()
+            if self._message is None:
+                await self._post(head)
+            else:
+                await self._edit(head)
+            self._message = None
+
+        if not self._buffer.strip():
+            return
+        if self._message is None:
+            self._message = await self._post(self._buffer + STREAM_CURSOR)
+            self._last_edit = time.monotonic()
+        elif time.monotonic() - self._last_edit >= self.edit_interval:
+            await self._edit(self._buffer + STREAM_CURSOR)
+
+    async def finish(self):
+        text = self._buffer
+        self._buffer = ''
+        if self.mode == 'edit' and self._message is not None:
+            await self._edit(text if text.strip() else '…')
+            self._message = None
+            return
+        while len(text) > self.max_length:
+            pos = find_split_position(text, self.max_length)
+            await self._post(text[:pos])
+            text = text[pos:].lstrip()
+        if text.strip():
+            await self._post(text)
+
+
+async def deliver_stream(chunks, send, first_send=None, mode=STREAM_MODE):
+    reply = StreamingReply(send, first_send, mode)
+    try:
+        async for text in chunks:
+            await reply.feed(text)
+    finally:
+        # عند فشل الإرسال يُغلق المولّد فوراً حتى تعمل كتل finally فيه (مثل إنهاء انتظار الكاش المشترك)
+        await chunks.aclose()
+        await reply.finish()
+    return reply
@@ -0,0 +1,62 @@
+import cache
+from cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+def test_evicts_least_recently_used_within_byte_budget():
+    entries = TTLCache(max_bytes=10)
+    entries.set('a', 'A', size=4)
+    entries.set('b', 'B', size=4)
+    assert entries.get('a') == 'A'
+    entries.set('c', 'C', size=4)
+    assert 'b' not in entries
+    assert entries.get('a') == 'A' and entries.get('c') == 'C'
+    assert entries.total_bytes == 8
+    assert entries.evictions == 1
+
+
+def test_rejects_values_larger_than_budget():
+    entries = TTLCache(max_bytes=10)
+    entries.set('small', 1, size=5)
+    assert entries.set('big', 2, size=11) is False
+    assert 'small' in entries
+    assert entries.total_bytes == 5
+
+
+def test_replacing_a_key_updates_its_size():
+    entries = TTLCache(max_bytes=10)
+    entries.set('a', 'old', size=6)
+    entries.set('a', 'new', size=3)
+    assert entries.total_bytes == 3
+    assert entries.get('a') == 'new'
+
+
+def test_max_entries_limit():
+    entries = TTLCache(max_bytes=100, max_entries=2)
+    for key in 'abc':
+        entries.set(key, key)
+    assert len(entries) == 2
+    assert 'a' not in entries
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache, 'time', clock)
+    entries = TTLCache(max_bytes=100, ttl=10)
+    entries.set('a', 'A', size=5)
+    entries.set('forever', 'F', size=5, ttl=0)
+    clock.now += 9
+    assert entries.get('a') == 'A'
+    clock.now += 1
+    assert 'a' not in entries
+    assert entries.get('a') is None
+    assert entries.get('forever') == 'F'
+    assert entries.expirations == 1
+    assert entries.total_bytes == 5
@@ -0,0 +1,45 @@
+import pytest
+from edit_pipeline import EditChainError, MAX_EDIT_STEPS, parse_edit_chain
+
+
+def test_parses_command_chain():
+    assert parse_edit_chain('rotate 90 | grayscale | resize 100 100') == (
+        ('rotate', (90,)), ('filter', ('grayscale',)), ('resize', (100, 100)),
+    )
+
+
+@pytest.mark.parametrize('text', [
+    'rotate 90 > grayscale',
+    'rotate 90 → grayscale',
+    'rotate 90 then grayscale',
+    'rotate 90 ثم grayscale',
+    'rotate 90 ، grayscale',
+])
+def test_accepts_every_separator(text):
+    assert parse_edit_chain(text) == (('rotate', (90,)), ('filter', ('grayscale',)))
+
+
+def test_parses_natural_language_steps():
+    assert parse_edit_chain('خليها ابيض واسود ثم دورها ١٨٠') == (
+        ('filter', ('grayscale',)), ('rotate', (180,)),
+    )
+
+
+def test_text_step_keeps_its_text():
+    assert parse_edit_chain('crop 0 0 10 10 > text hi') == (
+        ('crop', (0, 0, 10, 10)), ('addtext', ('hi', 10, 10)),
+    )
+
+
+@pytest.mark.parametrize('text', [
+    '  ',
+    'filter nope',
+    'rotate 400',
+    'resize 5000 10',
+    'resize 10',
+    'blah blah',
+    ' | '.join(['grayscale'] * (MAX_EDIT_STEPS + 1)),
+])
+def test_rejects_invalid_chains(text):
+    with pytest.raises(EditChainError):
+        parse_edit_chain(text)
@@ -0,0 +1,53 @@
+import time
+import asyncio
+import threading
+import pytest
+from executor import ExecutorBusy, ImageExecutor, JobTimeout
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def square(value):
+    return value * value
+
+
+def test_runs_jobs_and_counts_completed():
+    async def scenario():
+        executor = ImageExecutor(backend='thread', workers=2, queue_size=4)
+        results = await asyncio.gather(*(executor.run(square, n) for n in range(4)))
+        executor.shutdown()
+        return executor, results
+
+    executor, results = run(scenario())
+    assert results == [0, 1, 4, 9]
+    assert executor.stats()['completed'] == 4
+    assert executor.pending == 0
+
+
+def test_timed_out_job_stays_pending_until_it_finishes():
+    release = threading.Event()
+
+    async def scenario():
+        executor = ImageExecutor(backend='thread', workers=1, queue_size=1)
+        with pytest.raises(JobTimeout):
+            await executor.run(release.wait, 5, timeout=0.05)
+        # العامل ما زال مشغولاً بالمهمة، فلا مكان لمهمة جديدة
+        still_pending = executor.pending
+        with pytest.raises(ExecutorBusy):
+            await executor.run(square, 2)
+        release.set()
+        deadline = time.monotonic() + 2
+        while executor.pending and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        result = await executor.run(square, 3)
+        executor.shutdown()
+        return executor, still_pending, result
+
+    executor, still_pending, result = run(scenario())
+    assert still_pending == 1
+    assert result == 9
+    assert executor.pending == 0
+    assert executor.stats()['timed_out'] == 1
+    assert executor.stats()['rejected'] == 1
@@ -0,0 +1,40 @@
+import math
+from health import HealthServer
+
+
+class FakeBot:
+    def __init__(self, ready=True, latency=0.1):
+        self.ready = ready
+        self.latency = latency
+        self.guilds = []
+
+    def is_closed(self):
+        return False
+
+    def is_ready(self):
+        return self.ready
+
+
+def test_full_queue_is_reported_but_stays_ready():
+    server = HealthServer(FakeBot())
+    server.add_queue('images', lambda: 16, 16)
+    ready, checks, details = server.readiness()
+    assert ready
+    assert not any(name.startswith('queue') for name in checks)
+    assert details['queues']['images'] == {'depth': 16, 'limit': 16, 'full': True}
+
+
+def test_gateway_and_latency_problems_fail_readiness():
+    assert not HealthServer(FakeBot(ready=False)).readiness()[0]
+    ready, checks, details = HealthServer(FakeBot(latency=math.inf)).readiness()
+    assert not ready
+    assert checks['latency'] is False
+    assert details['latency_ms'] is None
+
+
+def test_loop_lag_fails_readiness():
+    server = HealthServer(FakeBot(), max_loop_lag=1)
+    server.lag_monitor.lag = 2.5
+    ready, checks, _ = server.readiness()
+    assert not ready
+    assert checks['loop_lag'] is False
@@ -0,0 +1,151 @@
+import asyncio
+from conversation import MAX_HISTORY
+from history_store import HistoryStore, SQLiteHistoryBackend, merge_turns
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def texts(history):
+    return [(turn.user, turn.assistant) for turn in history]
+
+
+def test_memory_store_appends_and_trims_to_max_history():
+    async def scenario():
+        store = HistoryStore()
+        for index in range(MAX_HISTORY + 3):
+            await store.append(1, f'q{index}', f'a{index}')
+        return await store.get(1)
+
+    history = run(scenario())
+    assert len(history) == MAX_HISTORY
+    assert history[0].user == 'q3'
+    assert history[-1].user == f'q{MAX_HISTORY + 2}'
+
+
+def test_clear_reports_whether_history_existed():
+    async def scenario():
+        store = HistoryStore()
+        await store.append(1, 'q', 'a')
+        first = await store.clear(1)
+        second = await store.clear(1)
+        return first, second, await store.get(1)
+
+    first, second, history = run(scenario())
+    assert first is True
+    assert second is False
+    assert list(history) == []
+
+
+def test_evicts_least_recently_used_users():
+    async def scenario():
+        store = HistoryStore(max_users=2)
+        await store.append(1, 'q1', 'a1')
+        await store.append(2, 'q2', 'a2')
+        await store.get(1)
+        await store.append(3, 'q3', 'a3')
+        return store
+
+    store = run(scenario())
+    assert len(store) == 2
+    assert store.stats()['evictions'] == 1
+    assert 2 not in store._hot
+
+
+def test_sqlite_history_survives_restart_and_eviction(tmp_path):
+    path = str(tmp_path / 'history.db')
+
+    async def write():
+        store = HistoryStore(SQLiteHistoryBackend(path), max_users=1)
+        await store.start()
+        await store.append(1, 'q1', 'a1')
+        await store.append(2, 'q2', 'a2')
+        await store.close()
+
+    async def read():
+        store = HistoryStore(SQLiteHistoryBackend(path))
+        await store.start()
+        histories = texts(await store.get(1)), texts(await store.get(2))
+        await store.close()
+        return histories, store.stats()['cold_loads']
+
+    run(write())
+    histories, cold_loads = run(read())
+    assert histories == ([('q1', 'a1')], [('q2', 'a2')])
+    assert cold_loads == 2
+
+
+def test_shared_database_merges_turns_from_both_stores(tmp_path):
+    path = str(tmp_path / 'history.db')
+
+    async def scenario():
+        first = HistoryStore(SQLiteHistoryBackend(path))
+        second = HistoryStore(SQLiteHistoryBackend(path))
+        await first.start()
+        await second.start()
+        await first.append(1, 'from first', 'a')
+        await second.append(1, 'from second', 'b')
+        await first.flush()
+        await second.flush()
+        await first.append(1, 'again first', 'c')
+        await first.flush()
+        merged = texts(await first.get(1))
+        await first.close()
+        await second.close()
+        return merged
+
+    merged = run(scenario())
+    assert merged == [('from first', 'a'), ('from second', 'b'), ('again first', 'c')]
+
+
+def test_clear_is_not_undone_by_another_store(tmp_path):
+    path = str(tmp_path / 'history.db')
+
+    async def scenario():
+        first = HistoryStore(SQLiteHistoryBackend(path))
+        second = HistoryStore(SQLiteHistoryBackend(path))
+        await first.start()
+        await second.start()
+        await second.append(1, 'old', 'a')
+        await second.flush()
+        await first.get(1)
+        await second.clear(1)
+        await first.append(1, 'after clear', 'b')
+        await first.flush()
+        await first.close()
+        await second.close()
+
+        reader = HistoryStore(SQLiteHistoryBackend(path))
+        await reader.start()
+        history = texts(await reader.get(1))
+        await reader.close()
+        return history
+
+    assert run(scenario()) == [('after clear', 'b')]
+
+
+def test_failed_flush_keeps_turns_pending():
+    class FailingBackend:
+        def load(self, user_id):
+            return []
+
+        def save_many(self, items):
+            raise OSError('disk full')
+
+    async def scenario():
+        store = HistoryStore(FailingBackend())
+        await store.append(1, 'q', 'a')
+        await store.flush()
+        return store
+
+    store = run(scenario())
+    assert store.stats()['dirty'] == 1
+    assert store._pending[1] == [('q', 'a', store._hot[1][0].at)]
+
+
+def test_merge_turns_drops_duplicates_and_turns_before_clear():
+    old = ('old', 'a', 1.0)
+    kept = ('kept', 'b', 3.0)
+    merged = merge_turns([old, kept], [kept, ('newer', 'c', 4.0)], cleared_at=2.0)
+    assert [turn.user for turn in merged] == ['kept', 'newer']
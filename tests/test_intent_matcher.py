@@ -0,0 +1,50 @@
+import pytest
+from intent_matcher import match_all, match_intent, normalize
+
+
+def intent_of(text):
+    intent = match_intent(text)
+    return intent and (intent.name, intent.param)
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('rotate 90', ('rotate', 90)),
+    ('لفها 180', ('rotate', 180)),
+    ('دور الصورة ٢٧٠', ('rotate', 270)),
+    ('turn it 90', ('rotate', 90)),
+    ('خليها ابيض واسود', ('filter', 'grayscale')),
+    ('خليها فاتحة', ('filter', 'bright')),
+    ('make it brighter', ('filter', 'bright')),
+    ('هل تقدر تخليها واضحة؟', ('filter', 'sharpen')),
+    ('وش اسمك', ('name_question', None)),
+])
+def test_matches_requests(text, expected):
+    assert intent_of(text) == expected
+
+
+@pytest.mark.parametrize('text', [
+    'افتح الصورة',
+    'ابغى افتح الرابط',
+    'أفتح الصورة',
+    'ما دور هذا الشخص في الصورة',
+    'هل الصورة واضحة؟',
+    'explain how to blur an image',
+    'whose turn is it',
+    'دورة تدريبية',
+])
+def test_ignores_questions_and_lookalike_words(text):
+    assert intent_of(text) is None
+
+
+def test_degrees_need_a_full_number():
+    assert intent_of('لف 1800 مرة') is None
+    assert intent_of('لف 90') == ('rotate', 90)
+
+
+def test_match_all_keeps_order_of_steps():
+    steps = match_all('خليها ابيض واسود ثم دورها ١٨٠')
+    assert [(step.name, step.param) for step in steps] == [('filter', 'grayscale'), ('rotate', 180)]
+
+
+def test_normalize_folds_alef_digits_and_diacritics():
+    assert normalize('  أَهلاً ١٢٣ ') == 'اهلا 123'
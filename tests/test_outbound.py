@@ -0,0 +1,75 @@
+import asyncio
+import pytest
+from outbound import OutboundScheduler, split_message
+
+
+class FakeChannel:
+    def __init__(self, channel_id=1, block=None):
+        self.id = channel_id
+        self.sent = []
+        self.block = block
+
+    async def send(self, **kwargs):
+        if self.block is not None:
+            await self.block.wait()
+        self.sent.append(kwargs)
+        return len(self.sent)
+
+
+def test_short_text_is_one_message():
+    assert split_message('hello', max_length=10) == ['hello']
+    assert split_message('', max_length=10) == []
+
+
+def test_prefers_newline_then_space():
+    assert split_message('aaaa bbbb\ncccc', max_length=12) == ['aaaa bbbb', 'cccc']
+    assert split_message('aaaa bbbb cccc', max_length=12) == ['aaaa bbbb', 'cccc']
+
+
+def test_hard_split_without_whitespace():
+    assert split_message('abcdefghij', max_length=4) == ['abcd', 'efgh', 'ij']
+
+
+def test_parts_fit_limit_and_keep_all_words():
+    text = '\n'.join(' '.join(f'كلمة{i}-{j}' for j in range(30)) for i in range(40))
+    parts = split_message(text, max_length=200)
+    assert all(0 < len(part) <= 200 for part in parts)
+    assert ' '.join(parts).split() == text.split()
+    assert not any(part[0].isspace() for part in parts)
+
+
+def test_scheduler_delivers_in_order_and_leaves_no_worker():
+    async def scenario():
+        scheduler = OutboundScheduler()
+        channel = FakeChannel()
+        first = await scheduler.send(channel, content='one')
+        second = await scheduler.send(channel, content='two')
+        await asyncio.sleep(0)
+        return scheduler, channel, (first, second)
+
+    scheduler, channel, results = asyncio.run(scenario())
+    assert results == (1, 2)
+    assert channel.sent == [{'content': 'one'}, {'content': 'two'}]
+    assert scheduler.pending == 0
+    assert not scheduler._workers
+
+
+def test_stopping_a_worker_cancels_only_undelivered_messages():
+    async def scenario():
+        scheduler = OutboundScheduler()
+        channel = FakeChannel(block=asyncio.Event())
+        first = asyncio.ensure_future(scheduler.send(channel, content='one'))
+        second = asyncio.ensure_future(scheduler.send(channel, content='two'))
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        scheduler._workers[channel.id].cancel()
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        return scheduler, first, second
+
+    scheduler, first, second = asyncio.run(scenario())
+    for future in (first, second):
+        with pytest.raises(asyncio.CancelledError):
+            future.result()
+    assert scheduler.pending == 0
+    assert not scheduler._workers
@@ -0,0 +1,110 @@
+import asyncio
+import pytest
+from response_cache import ResponseCache, response_key
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def answer(cache, key, model):
+    # نفس تسلسل get_ai_response: المخزن ثم الطلب الجاري ثم النموذج
+    while True:
+        cached = cache.get(key)
+        if cached:
+            return cached
+        pending = cache.pending(key)
+        if pending is None:
+            break
+        response = await pending
+        if response:
+            return response
+    cache.begin(key)
+    response = None
+    try:
+        response = await model()
+        return response
+    finally:
+        cache.finish(key, response)
+
+
+def test_identical_concurrent_requests_call_model_once():
+    async def scenario():
+        cache = ResponseCache(max_bytes=1024, ttl=60, enabled=True)
+        calls = []
+        release = asyncio.Event()
+
+        async def model():
+            calls.append(1)
+            await release.wait()
+            return 'answer'
+
+        first = asyncio.create_task(answer(cache, 'k', model))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(answer(cache, 'k', model))
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(first, second)
+        return cache, calls, results
+
+    cache, calls, results = run(scenario())
+    assert results == ['answer', 'answer']
+    assert len(calls) == 1
+    assert cache.stats()['coalesced'] == 1
+    assert cache.stats()['in_flight'] == 0
+    assert cache.get('k') == 'answer'
+
+
+def test_error_releases_waiters_to_send_their_own_request():
+    async def scenario():
+        cache = ResponseCache(max_bytes=1024, ttl=60, enabled=True)
+        release = asyncio.Event()
+        calls = []
+
+        async def failing():
+            calls.append('failing')
+            await release.wait()
+            raise RuntimeError('model down')
+
+        async def working():
+            calls.append('working')
+            return 'second answer'
+
+        first = asyncio.create_task(answer(cache, 'k', failing))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(answer(cache, 'k', working))
+        await asyncio.sleep(0)
+        release.set()
+        with pytest.raises(RuntimeError):
+            await first
+        return cache, calls, await asyncio.wait_for(second, 1)
+
+    cache, calls, result = run(scenario())
+    assert result == 'second answer'
+    assert calls == ['failing', 'working']
+    assert cache.stats()['in_flight'] == 0
+
+
+def test_cancelled_waiter_does_not_cancel_the_leader():
+    async def scenario():
+        cache = ResponseCache(max_bytes=1024, ttl=60, enabled=True)
+        release = asyncio.Event()
+
+        async def model():
+            await release.wait()
+            return 'answer'
+
+        leader = asyncio.create_task(answer(cache, 'k', model))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(answer(cache, 'k', model))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        release.set()
+        return await leader
+
+    assert run(scenario()) == 'answer'
+
+
+def test_key_ignores_case_spacing_and_trailing_punctuation():
+    assert response_key('Hello   World?', []) == response_key('hello world', [])
+    assert response_key('hello', []) != response_key('hello', [['q', 'a']])
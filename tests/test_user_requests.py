@@ -0,0 +1,167 @@
+import asyncio
+from user_requests import UserRequest, UserRequestQueue
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def blocking_handler(events, release):
+    async def handler(request):
+        events.append(('start', request.prompt))
+        await release.wait()
+        events.append(('end', request.prompt))
+        return request.prompt
+    return handler
+
+
+def test_queue_runs_requests_of_one_user_in_order():
+    async def scenario():
+        queue = UserRequestQueue(policy='queue')
+        events = []
+        release = asyncio.Event()
+        handler = blocking_handler(events, release)
+        first = asyncio.create_task(queue.run(1, UserRequest('a'), handler))
+        second = asyncio.create_task(queue.run(1, UserRequest('b'), handler))
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        assert events == [('start', 'a')]
+        release.set()
+        results = await asyncio.gather(first, second)
+        return queue, events, results
+
+    queue, events, results = run(scenario())
+    assert results == ['a', 'b']
+    assert events == [('start', 'a'), ('end', 'a'), ('start', 'b'), ('end', 'b')]
+    stats = queue.stats()
+    assert stats['completed'] == 2
+    assert stats['queued'] == 1
+    assert stats['users'] == 0
+
+
+def test_queue_runs_different_users_concurrently():
+    async def scenario():
+        queue = UserRequestQueue(policy='queue')
+        events = []
+        release = asyncio.Event()
+        handler = blocking_handler(events, release)
+        tasks = [asyncio.create_task(queue.run(user_id, UserRequest(str(user_id)), handler)) for user_id in (1, 2)]
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        started = list(events)
+        release.set()
+        await asyncio.gather(*tasks)
+        return queue, started
+
+    queue, started = run(scenario())
+    assert started == [('start', '1'), ('start', '2')]
+    assert queue.stats()['queued'] == 0
+
+
+def test_supersede_cancels_request_without_output():
+    async def scenario():
+        queue = UserRequestQueue(policy='supersede')
+        events = []
+        release = asyncio.Event()
+        handler = blocking_handler(events, release)
+        first = asyncio.create_task(queue.run(1, UserRequest('old'), handler))
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        second = asyncio.create_task(queue.run(1, UserRequest('new'), handler))
+        await asyncio.sleep(0)
+        release.set()
+        return queue, events, await asyncio.gather(first, second)
+
+    queue, events, results = run(scenario())
+    assert results == [None, 'new']
+    assert ('end', 'old') not in events
+    assert queue.stats()['cancelled'] == 1
+    assert queue.stats()['completed'] == 1
+
+
+def test_supersede_keeps_request_that_started_output():
+    async def scenario():
+        queue = UserRequestQueue(policy='supersede')
+        release = asyncio.Event()
+
+        async def handler(request):
+            request.mark_output()
+            await release.wait()
+            return request.prompt
+
+        first = asyncio.create_task(queue.run(1, UserRequest('old'), handler))
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        second = asyncio.create_task(queue.run(1, UserRequest('new'), handler))
+        await asyncio.sleep(0)
+        release.set()
+        return queue, await asyncio.gather(first, second)
+
+    queue, results = run(scenario())
+    assert results == ['old', 'new']
+    assert queue.stats()['cancelled'] == 0
+
+
+def test_supersede_skips_non_cancellable_requests():
+    async def scenario():
+        queue = UserRequestQueue(policy='supersede')
+        events = []
+        release = asyncio.Event()
+        handler = blocking_handler(events, release)
+        first = asyncio.create_task(queue.run(1, UserRequest('edit', cancellable=False), handler))
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        second = asyncio.create_task(queue.run(1, UserRequest('new'), handler))
+        await asyncio.sleep(0)
+        release.set()
+        return queue, await asyncio.gather(first, second)
+
+    queue, results = run(scenario())
+    assert results == ['edit', 'new']
+    assert queue.stats()['cancelled'] == 0
+
+
+def test_merge_folds_dropped_prompts_and_attachments_into_newest():
+    async def scenario():
+        queue = UserRequestQueue(policy='merge')
+        release = asyncio.Event()
+        seen = []
+
+        async def handler(request):
+            seen.append((request.prompt, list(request.attachments)))
+            await release.wait()
+            return request.prompt
+
+        first = asyncio.create_task(queue.run(1, UserRequest('first', ['a.png']), handler))
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        second = asyncio.create_task(queue.run(1, UserRequest('second', ['b.png']), handler))
+        await asyncio.sleep(0)
+        release.set()
+        return queue, seen, await asyncio.gather(first, second)
+
+    queue, seen, results = run(scenario())
+    assert results == [None, 'first\nsecond']
+    assert seen[-1] == ('first\nsecond', ['a.png', 'b.png'])
+    assert queue.stats()['merged'] == 1
+    assert queue.stats()['cancelled'] == 0
+
+
+def test_handler_error_propagates_and_frees_user():
+    async def scenario():
+        queue = UserRequestQueue(policy='queue')
+
+        async def handler(request):
+            raise ValueError('boom')
+
+        try:
+            await queue.run(1, UserRequest('x'), handler)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError('expected ValueError')
+        return queue
+
+    queue = run(scenario())
+    assert queue.stats()['users'] == 0
+    assert queue.stats()['completed'] == 0
@@ -0,0 +1,83 @@
+import io
+import asyncio
+from PIL import Image, ImageDraw, ImageFilter
+from image_ops import ImageFingerprint, image_hash
+from vision_index import PerceptualIndex
+
+
+def encode(image, fmt='PNG', **options):
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, **options)
+    return buffer.getvalue()
+
+
+def screenshot(lines, text, background, foreground):
+    image = Image.new('RGB', (1280, 720), background)
+    draw = ImageDraw.Draw(image)
+    for line in range(lines):
+        draw.text((20, 20 + line * 22), text.format(line), fill=foreground)
+    return encode(image)
+
+
+def photo(shift=0):
+    image = Image.new('RGB', (800, 600))
+    draw = ImageDraw.Draw(image)
+    for y in range(600):
+        draw.line([(0, y), (800, y)], fill=((y // 3 + shift) % 256, 100, 200 - y // 4))
+    for index in range(12):
+        x, y, r = 60 + index * 60, 80 + (index * 137) % 440, 30 + (index * 17) % 90
+        draw.ellipse([x - r, y - r, x + r, y + r], fill=((index * 70 + shift) % 256, (index * 40) % 256, 255 - index * 20))
+    return image.filter(ImageFilter.GaussianBlur(3))
+
+
+def index_with(data, analysis):
+    index = PerceptualIndex(path=None)
+    index.add(image_hash(data), analysis)
+    return index
+
+
+def test_different_text_screenshots_do_not_share_an_analysis():
+    dark = (30, 30, 30), (220, 220, 220)
+    light = 'white', (20, 20, 20)
+    pairs = [
+        (screenshot(30, 'Error: connection refused at line {}', *dark), screenshot(5, 'Invoice total {} USD', *dark)),
+        (screenshot(30, 'Error: connection refused at line {}', *light),
+         screenshot(12, 'def function_{}(): return something', *light)),
+    ]
+    for first, second in pairs:
+        index = index_with(first, 'an error log')
+        assert index.lookup(image_hash(second)) is None
+        assert index.lookup(image_hash(first)) == 'an error log'
+
+
+def test_reencoded_photo_reuses_analysis():
+    image = photo()
+    index = index_with(encode(image), 'a sunset')
+    smaller = image.resize((400, 300))
+    assert index.lookup(image_hash(encode(smaller, 'JPEG', quality=60))) == 'a sunset'
+
+
+def test_close_hash_needs_matching_thumbnail():
+    index = PerceptualIndex(path=None, threshold=6, max_diff=4)
+    index.add(ImageFingerprint('a', 0x0F0F0F0F0F0F0F0F, bytes(192)), 'a red logo')
+    assert index.lookup(ImageFingerprint('b', 0x0F0F0F0F0F0F0F0E, bytes([2] * 192))) == 'a red logo'
+    assert index.lookup(ImageFingerprint('c', 0x0F0F0F0F0F0F0F0E, bytes([40] * 192))) is None
+
+
+def test_index_survives_save_and_load(tmp_path):
+    path = str(tmp_path / 'vision_index.json')
+    text = screenshot(10, 'Invoice total {} USD', 'white', 'black')
+    image = encode(photo())
+
+    async def scenario():
+        index = PerceptualIndex(path=path)
+        index.add(image_hash(text), 'an invoice')
+        index.add(image_hash(image), 'a sunset')
+        await index.close()
+        reloaded = PerceptualIndex(path=path)
+        reloaded.load()
+        return reloaded
+
+    reloaded = asyncio.run(scenario())
+    assert reloaded.lookup(image_hash(text)) == 'an invoice'
+    assert reloaded.lookup(image_hash(encode(photo(), 'JPEG', quality=80))) == 'a sunset'
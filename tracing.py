@@ -0,0 +1,196 @@
+import io
+import os
+import time
+import uuid
+import asyncio
+import inspect
+import logging
+import functools
+import marshal
+import pstats
+import cProfile
+from contextvars import ContextVar
+
+logger = logging.getLogger(__name__)
+
+TRACING_ENABLED = os.getenv('TRACING', 'on') != 'off'
+TRACE_SLOW_SECONDS = float(os.getenv('TRACE_SLOW_SECONDS', 10))
+PROFILE_MAX_SECONDS = int(os.getenv('PROFILE_MAX_SECONDS', 60))
+PROFILE_TOP_FUNCTIONS = 60
+
+# السياق ينتقل تلقائياً مع await ومع المهام التي تُنشأ داخل الطلب
+_current_span = ContextVar('current_span', default=None)
+
+
+class Span:
+    __slots__ = ('name', 'start', 'duration', 'children', 'trace_id')
+
+    def __init__(self, name, trace_id, start=None, duration=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.start = time.monotonic() if start is None else start
+        self.duration = duration
+        self.children = []
+
+    def child(self, name, start=None, duration=None):
+        span = Span(name, self.trace_id, start, duration)
+        self.children.append(span)
+        return span
+
+    def finish(self):
+        if self.duration is None:
+            self.duration = time.monotonic() - self.start
+
+    def lines(self, depth=0):
+        duration = self.duration if self.duration is not None else time.monotonic() - self.start
+        yield f"{'  ' * depth}{self.name} {duration * 1000:.0f}ms"
+        for child in self.children:
+            yield from child.lines(depth + 1)
+
+
+class SpanContext:
+    __slots__ = ('name', 'root', 'span', 'token')
+
+    def __init__(self, name, root=False):
+        self.name = name
+        self.root = root
+        self.span = None
+
+    def __enter__(self):
+        parent = _current_span.get()
+        if self.root:
+            self.span = Span(self.name, new_trace_id())
+        elif parent is not None:
+            self.span = parent.child(self.name)
+        else:
+            # خارج أي تتبع: لا شيء يُسجل
+            return None
+        self.token = _current_span.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.span is None:
+            return False
+        self.span.finish()
+        _current_span.reset(self.token)
+        if self.root:
+            finish_trace(self.span)
+        return False
+
+
+def new_trace_id():
+    return uuid.uuid4().hex[:16]
+
+
+def current_span():
+    return _current_span.get()
+
+
+def current_trace_id():
+    span = _current_span.get()
+    return span.trace_id if span is not None else None
+
+
+def trace(name):
+    # بداية تتبع جديد لرسالة أو تفاعل؛ يُسجل في السجل إن تجاوز الحد
+    return SpanContext(name, root=TRACING_ENABLED)
+
+
+def span(name):
+    return SpanContext(name)
+
+
+def traced(name=None):
+    def decorate(func):
+        label = name or func.__name__
+        if inspect.isasyncgenfunction(func):
+            @functools.wraps(func)
+            async def generator_wrapper(*args, **kwargs):
+                # المولّد يعمل في سياق من يستهلكه، فلا يُجعل الامتداد حالياً؛ يُسجل كجزء منتهٍ فقط
+                parent = _current_span.get()
+                started = time.monotonic()
+                generator = func(*args, **kwargs)
+                try:
+                    async for item in generator:
+                        yield item
+                finally:
+                    # إغلاق فوري عند توقف المستهلك مبكراً حتى تعمل كتل finally في المولّد الأصلي
+                    await generator.aclose()
+                    add_span(parent, label, started, time.monotonic() - started)
+            return generator_wrapper
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with span(label):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def start_trace(name):
+    # للتفاعلات: يبدأ التتبع في فحص الأمر وينتهي في حدث اكتماله، فلا يوجد with يحيط بهما
+    if not TRACING_ENABLED:
+        return None
+    root = Span(name, new_trace_id())
+    _current_span.set(root)
+    return root
+
+
+def end_trace():
+    root = _current_span.get()
+    if root is not None:
+        _current_span.set(None)
+        root.finish()
+        finish_trace(root)
+
+
+def add_span(parent, name, start, duration):
+    # مراحل قيست في مكان آخر (عملية عاملة، مهمة إرسال) تُضاف بعد انتهائها
+    if parent is not None:
+        parent.child(name, start, duration)
+
+
+def add_stages(stages):
+    parent = _current_span.get()
+    if parent is None:
+        return
+    # توقيتات العملية العاملة بلا بداية مطلقة، فتُرتب متتالية حتى لحظة الوصول
+    start = time.monotonic() - sum(seconds for _, seconds in stages)
+    for name, seconds in stages:
+        parent.child(name, start, seconds)
+        start += seconds
+
+
+def finish_trace(root):
+    if root.duration >= TRACE_SLOW_SECONDS:
+        breakdown = '\n'.join(root.lines())
+        logger.warning(f"🐢 طلب بطيء [{root.trace_id}] استغرق {root.duration:.1f} ثانية:\n{breakdown}")
+
+
+class LoopProfiler:
+    def __init__(self, max_seconds=PROFILE_MAX_SECONDS):
+        self.max_seconds = max_seconds
+        self.running = False
+
+    async def run(self, seconds):
+        # cProfile يقيس خيط حلقة الأحداث فقط؛ عمليات معالجة الصور خارج القياس
+        if self.running:
+            raise RuntimeError("profiling session already running")
+        seconds = max(1, min(seconds, self.max_seconds))
+        self.running = True
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                profiler.disable()
+        finally:
+            self.running = False
+
+        stats = pstats.Stats(profiler)
+        report = io.StringIO()
+        stats.stream = report
+        stats.sort_stats('cumulative').print_stats(PROFILE_TOP_FUNCTIONS)
+        # نفس صيغة dump_stats: تُفتح بـ pstats أو snakeviz
+        return report.getvalue(), marshal.dumps(stats.stats)
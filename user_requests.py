@@ -0,0 +1,107 @@
+import os
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# queue: تنفيذ طلبات المستخدم بالترتيب | supersede: الطلب الأحدث يلغي ما لم يبدأ إخراجه
+# merge: مثل supersede لكن نص الطلبات الملغاة يُضم للطلب الأحدث
+USER_REQUEST_POLICY = os.getenv('USER_REQUEST_POLICY', 'queue')
+
+
+class UserRequest:
+    __slots__ = ('prompt', 'attachments', 'cancellable', 'has_output', 'dropped', 'task')
+
+    def __init__(self, prompt, attachments=None, cancellable=True):
+        self.prompt = prompt
+        self.attachments = list(attachments or [])
+        self.cancellable = cancellable
+        self.has_output = False
+        self.dropped = False
+        self.task = None
+
+    def mark_output(self):
+        self.has_output = True
+
+
+class UserState:
+    __slots__ = ('lock', 'current', 'waiting')
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.current = None
+        self.waiting = []
+
+
+class UserRequestQueue:
+    def __init__(self, policy=USER_REQUEST_POLICY):
+        self.policy = policy
+        self.completed = 0
+        self.queued = 0
+        self.cancelled = 0
+        self.merged = 0
+        self._users = {}
+
+    def _absorb(self, request, older):
+        # الطلب الأقدم يُلغى؛ في وضع merge يصبح نصه وصوره جزءاً من الطلب الأحدث
+        older.dropped = True
+        if self.policy == 'merge':
+            request.prompt = '\n'.join(part for part in (older.prompt, request.prompt) if part)
+            request.attachments = older.attachments + request.attachments
+            self.merged += 1
+        else:
+            self.cancelled += 1
+
+    def _supersede(self, state, request):
+        for older in reversed(state.waiting):
+            if older.cancellable and not older.dropped:
+                self._absorb(request, older)
+        current = state.current
+        if current is not None and current.cancellable and not current.has_output and not current.dropped:
+            self._absorb(request, current)
+            current.task.cancel()
+
+    async def run(self, user_id, request, handler):
+        state = self._users.get(user_id)
+        if state is None:
+            state = self._users[user_id] = UserState()
+        if self.policy in ('supersede', 'merge') and request.cancellable:
+            self._supersede(state, request)
+        if state.lock.locked():
+            self.queued += 1
+
+        state.waiting.append(request)
+        try:
+            async with state.lock:
+                state.waiting.remove(request)
+                if request.dropped:
+                    return None
+                state.current = request
+                request.task = asyncio.create_task(handler(request))
+                try:
+                    result = await request.task
+                except asyncio.CancelledError:
+                    if request.dropped and request.task.cancelled():
+                        return None
+                    request.task.cancel()
+                    raise
+                finally:
+                    state.current = None
+                self.completed += 1
+                return result
+        finally:
+            if request in state.waiting:
+                state.waiting.remove(request)
+            if not state.waiting and state.current is None and self._users.get(user_id) is state:
+                del self._users[user_id]
+
+    def stats(self):
+        return {
+            'policy': self.policy,
+            'users': len(self._users),
+            'waiting': sum(len(state.waiting) for state in self._users.values()),
+            'completed': self.completed,
+            'queued': self.queued,
+            'cancelled': self.cancelled,
+            'merged': self.merged,
+        }
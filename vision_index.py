@@ -0,0 +1,198 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from image_ops import ImageFingerprint
+
+logger = logging.getLogger(__name__)
+
+VISION_DEDUP_ENABLED = os.getenv('VISION_DEDUP', 'on') != 'off'
+VISION_INDEX_PATH = os.getenv('VISION_INDEX_PATH', 'data/vision_index.json')
+VISION_INDEX_SIZE = int(os.getenv('VISION_INDEX_SIZE', 5000))
+VISION_DEDUP_THRESHOLD = int(os.getenv('VISION_DEDUP_THRESHOLD', 6))
+# متوسط الفرق لكل قناة لونية بين المصغّرين (0-255) لتأكيد تطابق البصمتين
+VISION_DEDUP_MAX_DIFF = float(os.getenv('VISION_DEDUP_MAX_DIFF', 4))
+VISION_DEDUP_TTL = float(os.getenv('VISION_DEDUP_TTL', 7 * 24 * 3600))
+VISION_INDEX_FLUSH_INTERVAL = float(os.getenv('VISION_INDEX_FLUSH_INTERVAL', 60))
+
+HASH_BITS = 64
+BANDS = 8
+BAND_BITS = HASH_BITS // BANDS
+BAND_MASK = (1 << BAND_BITS) - 1
+
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+
+def bands(value):
+    return [(band, (value >> (band * BAND_BITS)) & BAND_MASK) for band in range(BANDS)]
+
+
+def thumbnail_diff(a, b):
+    return sum(abs(x - y) for x, y in zip(a, b)) / len(a)
+
+
+class PerceptualIndex:
+    def __init__(self, path=VISION_INDEX_PATH, max_entries=VISION_INDEX_SIZE,
+                 threshold=VISION_DEDUP_THRESHOLD, max_diff=VISION_DEDUP_MAX_DIFF, ttl=VISION_DEDUP_TTL,
+                 flush_interval=VISION_INDEX_FLUSH_INTERVAL):
+        self.path = path
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.max_diff = max_diff
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self.lookups = 0
+        self.hits = 0
+        self.evictions = 0
+        # digest -> (ImageFingerprint, analysis, created)
+        self._entries = OrderedDict()
+        # فهرسة متعددة: بصمتان بمسافة أقل من BANDS تتطابقان حتماً في جزء واحد على الأقل
+        self._bands = {}
+        self._dirty = False
+        self._flush_task = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _index(self, fingerprint):
+        for key in bands(fingerprint.value):
+            self._bands.setdefault(key, set()).add(fingerprint.digest)
+
+    def _unindex(self, fingerprint):
+        for key in bands(fingerprint.value):
+            bucket = self._bands.get(key)
+            if bucket is not None:
+                bucket.discard(fingerprint.digest)
+                if not bucket:
+                    del self._bands[key]
+
+    def _candidates(self, value):
+        if self.threshold >= BANDS:
+            return list(self._entries)
+        found = set()
+        for key in bands(value):
+            found |= self._bands.get(key, set())
+        return found
+
+    def _store(self, fingerprint, analysis, created):
+        self._entries[fingerprint.digest] = (fingerprint, analysis, created)
+        if fingerprint.value is not None:
+            self._index(fingerprint)
+
+    def _remove(self, digest):
+        fingerprint = self._entries.pop(digest)[0]
+        if fingerprint.value is not None:
+            self._unindex(fingerprint)
+
+    def _match(self, fingerprint):
+        # نفس الملف أولاً؛ وإلا بصمة قريبة يؤكدها المصغّر الملون (صورتان بنفس التوزيع وألوان مختلفة لا تتطابقان)
+        if fingerprint.digest in self._entries:
+            return fingerprint.digest
+        if fingerprint.value is None:
+            return None
+        best, best_distance = None, self.threshold + 1
+        for digest in self._candidates(fingerprint.value):
+            candidate = self._entries[digest][0]
+            if candidate.value is None:
+                continue
+            distance = hamming(fingerprint.value, candidate.value)
+            if distance < best_distance and thumbnail_diff(fingerprint.thumbnail, candidate.thumbnail) <= self.max_diff:
+                best, best_distance = digest, distance
+        return best
+
+    def lookup(self, fingerprint):
+        self.lookups += 1
+        best = self._match(fingerprint)
+        if best is None:
+            return None
+        _, analysis, created = self._entries[best]
+        if time.time() - created > self.ttl:
+            self._remove(best)
+            self._dirty = True
+            return None
+        self._entries.move_to_end(best)
+        self.hits += 1
+        return analysis
+
+    def add(self, fingerprint, analysis):
+        if fingerprint.digest in self._entries:
+            self._remove(fingerprint.digest)
+        self._store(fingerprint, analysis, time.time())
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+        self._dirty = True
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                rows = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"خطأ في قراءة فهرس تحليل الصور: {e}")
+            return
+        now = time.time()
+        for row in rows[-self.max_entries:]:
+            # صفوف الصيغة القديمة (بصمة dHash وحدها بلا تأكيد) تُترك ليُعاد تحليل صورها
+            if len(row) != 5:
+                continue
+            digest, value, thumbnail, analysis, created = row
+            if now - created <= self.ttl:
+                fingerprint = ImageFingerprint(digest, None if value is None else int(value, 16), bytes.fromhex(thumbnail))
+                self._store(fingerprint, analysis, created)
+
+    def save(self, rows):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(rows, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    async def start(self):
+        if not self.path:
+            return
+        await asyncio.to_thread(self.load)
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def flush(self):
+        if not self.path or not self._dirty:
+            return
+        self._dirty = False
+        rows = [
+            [fingerprint.digest, None if fingerprint.value is None else f'{fingerprint.value:016x}',
+             fingerprint.thumbnail.hex(), analysis, created]
+            for fingerprint, analysis, created in self._entries.values()
+        ]
+        try:
+            await asyncio.to_thread(self.save, rows)
+        except OSError as e:
+            self._dirty = True
+            logger.error(f"خطأ في حفظ فهرس تحليل الصور: {e}")
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def close(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'lookups': self.lookups,
+            'hits': self.hits,
+            'hit_rate': round(self.hits / self.lookups, 3) if self.lookups else 0.0,
+            'evictions': self.evictions,
+        }